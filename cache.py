@@ -0,0 +1,155 @@
+import hashlib
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Union
+
+from settings import settings
+
+'''
+https://github.com/sbustars/STARS
+
+Copyright 2020 Kevin McDonnell, Jihu Mun, and Ian Peitzsch
+
+Developed by Kevin McDonnell (ktm@cs.stonybrook.edu),
+Jihu Mun (jihu1011@gmail.com),
+and Ian Peitzsch (irpeitzsch@gmail.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+
+# Bump whenever the format of the assembled program changes in a way the source hash doesn't catch
+VERSION = 1
+
+# Modules whose code decides what a program assembles to: everything on the path from the source files to the parsed
+# program, including the splicing of includes in sbumips.py and the vendored sly. A change to any of them invalidates
+# the cache.
+FRONTEND = ['sbumips.py', 'lexer.py', 'mipsParser.py', 'preprocess.py', 'constants.py', 'interpreter/classes.py',
+            'interpreter/utility.py', 'sly/lex.py', 'sly/yacc.py']
+
+# Number of assembled programs kept in memory
+MAX_PROGRAMS = 32
+
+# Assembled programs, pickled so each run gets its own copy to link. Oldest first.
+# What's kept is the parsed program, not the linked memory image an Interpreter builds from it: that image depends on
+# the program arguments and on the garbage memory settings and seed, which change from run to run, and linking it is
+# a small part of loading next to unpickling and compiling the instructions.
+programs = OrderedDict()
+
+_frontend_hash = None
+
+
+# Where caches are kept between runs. STARS_CACHE_DIR overrides the user cache directory.
+def cache_dir() -> str:
+    if 'STARS_CACHE_DIR' in os.environ:
+        return os.environ['STARS_CACHE_DIR']
+
+    base = os.environ.get('XDG_CACHE_HOME') or os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'stars')
+
+
+# Whether assembled programs are worth keeping: on disk with --cache, or in memory when the process runs more than
+# one program (the GUI). A one-shot run would only pay to pickle a program nothing reads again.
+def enabled() -> bool:
+    return bool(settings['program_cache'] or settings['gui'])
+
+
+def frontend_hash() -> bytes:
+    global _frontend_hash
+
+    if _frontend_hash is None:
+        h = hashlib.sha256(str(VERSION).encode())
+        root = Path(__file__).parent
+
+        for name in FRONTEND:
+            h.update(root.joinpath(name).read_bytes())
+
+        _frontend_hash = h.digest()
+
+    return _frontend_hash
+
+
+# Key for a program: every file in its include closure (name and contents), its .eqv table and the settings
+# that change how it assembles
+def program_key(files: List[Path], eqv: Dict[str, str], abs_to_rel: Dict[str, str]) -> str:
+    h = hashlib.sha256(frontend_hash())
+    h.update(repr(settings['pseudo_ops']).encode())
+    h.update(repr(list(eqv.items())).encode())
+    h.update(repr(sorted(abs_to_rel.items())).encode())
+
+    for file in files:
+        data = file.read_bytes()
+        h.update(f'{file.as_posix()}\0{len(data)}\0'.encode())
+        h.update(data)
+
+    return h.hexdigest()
+
+
+def program_file(key: str) -> str:
+    return os.path.join(cache_dir(), 'programs', f'{key}.pickle')
+
+
+# Get a fresh copy of the program assembled under key, or None if it isn't cached
+def load(key: str) -> Union[List, None]:
+    data = programs.get(key)
+
+    if data is None and settings['program_cache']:
+        try:
+            with open(program_file(key), 'rb') as f:
+                data = f.read()
+
+        except OSError:
+            return None
+
+    if data is None:
+        return None
+
+    try:
+        program = pickle.loads(data)
+
+    except Exception:  # A damaged file on disk just means assembling again
+        return None
+
+    remember(key, data)
+    return program
+
+
+def store(key: str, program: List) -> None:
+    data = pickle.dumps(program, protocol=pickle.HIGHEST_PROTOCOL)
+    remember(key, data)
+
+    if settings['program_cache']:
+        directory = os.path.dirname(program_file(key))
+
+        try:
+            os.makedirs(directory, exist_ok=True)
+            # Write to a temporary file first so other processes never see a partial file
+            fd, tmp = tempfile.mkstemp(dir=directory)
+
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+
+                os.replace(tmp, program_file(key))
+
+            except BaseException:
+                os.remove(tmp)
+                raise
+
+        except OSError:
+            pass
+
+
+def remember(key: str, data: bytes) -> None:
+    programs[key] = data
+    programs.move_to_end(key)
+
+    while len(programs) > MAX_PROGRAMS:
+        programs.popitem(last=False)
@@ -36,4 +36,8 @@ REGS = ['$zero', '$at', '$v0', '$v1', '$a0', '$a1', '$a2', '$a3',
         '$t8', '$t9', '$k0', '$k1', '$gp', '$sp', '$fp', '$ra',
         'pc', 'hi', 'lo']
 
+# Integer registers are stored as their index into REGS. Both names of a register map to the same index
+REG_INDEX = {r: i for i, r in enumerate(REGS)}
+REG_INDEX.update({f'${i}': i for i in range(32)})
+
 F_REGS = [f'$f{i}' for i in range(32)]
@@ -9,6 +9,7 @@ from sbumips import assemble
 from settings import settings
 from controller import Controller
 from gui.vt100 import VT100
+from gui.qtevents import QtEventSink
 from gui.textedit import TextEdit
 from gui.syntaxhighlighter import Highlighter
 
@@ -475,21 +476,21 @@ class MainWindow(QMainWindow):
     def assemble(self, filename):
         try:
             if self.running:
-                self.intr.end.emit(False)
+                self.intr.events.on_end(False)
             for i in range(self.len):
                 self.save_file(wid=self.tabs.widget(i), ind=i)
             self.out.setPlainText('')
             self.result = assemble(filename)
-            self.intr = Interpreter(self.result, self.pa.text().split())
+            self.intr = Interpreter(self.result, self.pa.text().split(), QtEventSink())
             self.controller.set_interp(self.intr)
             self.instrs = []
             self.update_screen(self.intr.reg['pc'])
             self.fill_labels()
-            self.intr.step.connect(self.update_screen)
-            self.intr.console_out.connect(self.update_console)
+            self.intr.events.step.connect(self.update_screen)
+            self.intr.events.console_out.connect(self.update_console)
             self.mem_right.clicked.connect(self.mem_rightclick)
             self.mem_left.clicked.connect(self.mem_leftclick)
-            self.intr.end.connect(self.set_running)
+            self.intr.events.end.connect(self.set_running)
             self.breakpoints = []
             self.setWindowTitle(f'STARS')
 
@@ -672,22 +673,22 @@ class MainWindow(QMainWindow):
         else:
             mem = self.intr.mem
             count = 0
-            for k in mem.text.keys():
-                if type(mem.text[k]) is not str:
-                    i = mem.text[k]
+            for k, i in enumerate(mem.text):
+                if type(i) is not str:
+                    addr = mem.textBase + 4 * k
                     check = QCheckBox()
                     check.stateChanged.connect(lambda state, i=i: self.add_breakpoint(('b', str(i.filetag.file_name)[1:-1], str(i.filetag.line_no))) if state == Qt.Checked else self.remove_breakpoint(
                         ('b', str(i.filetag.file_name)[1:-1], str(i.filetag.line_no))))
                     self.checkboxes.append(check)
                     self.instr_grid.addWidget(check, count, 0)
                     if i.is_from_pseudoinstr:
-                        q = QLineEdit(f'0x{int(k):08x}\t{i.original_text} ( {i.basic_instr()} )')
+                        q = QLineEdit(f'0x{addr:08x}\t{i.original_text} ( {i.basic_instr()} )')
                         q.setReadOnly(True)
                         q.setFont(QFont("Courier New", 10))
                         self.instrs.append(q)
                         self.instr_grid.addWidget(q, count, 1)
                     else:
-                        q = QLineEdit(f'0x{int(k):08x}\t{i.basic_instr()}')
+                        q = QLineEdit(f'0x{addr:08x}\t{i.basic_instr()}')
                         q.setFont(QFont("Courier New", 10))
                         q.setReadOnly(True)
                         self.instrs.append(q)
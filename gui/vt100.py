@@ -32,7 +32,7 @@ class VT100(QWidget):
         self.show()
 
     def connect_to_interp(self):
-        self.controller.interp.mem_access.connect(self.update_screen)
+        self.controller.interp.events.mem_access.connect(self.update_screen)
         self.update_screen()
 
     def init_gui(self) -> None:
@@ -0,0 +1,440 @@
+import sys
+from typing import Callable, Dict, List, Set, Union
+
+import constants as const
+from interpreter import exceptions as ex, instructions as instrs
+from interpreter.classes import *
+from interpreter.utility import get_line_info, reg_name
+from settings import settings
+
+'''
+https://github.com/sbustars/STARS
+
+Copyright 2020 Kevin McDonnell, Jihu Mun, and Ian Peitzsch
+
+Developed by Kevin McDonnell (ktm@cs.stonybrook.edu),
+Jihu Mun (jihu1011@gmail.com),
+and Ian Peitzsch (irpeitzsch@gmail.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+# The blocks engine (--engine=blocks) splits the text segment into basic blocks and turns each one into
+# a generated Python function. Registers live in locals for the length of the block, and the function
+# returns the address of the next instruction to run.
+# Blocks are built lazily, the first time execution reaches their first instruction, so jr targets
+# work the same as label targets. A block starts at its entry point and stops at:
+#   - a branch or jump (which is translated and ends the block)
+#   - the next label
+#   - an instruction that can't be translated (syscalls, floating point, ...). Those are executed one
+#     at a time using the compiled closures, exactly like the default engine does.
+
+# Normalize a Python int to a signed 32 bit value, like instrs.overflow_detect
+NORMALIZE = '(({}) + 0x80000000 & 0xFFFFFFFF) - 0x80000000'
+
+PC = const.REG_INDEX['pc']
+
+# Integer instructions with 3 registers. (expression, needs normalizing)
+rtype3_ops = {'addu': ('{a} + {b}', True),
+              'subu': ('{a} - {b}', True),
+              'and': ('{a} & {b}', False),
+              'or': ('{a} | {b}', False),
+              'xor': ('{a} ^ {b}', False),
+              'nor': ('~({a} | {b})', False),
+              'slt': ('1 if {a} < {b} else 0', False),
+              'sltu': ('1 if {a} & 0xFFFFFFFF < {b} & 0xFFFFFFFF else 0', False),
+              'sllv': ('{a} << ({b} & 31)', True),
+              'srlv': ('({a} & 0xFFFFFFFF) >> ({b} & 31)', True),
+              'srav': ('{a} >> ({b} & 31)', False),
+              'mul': ('{a} * {b}', True)}
+
+# Integer instructions with 2 registers and an immediate. (expression, needs normalizing, immediate check)
+itype_ops = {'addiu': ('{a} + {imm}', True, instrs.valid_immed),
+             'andi': ('{a} & {imm}', False, instrs.valid_immed_unsigned),
+             'ori': ('{a} | {imm}', False, instrs.valid_immed_unsigned),
+             'xori': ('{a} ^ {imm}', False, instrs.valid_immed_unsigned),
+             'slti': ('1 if {a} < {imm} else 0', False, instrs.valid_immed),
+             'sltiu': ('1 if {a} & 0xFFFFFFFF < {imm} & 0xFFFFFFFF else 0', False, instrs.valid_immed),
+             'sll': ('{a} << {imm}', True, instrs.valid_shamt),
+             'srl': ('({a} & 0xFFFFFFFF) >> {imm}', True, instrs.valid_shamt),
+             'sra': ('{a} >> {imm}', False, instrs.valid_shamt)}
+
+# Branch conditions
+branch_ops = {'beq': '{a} == {b}',
+              'bne': '{a} != {b}',
+              'blez': '{a} <= 0',
+              'bltz': '{a} < 0',
+              'bgez': '{a} >= 0',
+              'bgtz': '{a} > 0',
+              'bgezal': '{a} >= 0',
+              'bltzal': '{a} < 0'}
+
+# Memory accesses, as calls to the bound methods of Memory placed in the block's namespace
+load_ops = {'lw': 'getWord({addr})',
+            'lh': 'getHWord({addr})',
+            'lhu': 'getHWord({addr}, False)',
+            'lb': 'getByte({addr})',
+            'lbu': 'getByte({addr}, False)'}
+
+store_ops = {'sw': 'addWord({reg}, {addr})',
+             'sh': 'addHWord({reg}, {addr})',
+             'sb': 'addByte({reg}, {addr})'}
+
+
+class Block:
+    def __init__(self, func: Callable, instrs: List, lines: Dict[int, int]):
+        self.func = func  # Runs the block. Takes the register file and returns the next pc
+        self.instrs = instrs  # The instructions in the block
+        self.size = len(instrs)
+        self.lines = lines  # Line in the generated source -> index into instrs
+
+
+class BlockTranslator:
+    def __init__(self, inter):
+        self.mem = inter.mem
+        self.text = inter.mem.text
+        self.text_base = inter.mem.textBase
+        self.text_end = inter.mem.textPtr
+
+        # Labels in the text segment are block leaders
+        self.leaders = {(addr - self.text_base) >> 2 for addr in self.mem.labels.values()
+                        if self.text_base <= addr < self.text_end}
+
+        # Shared globals of every generated block
+        mem = self.mem
+        self.namespace = {'getWord': mem.getWord, 'getHWord': mem.getHWord, 'getByte': mem.getByte,
+                          'addWord': mem.addWord, 'addHWord': mem.addHWord, 'addByte': mem.addByte,
+                          'instrs': instrs}
+
+        # Registers used by the block being translated
+        self.used = set()  # type: Set[int]
+        self.written = set()  # type: Set[int]
+
+    # Local variable holding a register ($t0 -> r_t0)
+    def read(self, reg: Union[int, str]) -> str:
+        if type(reg) is str:
+            reg = const.REG_INDEX[reg]
+
+        if reg == 0:
+            return '0'
+
+        self.used.add(reg)
+        return 'r_' + reg_name(reg).strip('$')
+
+    def write(self, reg: Union[int, str]) -> str:
+        if type(reg) is str:
+            reg = const.REG_INDEX[reg]
+
+        self.used.add(reg)
+        self.written.add(reg)
+        return 'r_' + reg_name(reg).strip('$')
+
+    def translate(self, idx: int) -> Union[Block, None]:
+        # Returns None if the instruction at idx can't be translated
+        self.used = set()
+        self.written = set()
+        body = []
+        block_instrs = []
+        end = True
+
+        while True:
+            if idx >= len(self.text) or (block_instrs and idx in self.leaders):
+                end = False
+                break
+
+            instr = self.text[idx]
+            addr = self.text_base + 4 * idx
+            lines = self.translate_instr(instr, addr + 4)
+
+            if lines is None:
+                end = False
+                break
+
+            body.append(lines)
+            block_instrs.append(instr)
+            idx += 1
+
+            if type(instr) in {Branch, JType}:
+                break
+
+        if not block_instrs:
+            return None
+
+        start = self.text_base + 4 * (idx - len(block_instrs))
+        source = ['def block(regs):']
+        source += [f'    {self.read(r)} = regs[{r}]' for r in sorted(self.used)]
+        line_map = {}
+        indent = '    '
+
+        if self.written:
+            source.append('    try:')
+            indent = '        '
+
+        for k, lines in enumerate(body):
+            for line in lines:
+                source.append(indent + line)
+                line_map[len(source)] = k
+
+        if not end:
+            source.append(f'{indent}return {self.text_base + 4 * idx}')
+
+        if self.written:
+            source.append('    finally:')
+            source += [f'        regs[{r}] = {self.read(r)}' for r in sorted(self.written)]
+
+        env = dict(self.namespace)
+        exec(compile('\n'.join(source), f'<block {start:#010x}>', 'exec'), env)
+        return Block(env['block'], block_instrs, line_map)
+
+    def translate_instr(self, instr, next_pc: int) -> Union[List[str], None]:
+        t = type(instr)
+
+        if t is RType:
+            return self.translate_rtype(instr)
+
+        elif t is IType:
+            return self.translate_itype(instr)
+
+        elif t is LoadImm:
+            if instr.operation != 'lui':
+                return ['pass']
+
+            if not instrs.valid_immed_unsigned(instr.imm) or instr.reg == 0:
+                return None
+
+            return [f'{self.write(instr.reg)} = {instrs.overflow_detect(instr.imm << 16)}']
+
+        elif t is LoadMem:
+            return self.translate_load_mem(instr)
+
+        elif t is Move:
+            op = instr.operation
+
+            if 'f' in op:
+                src, dest = op[2:], instr.reg
+            else:
+                src, dest = instr.reg, op[2:]
+
+            if dest == 0:
+                return None
+
+            return [f'{self.write(dest)} = {self.read(src)}']
+
+        elif t is Branch:
+            return self.translate_branch(instr, next_pc)
+
+        elif t is JType:
+            return self.translate_jump(instr, next_pc)
+
+        elif t is Nop:
+            return ['pass']
+
+        return None
+
+    def translate_rtype(self, instr: RType) -> Union[List[str], None]:
+        op = instr.operation
+
+        if op[-2:] in {'.s', '.d'}:
+            return None
+
+        if len(instr.regs) == 3:
+            rd, rs, rt = instr.regs
+
+            if rd == 0:
+                return None
+
+            a, b = self.read(rs), self.read(rt)
+
+            if op in rtype3_ops:
+                expr, normalize = rtype3_ops[op]
+                expr = expr.format(a=a, b=b)
+
+                if normalize:
+                    expr = NORMALIZE.format(expr)
+
+                return [f'{self.write(rd)} = {expr}']
+
+            elif op in {'add', 'sub'}:
+                # Only call the real instruction to raise the exception on overflow
+                sign = '+' if op == 'add' else '-'
+                return [f'v = {a} {sign} {b}',
+                        f'if not -0x80000000 <= v <= 0x7FFFFFFF: instrs.{op}({a}, {b})',
+                        f'{self.write(rd)} = v']
+
+            elif op in {'movz', 'movn'}:
+                compare = '==' if op == 'movz' else '!='
+                return [f'if {b} {compare} 0: {self.write(rd)} = {a}']
+
+            return None
+
+        r1, r2 = instr.regs
+        a, b = self.read(r1), self.read(r2)
+
+        if op == 'mult' or op == 'multu':
+            if op == 'mult':
+                lines = [f'v = {a} * {b}']
+            else:
+                lines = [f'v = ({a} & 0xFFFFFFFF) * ({b} & 0xFFFFFFFF)']
+
+            return lines + [f'{self.write("lo")} = {NORMALIZE.format("v")}',
+                            f'{self.write("hi")} = {NORMALIZE.format("v >> 32")}']
+
+        elif op == 'div' or op == 'divu':
+            return [f'v, w = instrs.div({a}, {b}, {op == "div"})',
+                    f'{self.write("lo")} = {NORMALIZE.format("v")}',
+                    f'{self.write("hi")} = {NORMALIZE.format("w")}']
+
+        elif op in {'clo', 'clz'}:
+            if r1 == 0:
+                return None
+
+            return [f'{self.write(r1)} = {NORMALIZE.format(f"instrs.{op}({b})")}']
+
+        return None
+
+    def translate_itype(self, instr: IType) -> Union[List[str], None]:
+        op = instr.operation
+        rd, rs = instr.regs
+        imm = instr.imm
+
+        if rd == 0:
+            return None
+
+        a = self.read(rs)
+
+        if op == 'addi':
+            if not instrs.valid_immed(imm):
+                return None
+
+            return [f'v = {a} + {imm}',
+                    f'if not -0x80000000 <= v <= 0x7FFFFFFF: instrs.addi({a}, {imm})',
+                    f'{self.write(rd)} = v']
+
+        elif op in itype_ops:
+            expr, normalize, valid = itype_ops[op]
+
+            # Let the compiled instruction raise the exception for a bad immediate
+            if not valid(imm):
+                return None
+
+            expr = expr.format(a=a, imm=imm)
+
+            if normalize:
+                expr = NORMALIZE.format(expr)
+
+            return [f'{self.write(rd)} = {expr}']
+
+        return None
+
+    def translate_load_mem(self, instr: LoadMem) -> Union[List[str], None]:
+        op = instr.operation
+        addr = f'{self.read(instr.addr)} + {instr.imm}'
+
+        if op in load_ops:
+            if instr.reg == 0:
+                return None
+
+            return [f'{self.write(instr.reg)} = {load_ops[op].format(addr=addr)}']
+
+        elif op in store_ops:
+            return [store_ops[op].format(reg=self.read(instr.reg), addr=addr)]
+
+        return None
+
+    def translate_branch(self, instr: Branch, next_pc: int) -> Union[List[str], None]:
+        op = instr.operation
+        target = instr.label.addr
+
+        if op not in branch_ops or target is None:
+            return None
+
+        condition = branch_ops[op].format(a=self.read(instr.rs), b=self.read(instr.rt))
+        lines = [f'if {condition}:']
+
+        if 'al' in op:
+            lines.append(f'    {self.write("$ra")} = {next_pc}')
+
+        return lines + [f'    return {target}',
+                        f'return {next_pc}']
+
+    def translate_jump(self, instr: JType, next_pc: int) -> Union[List[str], None]:
+        op = instr.operation
+        lines = []
+
+        if op in {'jal', 'jalr'}:
+            lines.append(f'{self.write("$ra")} = {next_pc}')
+
+        if type(instr.target) is Label:
+            target = instr.target.addr
+
+            if target is None:
+                return None
+
+            return lines + [f'return {target}']
+
+        return lines + [f'return {self.read(instr.target)}']
+
+
+def run(inter) -> None:
+    regs = inter.regs
+    text = inter.mem.text
+    code = inter.code
+    text_base = inter.mem.textBase
+    text_size = len(text)
+    max_instructions = settings['max_instructions']
+    translator = BlockTranslator(inter)
+    blocks = {}
+
+    while True:
+        pc = regs[PC]
+        idx = (pc - text_base) >> 2
+
+        if pc & 3 or not 0 <= idx < text_size:
+            inter.line_info = get_line_info(inter.instr)
+            raise ex.MemoryOutOfBounds(f'{pc} is not a valid address')
+
+        if idx in blocks:
+            block = blocks[idx]
+        else:
+            block = blocks[idx] = translator.translate(idx)
+
+        # Only run a whole block if it can't go over the instruction limit
+        if block is not None and inter.instruction_count + block.size <= max_instructions:
+            try:
+                regs[PC] = block.func(regs)
+
+            except Exception:
+                # Find the instruction that raised the exception
+                tb = sys.exc_info()[2]
+
+                while tb is not None and tb.tb_frame.f_code is not block.func.__code__:
+                    tb = tb.tb_next
+
+                k = block.lines[tb.tb_lineno]
+                inter.instr = block.instrs[k]
+                inter.instruction_count += k + 1
+                inter.line_info = get_line_info(inter.instr)
+                regs[PC] = pc + 4 * (k + 1)
+                raise
+
+            inter.instruction_count += block.size
+            inter.instr = block.instrs[-1]
+            continue
+
+        # Otherwise, run a single instruction the same way the default engine does
+        if inter.instruction_count > max_instructions:
+            raise ex.InstrCountExceed(f'Exceeded maximum instruction count: {max_instructions}')
+
+        inter.instr = text[idx]
+        regs[PC] = pc + 4
+        inter.instruction_count += 1
+        inter.line_info = get_line_info(inter.instr)
+
+        if inter.instr == 'TERMINATE_EXECUTION':
+            break
+
+        code[idx](inter)
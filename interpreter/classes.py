@@ -1,5 +1,7 @@
-from typing import List, Union
+from collections.abc import MutableMapping
+from typing import Iterator, List, Union
 
+from constants import REGS, REG_INDEX
 from interpreter import utility
 
 '''
@@ -22,25 +24,22 @@ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLI
 class Label:
     def __init__(self, name: str):
         self.name = name
+        self.addr = None  # Address the label refers to. Filled in when the program is linked
 
 
 class RType:
     # Two or Three registers
-    def __init__(self, op: str, regs: List[str]):
+    def __init__(self, op: str, regs: List[Union[int, str]]):
         self.operation = op
         self.regs = regs
 
     def basic_instr(self) -> str:
-        if len(self.regs) == 2:
-            return f'{self.operation} {self.regs[0]} {self.regs[1]}'
-
-        else:
-            return f'{self.operation} {self.regs[0]} {self.regs[1]} {self.regs[2]}'
+        return f'{self.operation} ' + ' '.join(utility.reg_name(r) for r in self.regs)
 
 
 class IType:
     # Two registers and an immediate
-    def __init__(self, op: str, regs: List[str], imm: int):
+    def __init__(self, op: str, regs: List[int], imm: int):
         self.operation = op
         self.regs = regs
         self.imm = imm
@@ -51,19 +50,19 @@ class IType:
         else:
             imm = self.imm
 
-        return f'{self.operation} {self.regs[0]} {self.regs[1]} {imm}'
+        return f'{self.operation} {utility.reg_name(self.regs[0])} {utility.reg_name(self.regs[1])} {imm}'
 
 
 class JType:
     # A label or a register as a target
-    def __init__(self, op: str, target: Union[str, Label]):
+    def __init__(self, op: str, target: Union[int, Label]):
         self.operation = op
         self.target = target
 
     def basic_instr(self) -> str:
         if type(self.target) is Label:
             return f'{self.operation} {self.target.name}'
-        return f'{self.operation} {self.target}'
+        return f'{self.operation} {utility.reg_name(self.target)}'
 
 
 class Convert:
@@ -88,14 +87,14 @@ class Compare:
 
 
 class Branch:
-    def __init__(self, op: str, rs: str, rt: str, label: Label):
+    def __init__(self, op: str, rs: int, rt: int, label: Label):
         self.operation = op
         self.rs = rs
         self.rt = rt
         self.label = label
 
     def basic_instr(self) -> str:
-        return f'{self.operation} {self.rs} {self.rt} {self.label.name}'
+        return f'{self.operation} {utility.reg_name(self.rs)} {utility.reg_name(self.rt)} {self.label.name}'
 
 
 class BranchFloat:
@@ -108,18 +107,18 @@ class BranchFloat:
         return f'{self.operation} {self.flag} {self.label.name}'
 
 class LoadImm:
-    def __init__(self, op: str, reg: str, imm: int):
+    def __init__(self, op: str, reg: int, imm: int):
         self.operation = op
         self.reg = reg
         self.imm = imm
 
     def basic_instr(self) -> str:
         imm_hex = utility.format_hex(self.imm)
-        return f'{self.operation} {self.reg}, {imm_hex}'
+        return f'{self.operation} {utility.reg_name(self.reg)}, {imm_hex}'
 
 
 class LoadMem:
-    def __init__(self, op: str, reg: str, addr: str, imm: int):
+    def __init__(self, op: str, reg: Union[int, str], addr: int, imm: int):
         self.operation = op
         self.reg = reg
         self.addr = addr
@@ -127,39 +126,39 @@ class LoadMem:
 
     def basic_instr(self) -> str:
         imm_hex = utility.format_hex(self.imm)
-        return f'{self.operation} {self.reg}, {imm_hex}({self.addr})'
+        return f'{self.operation} {utility.reg_name(self.reg)}, {imm_hex}({utility.reg_name(self.addr)})'
 
 
 class Move:
-    def __init__(self, op: str, reg: str):
+    def __init__(self, op: str, reg: int):
         self.operation = op
         self.reg = reg
 
     def basic_instr(self) -> str:
-        return f'{self.operation} {self.reg}'
+        return f'{self.operation} {utility.reg_name(self.reg)}'
 
 class MoveFloat:
-    def __init__(self, op: str, rs: str, rt: str, rd: str = ''):
+    def __init__(self, op: str, rs: Union[int, str], rt: str, rd: Union[int, str] = ''):
         self.operation = op
         self.rs = rs
         self.rt = rt
         self.rd = rd
 
     def basic_instr(self) -> str:
-        if len(self.rd) > 0:
-            return f'{self.operation} {self.rs} {self.rt}'
+        if self.rd == '':
+            return f'{self.operation} {utility.reg_name(self.rs)} {self.rt}'
         else:
-            return f'{self.operation} {self.rs} {self.rt} {self.rd}'
+            return f'{self.operation} {self.rs} {self.rt} {utility.reg_name(self.rd)}'
 
 class MoveCond:
-    def __init__(self, op: str, rs: str, rt: str, flag: int):
+    def __init__(self, op: str, rs: Union[int, str], rt: Union[int, str], flag: int):
         self.operation = op
         self.rs = rs
         self.rt = rt
         self.flag = flag
 
     def basic_instr(self) -> str:
-        return f'{self.operation} {self.rs} {self.rt} {self.flag}'
+        return f'{self.operation} {utility.reg_name(self.rs)} {utility.reg_name(self.rt)} {self.flag}'
 
 class Nop:
     def __init__(self):
@@ -206,39 +205,33 @@ class Syscall:
         return 'syscall'
 
 
-# Change classes for putting instructions on the stack
-
-class RegChange:
-    def __init__(self, reg: str, val: int, pc: int, is_double: bool = False):
-        self.reg = reg
-        self.val = val
-        self.pc = pc
-        self.is_double = is_double
+# The integer registers are stored in a list indexed the same as REGS.
+# This gives the debugger and the GUI a view of them keyed by name ($t0 or $8) or index.
+class RegisterView(MutableMapping):
+    def __init__(self, regs: List[int]):
+        self.regs = regs
 
+    def __getitem__(self, reg: Union[int, str]) -> int:
+        if type(reg) is str:
+            reg = REG_INDEX[reg]
 
-# type can be 'w', 'h', or 'b' to indicate word, halfword, and byte respectively
-class MemChange:
-    def __init__(self, addr: int, val: int, pc: int, type: str):
-        self.addr = addr
-        self.val = val
-        self.pc = pc
-        self.type = type
+        return self.regs[reg]
 
+    def __setitem__(self, reg: Union[int, str], val: int) -> None:
+        if type(reg) is str:
+            reg = REG_INDEX[reg]
 
-class FlagChange:
-    def __init__(self, flag: int, value: bool, pc: int):
-        self.flag = flag
-        self.value = value
-        self.pc = pc
+        # Registers always hold signed 32 bit values
+        self.regs[reg] = ((val + 0x80000000) & 0xFFFFFFFF) - 0x80000000
 
+    def __delitem__(self, reg: Union[int, str]) -> None:
+        raise TypeError('Registers can not be deleted')
 
-class Change:
-    def __init__(self, pc: int):
-        self.pc = pc
+    def __contains__(self, reg) -> bool:
+        return reg in REG_INDEX or (type(reg) is int and 0 <= reg < len(self.regs))
 
+    def __iter__(self) -> Iterator[str]:
+        return iter(REGS)
 
-class MChange:
-    def __init__(self, hi: int, lo: int, pc: int):
-        self.pc = pc
-        self.hi = hi
-        self.lo = lo
+    def __len__(self) -> int:
+        return len(REGS)
@@ -0,0 +1,617 @@
+import struct
+from typing import Callable, List
+
+from numpy import float32
+
+import constants as const
+from interpreter import exceptions as ex, instructions as instrs
+from interpreter.classes import *
+from interpreter.syscalls import syscalls
+from settings import settings
+
+'''
+https://github.com/sbustars/STARS
+
+Copyright 2020 Kevin McDonnell, Jihu Mun, and Ian Peitzsch
+
+Developed by Kevin McDonnell (ktm@cs.stonybrook.edu),
+Jihu Mun (jihu1011@gmail.com),
+and Ian Peitzsch (irpeitzsch@gmail.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+# Each instruction is compiled once, when the program is loaded, into a closure that takes the interpreter.
+# Everything that only depends on the instruction (operand registers, the handler in instrs.table,
+# single/double precision, ...) is worked out here so that executing it does no decoding at all.
+Code = Callable[..., None]
+
+
+def is_float_single(op: str) -> bool:
+    return op[-2:] == '.s'
+
+
+def is_float_double(op: str) -> bool:
+    return op[-2:] == '.d'
+
+
+def is_conversion_to_int(op: str) -> bool:
+    return op[-4:-2] == '.w'
+
+
+def interpret_as_float(x: int) -> float32:
+    x_bytes = struct.pack('>i', x)
+    return struct.unpack('>f', x_bytes)[0]
+
+
+def interpret_as_int(x: float32) -> int:
+    x_bytes = struct.pack('>f', x)
+    return struct.unpack('>i', x_bytes)[0]
+
+
+PC = const.REG_INDEX['pc']
+HI = const.REG_INDEX['hi']
+LO = const.REG_INDEX['lo']
+RA = const.REG_INDEX['$ra']
+V0 = const.REG_INDEX['$v0']
+
+
+def nop(inter) -> None:
+    pass
+
+
+# Without the GUI (which can turn warnings on at any time) or warnings, the common integer instructions
+# read and write inter.regs directly instead of going through get_register / set_register.
+# Writes to $zero always go through set_register so it can raise the exception.
+def direct_access() -> bool:
+    return not settings['gui'] and not settings['warnings']
+
+
+# Same as instrs.overflow_detect
+def normalize(n: int) -> int:
+    return ((n + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+
+
+# Labels are resolved when the program is linked, so this only happens for instructions that weren't
+def invalid_label(label: str) -> Code:
+    def jump(inter):
+        raise ex.InvalidLabel(f'{label} is not a valid label.')
+
+    return jump
+
+
+def compile_rtype(instr: RType) -> Code:
+    op = instr.operation
+
+    # Instruction with 3 registers
+    if len(instr.regs) == 3:
+        rd, rs, rt = instr.regs
+
+        if is_float_single(op):
+            func = instrs.table[op[:-2] + '_f']
+
+            def rtype3_s(inter):
+                inter.set_reg_float(rd, func(inter.get_reg_float(rs), inter.get_reg_float(rt)))
+
+            return rtype3_s
+
+        elif is_float_double(op):
+            func = instrs.table[op[:-2] + '_f']
+
+            def rtype3_d(inter):
+                inter.set_reg_double(rd, func(inter.get_reg_double(rs), inter.get_reg_double(rt)))
+
+            return rtype3_d
+
+        func = instrs.table[op]
+
+        if op == 'movz' or op == 'movn':
+            move_on_zero = op == 'movz'
+
+            def move(inter):
+                rs_data = inter.get_register(rs)
+                rt_data = inter.get_register(rt)
+
+                if (rt_data == 0) == move_on_zero:
+                    inter.set_register(rd, func(rs_data, rt_data))
+
+            return move
+
+        if direct_access() and rd != 0:
+            def rtype3_direct(inter):
+                regs = inter.regs
+                regs[rd] = ((func(regs[rs], regs[rt]) + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+
+            return rtype3_direct
+
+        def rtype3(inter):
+            inter.set_register(rd, func(inter.get_register(rs), inter.get_register(rt)))
+
+        return rtype3
+
+    # Instruction with 2 registers
+    r1, r2 = instr.regs
+
+    if is_conversion_to_int(op):
+        func = instrs.table[op[:-4]]
+
+        if is_float_single(op):
+            def convert_s(inter):
+                inter.set_reg_float(r1, interpret_as_float(func(inter.get_reg_float(r2))))
+
+            return convert_s
+
+        def convert_d(inter):
+            inter.set_reg_float(r1, interpret_as_float(func(inter.get_reg_double(r2))))
+
+        return convert_d
+
+    elif is_float_single(op):
+        func = instrs.table[op[:-2]]
+
+        def rtype2_s(inter):
+            inter.set_reg_float(r1, func(inter.get_reg_float(r2)))
+
+        return rtype2_s
+
+    elif is_float_double(op):
+        func = instrs.table[op[:-2]]
+
+        def rtype2_d(inter):
+            inter.set_reg_double(r1, func(inter.get_reg_double(r2)))
+
+        return rtype2_d
+
+    if op in {'mult', 'multu', 'madd', 'maddu', 'msub', 'msubu'}:
+        signed = op[-1] != 'u'
+        accumulate = None
+
+        if 'mult' not in op:
+            accumulate = instrs.addu if 'add' in op else instrs.subu
+
+        def mult(inter):
+            # A 64 bit integer
+            low, high = instrs.mul(inter.get_register(r1), inter.get_register(r2), thirty_two_bits=False, signed=signed)
+
+            if accumulate:
+                low = accumulate(inter.get_register(LO), low)
+                high = accumulate(inter.get_register(HI), high)
+
+            # Set lo to lower 32 bits, and hi to upper 32 bits
+            inter.set_register(LO, low)
+            inter.set_register(HI, high)
+
+        return mult
+
+    elif op == 'div' or op == 'divu':
+        signed = op[-1] != 'u'
+
+        def div(inter):
+            result, remainder = instrs.div(inter.get_register(r1), inter.get_register(r2), signed=signed)
+
+            # Set lo to quotient, and hi to remainder
+            inter.set_register(LO, result)
+            inter.set_register(HI, remainder)
+
+        return div
+
+    func = instrs.table[op]
+
+    def rtype2(inter):
+        inter.set_register(r1, func(inter.get_register(r2)))
+
+    return rtype2
+
+
+def compile_itype(instr: IType) -> Code:
+    func = instrs.table[instr.operation]
+    rd, rs = instr.regs[0], instr.regs[1]
+    imm = instr.imm
+
+    if direct_access() and rd != 0:
+        def itype_direct(inter):
+            regs = inter.regs
+            regs[rd] = ((func(regs[rs], imm) + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+
+        return itype_direct
+
+    def itype(inter):
+        inter.set_register(rd, func(inter.get_register(rs), imm))
+
+    return itype
+
+
+def compile_jtype(instr: JType) -> Code:
+    link = instr.operation in {'jal', 'jalr'}
+
+    # j type instructions (Label)
+    if type(instr.target) is Label:
+        label = instr.target.name
+        addr = instr.target.addr
+
+        if addr is None:
+            return invalid_label(label)
+
+        def jump(inter):
+            regs = inter.regs
+
+            if link:
+                regs[RA] = regs[PC]
+
+            regs[PC] = addr
+
+        return jump
+
+    # j type instructions (Return)
+    target = instr.target
+
+    def jump_reg(inter):
+        regs = inter.regs
+
+        if link:
+            regs[RA] = regs[PC]
+
+        regs[PC] = regs[target]
+
+    return jump_reg
+
+
+def compile_load_imm(instr: LoadImm) -> Code:
+    if instr.operation != 'lui':
+        return nop
+
+    reg = instr.reg
+    upper = instrs.lui(instr.imm)
+
+    if direct_access() and reg != 0:
+        upper = normalize(upper)
+
+        def lui_direct(inter):
+            inter.regs[reg] = upper
+
+        return lui_direct
+
+    def lui(inter):
+        inter.set_register(reg, upper)
+
+    return lui
+
+
+def compile_load_mem(instr: LoadMem) -> Code:
+    op = instr.operation
+    reg = instr.reg
+    base = instr.addr
+    imm = instr.imm
+
+    # Loaded values are already signed 32 bit values
+    if direct_access() and op in {'lw', 'lh', 'lb', 'lhu', 'lbu'} and reg != 0:
+        func = instrs.table[op]
+
+        def load_direct(inter):
+            regs = inter.regs
+            regs[reg] = func(regs[base] + imm, inter.mem)
+
+        return load_direct
+
+    elif direct_access() and op in {'sw', 'sh', 'sb'}:
+        func = instrs.table[op]
+
+        def store_direct(inter):
+            regs = inter.regs
+            func(regs[base] + imm, inter.mem, regs[reg])
+
+        return store_direct
+
+    if op in {'lwr', 'lwl'}:
+        func = instrs.table[op]
+
+        def access(inter, addr):
+            inter.set_register(reg, func(addr, inter.mem, inter.get_register(reg)))
+
+    elif op in {'lw', 'lh', 'lb', 'lhu', 'lbu'}:
+        func = instrs.table[op]
+
+        def access(inter, addr):
+            inter.set_register(reg, func(addr, inter.mem))
+
+    elif op == 'l.s':
+        def access(inter, addr):
+            inter.set_reg_float(reg, inter.mem.getFloat(addr))
+
+    elif op == 'l.d':
+        def access(inter, addr):
+            inter.set_reg_double(reg, inter.mem.getDouble(addr))
+
+    elif op == 's.s':
+        def access(inter, addr):
+            inter.mem.addFloat(inter.get_reg_float(reg), addr)
+
+    elif op == 's.d':
+        def access(inter, addr):
+            inter.mem.addDouble(inter.get_reg_double(reg), addr)
+
+    else:  # Other store instructions
+        func = instrs.table[op]
+
+        def access(inter, addr):
+            func(addr, inter.mem, inter.get_register(reg))
+
+    if settings['gui']:
+        def load_mem_gui(inter):
+            access(inter, inter.get_register(base) + imm)
+            inter.events.on_mem_access()
+
+        return load_mem_gui
+
+    def load_mem(inter):
+        access(inter, inter.get_register(base) + imm)
+
+    return load_mem
+
+
+# Mfhi, mflo, mthi, mtlo
+def compile_move(instr: Move) -> Code:
+    op = instr.operation
+
+    if 'f' in op:
+        src = const.REG_INDEX[op[2:]]
+        dest = instr.reg
+
+    else:
+        src = instr.reg
+        dest = const.REG_INDEX[op[2:]]
+
+    if direct_access() and dest != 0:
+        def move_direct(inter):
+            regs = inter.regs
+            regs[dest] = regs[src]
+
+        return move_direct
+
+    def move(inter):
+        inter.set_register(dest, inter.get_register(src))
+
+    return move
+
+
+# Floating point move instructions
+def compile_move_float(instr: MoveFloat) -> Code:
+    op = instr.operation
+    rs = instr.rs
+    rt = instr.rt
+
+    if op == 'mfc1':
+        def mfc1(inter):
+            inter.set_register(rs, interpret_as_int(inter.get_reg_float(rt)))
+
+        return mfc1
+
+    elif op == 'mtc1':
+        def mtc1(inter):
+            inter.set_reg_float(rt, interpret_as_float(inter.get_register(rs)))
+
+        return mtc1
+
+    elif op[:4] in ['movn', 'movz']:
+        rd = instr.rd
+        move_on_zero = op[3] == 'z'
+
+        if is_float_single(op):
+            def move_s(inter):
+                if (inter.get_register(rd) == 0) == move_on_zero:
+                    inter.set_reg_float(rs, inter.get_reg_float(rt))
+
+            return move_s
+
+        def move_d(inter):
+            if (inter.get_register(rd) == 0) == move_on_zero:
+                inter.set_reg_double(rs, inter.get_reg_double(rt))
+
+        return move_d
+
+    return nop
+
+
+def compile_move_cond(instr: MoveCond) -> Code:
+    op = instr.operation
+    flag = instr.flag
+    move_on_true = op[3] == 't'
+    rs = instr.rs
+    rt = instr.rt
+
+    if is_float_single(op):
+        def move_s(inter):
+            if bool(inter.condition_flags[flag]) == move_on_true:
+                inter.set_reg_float(rs, inter.get_reg_float(rt))
+
+        return move_s
+
+    elif is_float_double(op):
+        def move_d(inter):
+            if bool(inter.condition_flags[flag]) == move_on_true:
+                inter.set_reg_double(rs, inter.get_reg_double(rt))
+
+        return move_d
+
+    def move(inter):
+        if bool(inter.condition_flags[flag]) == move_on_true:
+            inter.set_register(rs, inter.get_register(rt))
+
+    return move
+
+
+def compile_syscall(instr: Syscall) -> Code:
+    def syscall(inter):
+        code = inter.get_register(V0)
+
+        if code in syscalls and code in settings['enabled_syscalls']:
+            syscalls[code](inter)
+        else:
+            raise ex.InvalidSyscall('Not a valid syscall code:')
+
+    return syscall
+
+
+# Compare float
+def compile_compare(instr: Compare) -> Code:
+    op = instr.operation
+    rs = instr.rs
+    rt = instr.rt
+    flag = instr.flag
+    compare_op = op[2:4]
+
+    if compare_op == 'eq':
+        compare = lambda a, b: a == b
+    elif compare_op == 'le':
+        compare = lambda a, b: a <= b
+    else:
+        compare = lambda a, b: a < b
+
+    if is_float_single(op):
+        get = lambda inter, reg: inter.get_reg_float(reg)
+    else:
+        get = lambda inter, reg: inter.get_reg_double(reg)
+
+    def compare_float(inter):
+        a = get(inter, rs)
+        b = get(inter, rt)
+
+        if not 0 <= flag <= 7:
+            raise ex.InvalidArgument('Condition flag number must be between 0 - 7')
+
+        inter.condition_flags[flag] = compare(a, b)
+
+    return compare_float
+
+
+# Convert float
+def compile_convert(instr: Convert) -> Code:
+    format_from = instr.format_from
+    format_to = instr.format_to
+    rs = instr.rs
+    rt = instr.rt
+
+    if format_from == 'w':
+        get = lambda inter: inter.get_reg_word(rt)
+    elif format_from == 's':
+        get = lambda inter: inter.get_reg_float(rt)
+    else:
+        get = lambda inter: inter.get_reg_double(rt)
+
+    if format_to == 'w':
+        def convert(inter):
+            inter.set_reg_word(rs, int(get(inter)))
+
+    elif format_to == 's':
+        def convert(inter):
+            inter.set_reg_float(rs, float32(get(inter)))
+
+    else:
+        def convert(inter):
+            inter.set_reg_double(rs, float(get(inter)))
+
+    return convert
+
+
+def compile_branch(instr: Branch) -> Code:
+    op = instr.operation
+    func = instrs.table[op]
+    rs = instr.rs
+    rt = instr.rt
+    label = instr.label.name
+    addr = instr.label.addr
+
+    if 'z' in op:
+        taken = lambda inter: func(inter.get_register(rs))
+    else:
+        taken = lambda inter: func(inter.get_register(rs), inter.get_register(rt))
+
+    link = 'al' in op
+
+    if direct_access() and addr is not None and not link:
+        if 'z' in op:
+            def branch_zero_direct(inter):
+                regs = inter.regs
+
+                if func(regs[rs]):
+                    regs[PC] = addr
+
+            return branch_zero_direct
+
+        def branch_direct(inter):
+            regs = inter.regs
+
+            if func(regs[rs], regs[rt]):
+                regs[PC] = addr
+
+        return branch_direct
+
+    def branch(inter):
+        if taken(inter):
+            if addr is None:
+                raise ex.InvalidLabel(f'{label} is not a valid label.')
+
+            if link:
+                inter.regs[RA] = inter.regs[PC]
+
+            inter.regs[PC] = addr
+
+    return branch
+
+
+# Branches (float)
+def compile_branch_float(instr: BranchFloat) -> Code:
+    branch_on_true = instr.operation == 'bc1t'
+    flag = instr.flag
+    label = instr.label.name
+    addr = instr.label.addr
+
+    def branch_float(inter):
+        if bool(inter.condition_flags[flag]) == branch_on_true:
+            if addr is None:
+                raise ex.InvalidLabel(f'{label} is not a valid label.')
+
+            inter.regs[PC] = addr
+
+    return branch_float
+
+
+def compile_breakpoint(instr: Breakpoint) -> Code:
+    code = instr.code
+
+    def breakpoint(inter):
+        raise ex.BreakpointException(f'code = {code}')
+
+    return breakpoint
+
+
+compilers = {RType: compile_rtype,
+             IType: compile_itype,
+             JType: compile_jtype,
+             LoadImm: compile_load_imm,
+             LoadMem: compile_load_mem,
+             Move: compile_move,
+             MoveFloat: compile_move_float,
+             MoveCond: compile_move_cond,
+             Syscall: compile_syscall,
+             Compare: compile_compare,
+             Convert: compile_convert,
+             Branch: compile_branch,
+             BranchFloat: compile_branch_float,
+             Breakpoint: compile_breakpoint}
+
+
+def compile_instr(instr) -> Code:
+    # Anything without a compiler (Nop, TERMINATE_EXECUTION) does nothing when executed
+    if type(instr) in compilers:
+        return compilers[type(instr)](instr)
+
+    return nop
+
+
+def compile_text(text: List) -> List[Code]:
+    return [compile_instr(instr) for instr in text]
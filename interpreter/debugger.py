@@ -1,8 +1,16 @@
+import builtins
 import re
+import struct
+from typing import Callable, List, Tuple, Union
+
+from numpy import float32
 
 import constants as const
+from interpreter import utility
 from interpreter.classes import *
-from interpreter.exceptions import InvalidRegister
+from interpreter.events import SilentEvents
+from interpreter.exceptions import InvalidRegister, MemoryOutOfBounds
+from interpreter.journal import *
 from settings import settings
 
 '''
@@ -21,10 +29,43 @@ The above copyright notice and this permission notice shall be included in all c
 THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 '''
 
+HI = const.REG_INDEX['hi']
+LO = const.REG_INDEX['lo']
+V0 = const.REG_INDEX['$v0']
+A0 = const.REG_INDEX['$a0']
+A1 = const.REG_INDEX['$a1']
+A2 = const.REG_INDEX['$a2']
+RA = const.REG_INDEX['$ra']
+
+FLOAT = struct.Struct('<f')
+FLOAT_PAIR = struct.Struct('<ff')
+
+MULTIPLY = {'mult', 'multu', 'madd', 'maddu', 'msub', 'msubu', 'div', 'divu'}
+STORE_SIZES = {'sb': 1, 'sh': 2, 'sw': 4, 'swl': 4, 'swr': 4, 's.s': 4, 's.d': 8}
+# Syscalls that read input, use files or the random generator. Replaying them could give different results,
+# so what they did is recorded and replayed instead.
+RECORDED_SYSCALLS = {5, 8, 13, 14, 15, 16, 40, 41}
+# Where the syscalls that read into memory put what they read:
+# (register holding the address, register holding the size, bytes written past the size)
+SYSCALL_BUFFERS = {8: (A0, A1, 1), 14: (A1, A2, 0)}
+# Kinds of what decode_writes gives, besides the journal entry kinds it shares with journal.py: (REG, register index),
+# (HILO,), (FREG, number, name), (FREG_DOUBLE, number, name, name of the next register), (FLAG, flag) and (STEP,)
+STORE = -1  # (STORE, base register index, offset, size, address mask)
+SYSCALL = -2  # (SYSCALL,)
+# Most checkpoints kept at once. Past this, every other one is dropped and they are taken half as often.
+MAX_CHECKPOINTS = 64
+
+# One comparison of a breakpoint condition, e.g. $t0 == 5
+COMPARISON = re.compile(r'\s*(\S+?)\s*(==|!=|<=|>=|<|>)\s*(\S+?)\s*')
+# Sizes of the data types that watch and last-write can be given
+WATCH_SIZES = {'b': 1, 'h': 2, 'w': 4, 'f': 4, 'd': 8}
+
 
 def print_usage_text() -> None:
     print("USAGE:  [b]reak <filename> <line_no>\n\
-[d]elete: Clear all breakpoints\n\
+[b]reak <filename> <line_no> if <condition>: Break there only if the condition holds, e.g. $t0 == 5 && $t1 != $t2\n\
+[w]atch <label/address> <data_type/size>: Break after the value there changes\n\
+[d]elete: Clear all breakpoints and watchpoints\n\
 [n]ext: Step to the next instruction\n\
 [c]ontinue: Run until the next breakpoint\n\
 [i]nfo b: Print information about the breakpoints\n\
@@ -33,7 +74,9 @@ def print_usage_text() -> None:
 [p]rint <label> <data_type> <length> <format>\n\
 [q]uit: Terminate the program\n\
 [h]elp: Print this usage text\n\
-[r]everse: Step back to the previous instruction\n")
+[r]everse: Step back to the previous instruction\n\
+reverse-continue, rc: Run backwards to the previous breakpoint or change to a watched value\n\
+last-write <label/address> [data_type/size]: Find the last instruction that wrote there\n")
 
 
 def _print(cmd, interp):  # cmd = ['p', value, opts...]
@@ -241,6 +284,143 @@ def _print(cmd, interp):  # cmd = ['p', value, opts...]
     return True
 
 
+# Compile a breakpoint condition such as '$t0 == 5 && $t1 < $t2' into a function of no arguments, so checking it
+# costs no parsing. || separates alternatives, each made of comparisons joined by &&. Returns None if it isn't valid.
+def compile_condition(condition: str, regs: List[int]) -> Union[Callable[[], bool], None]:
+    def operand(x: str) -> Union[str, None]:
+        if x in const.REG_INDEX:
+            return f'regs[{const.REG_INDEX[x]}]'
+
+        try:
+            value = int(x, 0)
+
+        except ValueError:
+            return None
+
+        # Registers hold signed words, so an unsigned literal like 0xFFFFFFFF means the same bits
+        if 0x7FFFFFFF < value <= 0xFFFFFFFF:
+            value -= 1 << 32
+
+        return str(value)
+
+    alternatives = []
+
+    for alternative in condition.split('||'):
+        comparisons = []
+
+        for comparison in alternative.split('&&'):
+            match = COMPARISON.fullmatch(comparison)
+
+            if match is None:
+                return None
+
+            left = operand(match.group(1))
+            right = operand(match.group(3))
+
+            if left is None or right is None:
+                return None
+
+            comparisons.append(f'{left} {match.group(2)} {right}')
+
+        alternatives.append(' and '.join(comparisons))
+
+    # The source is built only from register indices and numbers
+    return eval(f'lambda: {" or ".join(alternatives)}', {'regs': regs})
+
+
+# What an instruction overwrites when it runs, e.g. (REG, register index), so push doesn't work it out each step
+def decode_writes(instr) -> Tuple:
+    def reg(r: Union[int, str]) -> Tuple:
+        return REG, REG_INDEX[r] if type(r) is str else r
+
+    def float_reg(r: str, double: bool) -> Tuple:
+        n = int(r[2:])
+
+        # An odd register can't hold a double, so the instruction will raise and only change that register
+        if double and not n & 1:
+            return FREG_DOUBLE, n, r, f'$f{n + 1}'
+
+        return FREG, n, r
+
+    kind = type(instr)
+
+    if kind is RType or kind is IType:
+        op = instr.operation
+
+        if op in MULTIPLY:
+            return HILO,
+        elif '.s' in op:
+            return float_reg(instr.regs[0], False)
+        elif '.d' in op:
+            return float_reg(instr.regs[0], True)
+
+        return reg(instr.regs[0])
+
+    elif kind is LoadImm or kind is Move:
+        return reg(instr.reg)
+
+    elif kind is JType or kind is Branch:
+        # jal, jalr, bgezal, bltzal
+        if 'al' in instr.operation:
+            return REG, RA
+
+    elif kind is LoadMem:
+        op = instr.operation
+
+        # Loads
+        if op[0] == 'l':
+            return float_reg(instr.reg, op[-1] == 'd') if '.' in op else reg(instr.reg)
+
+        # Stores
+        return STORE, reg(instr.addr)[1], instr.imm, STORE_SIZES[op], ~3 if op in {'swl', 'swr'} else -1
+
+    elif kind is Compare:
+        return FLAG, instr.flag
+
+    elif kind is Convert:
+        return float_reg(instr.rs, instr.format_to == 'd')
+
+    elif kind is MoveFloat or kind is MoveCond:
+        op = instr.operation
+
+        if op == 'mtc1':
+            return float_reg(instr.rt, False)
+        elif op == 'mfc1' or '.' not in op:  # mfc1, movf, movt
+            return reg(instr.rs)
+
+        return float_reg(instr.rs, op[-1] == 'd')
+
+    elif kind is Syscall:
+        return SYSCALL,
+
+    return STEP,  # other branches, nops, jr, j
+
+
+# Get the address and size of cmd = [..., label or address, data type or size]. None if they aren't valid.
+def location(cmd: List[str], interp) -> Union[Tuple[int, int], None]:
+    addr = interp.mem.getLabel(cmd[1])
+
+    try:
+        if addr is None:
+            addr = int(cmd[1], 0)
+
+        size = WATCH_SIZES[cmd[2]] if cmd[2] in WATCH_SIZES else int(cmd[2])
+
+    except ValueError:
+        return None
+
+    if size < 1:
+        return None
+
+    return addr, size
+
+
+# Describe the instruction at index idx of the text segment, with where it came from
+def describe(interp, idx: int) -> str:
+    instr = interp.mem.text[idx]
+    return f'{instr.basic_instr()}{utility.get_line_info(instr)}'
+
+
 def quit(cmd, interp) -> None:
     for i in range(3, len(interp.mem.fileTable)):
         interp.mem.fileTable[i].close()
@@ -251,11 +431,54 @@ def next(cmd, interp) -> bool:
     return False
 
 
+class Watchpoint:
+    def __init__(self, name: str, addr: int, size: int, value: bytes):
+        self.name = name  # Label or address, as it was given
+        self.addr = addr
+        self.size = size
+        self.value = value  # Contents when last checked
+
+    def format(self, value: bytes) -> str:
+        if self.size in WATCH_SIZES.values():
+            return str(int.from_bytes(value, 'little', signed=True))
+
+        return '0x' + value.hex()
+
+
+class SyscallRecord:
+    # What a syscall in RECORDED_SYSCALLS did, so replaying it gives the same results
+    def __init__(self, addr: int, size: int, before: Union[bytes, None]):
+        self.addr = addr  # Start and size of the memory it writes, if any
+        self.size = size
+        self.before = before  # Contents of that memory before and after it ran
+        self.after = None
+        self.v0 = None  # $v0 after it ran
+
+    def replay(self, interp) -> None:
+        interp.regs[V0] = self.v0
+
+        if self.after is not None:
+            interp.mem.poke(self.addr, self.after)
+
+
 class Debug:
     def __init__(self):
-        self.stack = []
+        # What the last instructions overwrote, and copies of the whole state taken every checkpoint_interval steps
+        self.journal = Journal(settings['reverse_depth'])
+        self.checkpoint_interval = settings['checkpoint_interval']
+        self.next_checkpoint = 0 if self.checkpoint_interval else float('inf')  # Step the next checkpoint is due at
+        self.writes = None  # What each instruction in the text segment writes, from decode_writes
+        self.checkpoints = []
+        self.records = {}  # Maps a step that ran a syscall in RECORDED_SYSCALLS to its SyscallRecord
+        self.pending = None  # Record of the last instruction, if it's one of those syscalls. Filled in once it has run.
+        self.replaying = False
         self.continueFlag = False
+        # (file name in quotes, line number) of each breakpoint, as they were given.
+        # (file name in quotes, line number, condition, compiled condition) for conditional ones
         self.breakpoints = []
+        self.breaks = set()  # Indices in the text segment of the instructions the breakpoints are on
+        self.conditions = {}  # Maps an index in breaks to its conditions, if it only has conditional breakpoints
+        self.watches = []
         self.handle = {'b': self.addBreakpoint,
                        'break': self.addBreakpoint,
                        'n': next,
@@ -266,12 +489,17 @@ class Debug:
                        'info': self.printBreakpoints,
                        'd': self.clearBreakpoints,
                        'delete': self.clearBreakpoints,
+                       'w': self.addWatchpoint,
+                       'watch': self.addWatchpoint,
                        'p': _print,
                        'print': _print,
                        'q': quit,
                        'quit': quit,
                        'r': self.reverse,
-                       'reverse': self.reverse}
+                       'reverse': self.reverse,
+                       'rc': self.reverse_continue,
+                       'reverse-continue': self.reverse_continue,
+                       'last-write': self.last_write}
 
     def listen(self, interp):
         def strip_marker(instr):
@@ -312,164 +540,459 @@ class Debug:
             if not self.continueFlag:
                 interp.pause_lock.clear()
 
-        self.push(interp)
-
-    def debug(self, instr) -> bool:
-        # Returns whether to break execution and ask for input to debugger.
-        # If continueFlag is true, then don't break execution.
-        filename = instr.filetag.file_name
-        lineno = str(instr.filetag.line_no)
-
-        if settings['debug'] and (filename, lineno) in self.breakpoints:
+    def debug(self, idx: int) -> bool:
+        # Returns whether to break execution before the instruction at index idx of the text segment
+        # and ask for input to debugger. If continueFlag is true, then don't break execution.
+        if idx in self.breaks and settings['debug'] and self.stops_at(idx):
             self.continueFlag = False
             return True
 
         if not self.continueFlag:
             return settings['debug']
 
-    def push(self, interp) -> None:
-        def is_float_single(x):
-            return '.s' in x
+    # Whether a breakpoint stops the program before the instruction at index idx of the text segment
+    def stops_at(self, idx: int) -> bool:
+        if idx not in self.breaks:
+            return False
 
-        def is_float_double(x):
-            return '.d' in x
+        conditions = self.conditions.get(idx)
+        return conditions is None or any(condition() for condition in conditions)
 
-        instr = interp.instr
-        prev = None
+    # Called after an instruction touches a watched page. Breaks before the next instruction if a watched value changed.
+    def check_watches(self, interp) -> None:
+        for watch, old, new in self.changed_watches(interp):
+            print(f'Watchpoint {watch.name} changed from {watch.format(old)} to {watch.format(new)}'
+                  f'{utility.get_line_info(interp.instr)}')
+            self.continueFlag = False
 
-        prev_pc = interp.reg['pc'] - 4
+    # Returns (watchpoint, old value, new value) for each watched value that changed since it was last checked
+    def changed_watches(self, interp) -> List[Tuple[Watchpoint, bytes, bytes]]:
+        changed = []
 
-        if type(instr) in {RType, IType}:
-            op = instr.operation
+        for watch in self.watches:
+            value = interp.mem.peek(watch.addr, watch.size)
 
-            if op in {'mult', 'multu', 'madd', 'maddu', 'msub', 'msubu', 'div', 'divu'}:
-                prev = MChange(interp.reg['hi'], interp.reg['lo'], prev_pc)
+            if value != watch.value:
+                changed.append((watch, watch.value, value))
+                watch.value = value
 
-            else:
-                dest_reg = instr.regs[0]
+        # Reading the watched pages above went through them too
+        interp.mem.watch_hit = False
+        return changed
 
-                if is_float_single(op):
-                    prev = RegChange(dest_reg, interp.f_reg[dest_reg], prev_pc)
-                elif is_float_double(op):
-                    prev = RegChange(dest_reg, interp.f_reg[dest_reg], prev_pc, is_double=True)
-                else:
-                    prev = RegChange(dest_reg, interp.reg[dest_reg], prev_pc)
+    # Take the current contents as the ones watchpoints compare against, e.g. after stepping back
+    def refresh_watches(self, interp) -> None:
+        for watch in self.watches:
+            watch.value = interp.mem.peek(watch.addr, watch.size)
 
-        elif type(instr) in {LoadImm, Move}:
-            prev = RegChange(instr.reg, interp.reg[instr.reg], prev_pc)
+        interp.mem.watch_hit = False
 
-        elif type(instr) is JType:
-            op = instr.operation
+    # Line the journal up with the interpreter. Instructions run without journaling can't be undone,
+    # so the entries from before them are dropped.
+    def sync(self, interp) -> None:
+        step = interp.instruction_count - 1  # The instruction fetched is counted already
 
-            # jal, jalr
-            if 'l' in op:
-                if type(instr.target) is Label:
-                    prev = RegChange('$ra', interp.reg['$ra'], prev_pc)
-                else:
-                    prev = RegChange(instr.target, interp.reg[instr.target], prev_pc)
+        if self.journal.steps != step:
+            self.journal.clear(step)
 
-        elif type(instr) is LoadMem:
-            op = instr.operation
+    def push(self, interp) -> None:
+        # Journal what the instruction about to run will overwrite, so it can be undone by reverse
+        journal = self.journal
+        regs = interp.regs
+        pc = regs[PC] - 4
+        step = interp.instruction_count - 1
 
-            # Loads
-            if op[0] == 'l':
-                if is_float_single(op):
-                    prev = RegChange(instr.reg, interp.f_reg[instr.reg], prev_pc)
-                elif is_float_double(op):
-                    prev = RegChange(instr.reg, interp.f_reg[instr.reg], prev_pc, is_double=True)
-                else:
-                    prev = RegChange(instr.reg, interp.reg[instr.reg], prev_pc)
+        if journal.steps != step:
+            journal.clear(step)
 
-            # Stores
-            else:
-                addr = interp.reg[instr.addr] + instr.imm
-
-                if is_float_single(op):
-                    prev = MemChange(addr, interp.mem.getFloat(addr), prev_pc, 'f')
-                elif is_float_double(op):
-                    prev = MemChange(addr, interp.mem.getDouble(addr), prev_pc, 'd')
-                elif op[1] == 'w':
-                    prev = MemChange(addr, interp.mem.getWord(addr), prev_pc, 'w')
-                elif op[1] == 'h':
-                    prev = MemChange(addr, interp.mem.getHWord(addr), prev_pc, 'h')
-                else:
-                    prev = MemChange(addr, interp.mem.getByte(addr), prev_pc, 'b')
+        if step >= self.next_checkpoint:
+            self.checkpoint(interp, step)
+
+        if self.writes is None:
+            self.writes = [decode_writes(instr) for instr in interp.mem.text]
 
-        elif type(instr) is Compare:
-            flag = instr.flag
-            prev = FlagChange(flag, interp.condition_flags[flag], prev_pc)
+        writes = self.writes[(pc - interp.mem.textBase) >> 2]
+        kind = writes[0]
 
-        elif type(instr) is Convert:
-            dest_reg = instr.rs
+        if kind == REG:
+            journal.push(REG, pc, writes[1], regs[writes[1]])
 
-            if instr.format_to == 'd':
-                prev = RegChange(dest_reg, interp.f_reg[dest_reg], prev_pc, is_double=True)
+        elif kind == STEP:
+            journal.push(STEP, pc)
+
+        elif kind == STORE:
+            addr = (regs[writes[1]] + writes[2]) & writes[4]
+            size = writes[3]
+            old = interp.mem.peek(addr, size)
+
+            # The store is going to fault, so there is nothing to undo
+            if old is None:
+                journal.push(STEP, pc)
             else:
-                prev = RegChange(dest_reg, interp.f_reg[dest_reg], prev_pc)
+                journal.push(MEM[size], pc, addr, int.from_bytes(old, 'little', signed=True))
+
+        elif kind == FREG:
+            bits = FLOAT.pack(interp.f_reg[writes[2]])
+            journal.push(FREG, pc, writes[1], int.from_bytes(bits, 'little', signed=True))
 
-        elif type(instr) is MoveFloat or type(instr) is MoveCond:
-            op = instr.operation
+        elif kind == FREG_DOUBLE:
+            bits = FLOAT_PAIR.pack(interp.f_reg[writes[2]], interp.f_reg[writes[3]])
+            journal.push(FREG_DOUBLE, pc, writes[1], int.from_bytes(bits, 'little', signed=True))
 
-            if op == 'mtc1':
-                prev = RegChange(instr.rt, interp.f_reg[instr.rt], prev_pc)
-            elif op == 'mfc1':
-                prev = RegChange(instr.rs, interp.reg[instr.rs], prev_pc)
-            elif is_float_single(op):
-                prev = RegChange(instr.rs, interp.f_reg[instr.rs], prev_pc)
+        elif kind == HILO:
+            journal.push(HILO, pc, regs[HI], regs[LO])
+
+        elif kind == FLAG:
+            journal.push(FLAG, pc, writes[1], int(interp.condition_flags[writes[1]]))
+
+        else:  # SYSCALL
+            code = regs[V0]
+
+            if code == 9:
+                journal.push(SBRK, pc, interp.mem.heapPtr, regs[V0])
             else:
-                prev = RegChange(instr.rs, interp.f_reg[instr.rs], prev_pc, is_double=True)
+                journal.push(REG, pc, V0, regs[V0])
 
-        else:  # branches, nops, jr, j
-            prev = Change(prev_pc)
+            if code in RECORDED_SYSCALLS and not self.replaying:
+                self.record(interp, step, code)
 
-        self.stack.append(prev)
+    # Called instead of push while the program runs freely, for instructions that need it. Nothing is journaled,
+    # but checkpoints are still taken and syscalls recorded, so the run can be replayed from them later.
+    def skip(self, interp) -> None:
+        step = interp.instruction_count - 1
 
-    def reverse(self, cmd, interp) -> bool:
-        def is_float_reg(reg):
-            return reg in const.F_REGS
+        if step >= self.next_checkpoint:
+            self.checkpoint(interp, step)
 
-        prev = None
-        if len(self.stack) > 0:
-            prev = self.stack.pop()
+        code = interp.regs[V0]
 
-            if type(prev) is RegChange:
-                if is_float_reg(prev.reg):
-                    if prev.is_double:
-                        interp.set_reg_double(prev.reg, prev.val)
-                    else:
-                        interp.set_reg_float(prev.reg, prev.val)
+        if type(interp.instr) is Syscall and code in RECORDED_SYSCALLS and self.checkpoint_interval:
+            self.record(interp, step, code)
 
+    def checkpoint(self, interp, step: int) -> None:
+        checkpoints = self.checkpoints
+        checkpoints.append(Checkpoint(interp, step, checkpoints[-1] if checkpoints else None))
+
+        # Long runs keep checkpoints all the way back to the start, just further apart
+        if len(checkpoints) > MAX_CHECKPOINTS:
+            self.checkpoints = checkpoints[::2]
+            self.checkpoint_interval *= 2
+
+        self.next_checkpoint = step + self.checkpoint_interval
+
+    # Newest checkpoint from at or before step, or None if there isn't one
+    def checkpoint_before(self, step: int) -> Union[Checkpoint, None]:
+        for checkpoint in reversed(self.checkpoints):
+            if checkpoint.step <= step:
+                return checkpoint
+
+        return None
+
+    # Start recording what the syscall at step does
+    def record(self, interp, step: int, code: int) -> None:
+        records = self.records
+
+        # Anything recorded after this comes from a different run, e.g. before the user stepped back and gave
+        # different input this time. Records are kept in step order, so that's only the case after stepping back.
+        if records and builtins.next(reversed(records)) >= step:  # This module's next is the debugger command
+            records = self.records = {s: record for s, record in records.items() if s < step}
+
+        if self.checkpoints and self.checkpoints[-1].step > step:
+            self.checkpoints = [checkpoint for checkpoint in self.checkpoints if checkpoint.step <= step]
+            self.next_checkpoint = self.checkpoints[-1].step + self.checkpoint_interval if self.checkpoints else 0
+
+        # Drop the records of steps nothing can go back to: before the journal's oldest entry, and before the oldest
+        # checkpoint, which replaying starts from
+        journal = self.journal
+        oldest = journal.steps - len(journal)
+
+        if self.checkpoints:
+            oldest = min(oldest, self.checkpoints[0].step)
+
+        while records and builtins.next(iter(records)) < oldest:
+            del records[builtins.next(iter(records))]
+
+        addr, size = 0, 0
+
+        if code in SYSCALL_BUFFERS:
+            addr_reg, size_reg, extra = SYSCALL_BUFFERS[code]
+            addr = interp.regs[addr_reg]
+            size = max(interp.regs[size_reg], 0) + extra
+
+        self.pending = self.records[step] = SyscallRecord(addr, size, interp.mem.peek(addr, size) if size else None)
+
+    # Fill in the record of the last instruction, now that it has run
+    def finish(self, interp) -> None:
+        record = self.pending
+
+        if record is not None:
+            record.v0 = interp.regs[V0]
+            record.after = interp.mem.peek(record.addr, record.size) if record.size else None
+            self.pending = None
+
+    # Undo the newest journal entry. Returns the pc of the instruction undone, or None if the journal is empty.
+    def undo(self, interp) -> Union[int, None]:
+        entry = self.journal.pop()
+
+        if entry is None:
+            return None
+
+        kind, pc, target, value = entry
+        regs = interp.regs
+
+        if kind == REG:
+            regs[target] = value
+
+        elif kind == HILO:
+            regs[HI] = target
+            regs[LO] = value
+
+        elif kind == FREG:
+            interp.f_reg[f'$f{target}'] = float32(FLOAT.unpack(value.to_bytes(4, 'little', signed=True))[0])
+
+        elif kind == FREG_DOUBLE:
+            low, high = FLOAT_PAIR.unpack(value.to_bytes(8, 'little', signed=True))
+            interp.f_reg[f'$f{target}'] = float32(low)
+            interp.f_reg[f'$f{target + 1}'] = float32(high)
+
+        elif kind == FLAG:
+            interp.condition_flags[target] = bool(value)
+
+        elif kind == SBRK:
+            interp.mem.heapPtr = target
+            regs[V0] = value
+
+        elif kind in MEM_SIZE:
+            interp.mem.poke(target, value.to_bytes(MEM_SIZE[kind], 'little', signed=True))
+
+        record = self.records.get(self.journal.steps)
+
+        if record is not None and record.before is not None:
+            interp.mem.poke(record.addr, record.before)
+
+        regs[PC] = pc + 4
+        interp.instr = interp.mem.text[interp.mem.textIndex(pc)]
+        interp.instruction_count -= 1
+
+        return pc
+
+    # Move to just before instruction number step ran. Steps after the current one must have run before.
+    # Returns whether there was enough history kept to get there.
+    def goto(self, interp, step: int) -> bool:
+        journal = self.journal
+        checkpoint = self.checkpoint_before(step)
+
+        # Start from a checkpoint if the journal doesn't go back far enough, or if it's closer than here
+        if step < journal.steps - len(journal) or checkpoint is not None and journal.steps < checkpoint.step:
+            if checkpoint is None:
+                return False
+
+            checkpoint.restore(interp)
+            journal.clear(checkpoint.step)
+
+        while journal.steps > step:
+            self.undo(interp)
+
+        self.forward(interp, step - journal.steps)
+        self.refresh_watches(interp)
+        interp.line_info = utility.get_line_info(interp.instr)
+        return True
+
+    # Run steps instructions again, with journaling, the same way the interpreter's run loop does.
+    # The instruction pc points after must already be fetched. Recorded syscalls are replayed, not run.
+    # scan is called with the number of each instruction after it runs.
+    def forward(self, interp, steps: int, scan: Callable[[int], None] = None) -> None:
+        text = interp.mem.text
+        code = interp.code
+        text_base = interp.mem.textBase
+        regs = interp.regs
+        journal = self.journal
+
+        # The user has already seen the output of these instructions
+        events = interp.events
+        interp.events = SilentEvents()
+        self.replaying = True
+
+        try:
+            for _ in range(steps):
+                step = journal.steps
+                self.push(interp)
+                record = self.records.get(step)
+
+                if record is not None:
+                    record.replay(interp)
                 else:
-                    interp.reg[prev.reg] = prev.val
-
-            elif type(prev) is MemChange:
-                if prev.type == 'f':
-                    interp.mem.addFloat(prev.val, prev.addr)
-                elif prev.type == 'd':
-                    interp.mem.addDouble(prev.val, prev.addr)
-                elif prev.type == 'w':
-                    interp.mem.addWord(prev.val, prev.addr)
-                elif prev.type == 'h':
-                    interp.mem.addHWord(prev.val, prev.addr)
-                else:
-                    interp.mem.addByte(prev.val, prev.addr)
+                    code[(regs[PC] - 4 - text_base) >> 2](interp)
 
-            elif type(prev) is MChange:
-                interp.reg['hi'] = prev.hi
-                interp.reg['lo'] = prev.lo
+                pc = regs[PC]
+                interp.instr = text[(pc - text_base) >> 2]
+                regs[PC] = pc + 4
+                interp.instruction_count += 1
 
-            elif type(prev) is FlagChange:
-                interp.condition_flags[prev.flag] = prev.value
+                if scan is not None:
+                    scan(step)
 
-            interp.reg['pc'] = prev.pc + 4
-            interp.instr = interp.mem.text[str(prev.pc)]
+        finally:
+            interp.events = events
+            self.replaying = False
 
+    # Let the GUI know where the program is now
+    def show(self, interp) -> None:
         if settings['gui']:
             print(interp.reg['pc'])
-            if prev != None:
-                interp.step.emit(prev.pc)
+            interp.events.on_step(interp.reg['pc'] - 4)
+
+    def reverse(self, cmd, interp) -> bool:
+        self.sync(interp)
+
+        if self.journal.steps > 0:
+            self.goto(interp, self.journal.steps - 1)
+
+        self.show(interp)
+        return True
+
+    # Run backwards until a breakpoint or a change to a watched value
+    def reverse_continue(self, cmd, interp) -> bool:
+        self.sync(interp)
+        journal = self.journal
+        mem = interp.mem
+        text_base = mem.textBase
+        stop = None
+
+        while stop is None and journal.steps > 0:
+            # Step back through the journal. A watched value changing means the instruction just undone wrote it.
+            while len(journal):
+                idx = (self.undo(interp) - text_base) >> 2
+
+                if mem.watch_hit and self.print_writes(self.changed_watches(interp), interp, idx) or \
+                        self.stops_at(idx):
+                    stop = journal.steps
+                    break
+
+            if stop is not None or journal.steps == 0:
+                break
+
+            # Past the journal, find the last stop between the newest checkpoint before here and here
+            end = journal.steps
+            checkpoint = self.checkpoint_before(end - 1)
+
+            if checkpoint is None:
+                break
+
+            checkpoint.restore(interp)
+            journal.clear(checkpoint.step)
+            self.refresh_watches(interp)
+
+            stops = []
+
+            if self.stops_at((interp.regs[PC] - 4 - text_base) >> 2):
+                stops.append((checkpoint.step, []))
+
+            def scan(step):
+                if mem.watch_hit:
+                    changed = self.changed_watches(interp)
+
+                    if changed:
+                        stops.append((step, [(watch, new, old) for watch, old, new in changed]))
+
+                if self.stops_at((interp.regs[PC] - 4 - text_base) >> 2):
+                    stops.append((step + 1, []))
+
+            self.forward(interp, end - checkpoint.step, scan)
+            stops = [(step, changed) for step, changed in stops if step < end]
+
+            if stops:
+                stop, changed = stops[-1]
+                self.goto(interp, stop)
+                self.print_writes(changed, interp, (interp.regs[PC] - 4 - text_base) >> 2)
+
             else:
-                interp.step.emit(settings['initial_pc'])
+                checkpoint.restore(interp)
+                journal.clear(checkpoint.step)
+
+        if stop is None:
+            print('No more history to run backwards through')
+
+        self.refresh_watches(interp)
+        interp.line_info = utility.get_line_info(interp.instr)
+        self.show(interp)
+        return True
+
+    # Print the watched values the instruction at index idx changes, given (watchpoint, value after, value before)
+    # for each. Returns whether there were any.
+    def print_writes(self, changed: List[Tuple[Watchpoint, bytes, bytes]], interp, idx: int) -> bool:
+        for watch, after, before in changed:
+            print(f'Watchpoint {watch.name} is changed from {watch.format(before)} to {watch.format(after)} by '
+                  f'{describe(interp, idx)}')
+
+        return len(changed) > 0
+
+    # Find the last instruction that wrote to an address
+    def last_write(self, cmd, interp) -> bool:  # cmd = ['last-write', label or address, data type or size]
+        if len(cmd) == 2:
+            cmd = cmd + ['b']
+
+        where = location(cmd, interp) if len(cmd) == 3 else None
+
+        if where is None:
+            print_usage_text()
+            return True
+
+        self.sync(interp)
+        addr, size = where
+        journal = self.journal
+        origin = journal.steps
+
+        # Whether a journal entry or syscall record shows step writing to [addr, addr + size)
+        def writes(step, kind, target):
+            if kind in MEM_SIZE:
+                return target < addr + size and addr < target + MEM_SIZE[kind]
+
+            record = self.records.get(step)
+            return record is not None and record.before is not None and \
+                record.addr < addr + size and addr < record.addr + record.size
+
+        found = None
+
+        for step, kind, pc, target, value in journal.recent():
+            if writes(step, kind, target):
+                found = step, pc
+                break
+
+        # Past the journal, run each stretch between checkpoints again, newest first
+        end = origin - len(journal)
+
+        while found is None and end > 0:
+            checkpoint = self.checkpoint_before(end - 1)
+
+            if checkpoint is None:
+                break
+
+            checkpoint.restore(interp)
+            journal.clear(checkpoint.step)
+            last = []
+
+            def scan(step):
+                entry = journal.newest()
+
+                if entry is not None and writes(entry[0], entry[1], entry[3]):
+                    last[:] = [(step, entry[2])]
+
+            self.forward(interp, end - checkpoint.step, scan)
+
+            if last:
+                found = last[0]
+
+            end = checkpoint.step
+
+        # Come back to where the program was
+        self.goto(interp, origin)
+
+        if found is None:
+            print(f'Nothing has written to {cmd[1]} in the history kept')
+        else:
+            step, pc = found
+            print(f'{describe(interp, interp.mem.textIndex(pc))} wrote to {cmd[1]} {origin - step} instructions ago')
 
         return True
 
@@ -480,24 +1003,97 @@ class Debug:
     def printBreakpoints(self, cmd, interp) -> bool:
         count = 1
         for b in self.breakpoints:
-            print(f'{count} {b[0]} {b[1]}')
+            condition = f' if {b[2]}' if len(b) > 2 else ''
+            print(f'{count} {b[0]} {b[1]}{condition}')
+            count += 1
+        for watch in self.watches:
+            print(f'{count} watch {watch.name} {watch.size}')
             count += 1
         return True
 
-    def addBreakpoint(self, cmd: List[str], interp) -> bool:  # cmd = ['b', filename, lineno]
-        if len(cmd) == 3 and str(cmd[2]).isdecimal():
-            self.breakpoints.append((f'"{cmd[1]}"', cmd[2]))  # filename, lineno
+    # cmd = ['b', filename, lineno], optionally followed by 'if' and a condition
+    def addBreakpoint(self, cmd: List[str], interp) -> bool:
+        if (len(cmd) == 3 or len(cmd) > 4 and cmd[3] == 'if') and str(cmd[2]).isdecimal():
+            filename = f'"{cmd[1]}"'
+
+            if (filename, int(cmd[2])) not in interp.mem.lines:
+                print(f'No instructions on line {cmd[2]} of {cmd[1]}')
+                return True
+
+            breakpoint = (filename, cmd[2])
+
+            if len(cmd) > 4:
+                condition = ' '.join(cmd[4:])
+                compiled = compile_condition(condition, interp.regs)
+
+                if compiled is None:
+                    print(f'Invalid condition: {condition}')
+                    return True
+
+                breakpoint += (condition, compiled)
+
+            self.breakpoints.append(breakpoint)
+            self.index_breakpoints(interp)
             return True
 
         print_usage_text()
         return True
 
+    # Work out the instructions to break on from self.breakpoints. Breakpoints are looked up by instruction,
+    # not by line, while running.
+    def index_breakpoints(self, interp) -> None:
+        self.breaks = set()
+        self.conditions = {}
+        unconditional = set()
+
+        for b in self.breakpoints:
+            indices = interp.mem.lines[(b[0], int(b[1]))]
+            self.breaks.update(indices)
+
+            if len(b) == 2:
+                unconditional.update(indices)
+            else:
+                for i in indices:
+                    self.conditions.setdefault(i, []).append(b[3])
+
+        for i in unconditional:
+            self.conditions.pop(i, None)
+
+    def addWatchpoint(self, cmd: List[str], interp) -> bool:  # cmd = ['watch', label or address, data type or size]
+        if len(cmd) != 3:
+            print_usage_text()
+            return True
+
+        where = location(cmd, interp)
+
+        if where is None:
+            print_usage_text()
+            return True
+
+        addr, size = where
+
+        try:
+            # Writes to the watched pages are noticed by the interpreter, so nothing else is checked while running
+            interp.mem.watch(addr, size)
+
+        except MemoryOutOfBounds as e:
+            print(e.message)
+            return True
+
+        self.watches.append(Watchpoint(cmd[1], addr, size, interp.mem.peek(addr, size)))
+        interp.mem.watch_hit = False
+        return True
+
     def clearBreakpoints(self, cmd: List[str], interp) -> bool:
         if len(cmd) == 1:
             self.breakpoints = []
+            self.index_breakpoints(interp)
+            self.watches = []
+            interp.mem.unwatch()
         else:
             print_usage_text()
         return True
 
-    def removeBreakpoint(self, cmd: List[str], interp) -> None:
+    def removeBreakpoint(self, cmd: List[str], interp) -> None:  # cmd = [filename in quotes, lineno]
         self.breakpoints.remove((cmd[0], cmd[1]))
+        self.index_breakpoints(interp)
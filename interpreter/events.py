@@ -0,0 +1,42 @@
+'''
+https://github.com/sbustars/STARS
+
+Copyright 2020 Kevin McDonnell, Jihu Mun, and Ian Peitzsch
+
+Developed by Kevin McDonnell (ktm@cs.stonybrook.edu),
+Jihu Mun (jihu1011@gmail.com),
+and Ian Peitzsch (irpeitzsch@gmail.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+
+class EventSink:
+    # Receives the events an Interpreter reports while it runs. Only console output does anything
+    # by default; subclasses override whichever events they care about.
+
+    def on_step(self, pc: int) -> None:
+        pass
+
+    def on_console_out(self, s: str) -> None:
+        print(s, end='')
+
+    def on_end(self, running: bool) -> None:
+        pass
+
+    def on_start(self) -> None:
+        pass
+
+    def on_mem_access(self) -> None:
+        pass
+
+
+class SilentEvents(EventSink):
+    # Drops console output too. Used when the debugger runs instructions again that the user has already seen.
+
+    def on_console_out(self, s: str) -> None:
+        pass
@@ -0,0 +1,416 @@
+import select
+import socket
+import struct
+import sys
+from typing import Tuple, Union
+
+from numpy import float32
+
+import constants as const
+from interpreter import exceptions as ex
+from interpreter.debugger import Watchpoint
+
+'''
+https://github.com/sbustars/STARS
+
+Copyright 2020 Kevin McDonnell, Jihu Mun, and Ian Peitzsch
+
+Developed by Kevin McDonnell (ktm@cs.stonybrook.edu),
+Jihu Mun (jihu1011@gmail.com),
+and Ian Peitzsch (irpeitzsch@gmail.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+# GDB's numbers for the MIPS registers, when the target doesn't describe them: $0-$31, then these,
+# then $f0-$f31 and the two floating point control registers
+SR = 32
+LO = 33
+HI = 34
+BAD = 35
+CAUSE = 36
+PC = 37
+FP = 38
+FCSR = 70
+FIR = 71
+NUM_REGS = 72
+
+# Where GDB's integer registers are in Interpreter.regs. The others GDB knows of don't exist here and read as 0.
+REGS = {**{n: n for n in range(32)}, LO: const.REG_INDEX['lo'], HI: const.REG_INDEX['hi'], PC: const.REG_INDEX['pc']}
+FLOAT = struct.Struct('<f')  # Registers are sent in the target's byte order, which is little endian
+
+SIGINT = 2
+SIGABRT = 6
+SIGTRAP = 5
+# Signals to report to GDB when the program raises one of these. Anything else is reported as SIGABRT.
+SIGNALS = {ex.MemoryOutOfBounds: 11, ex.MemoryAlignmentError: 10, ex.ArithmeticOverflow: 8, ex.DivisionByZero: 8,
+           ex.InstrCountExceed: 24}
+EFAULT = 'E0e'  # Error replies, as errno values
+EINVAL = 'E16'
+# What GDB reads for each instruction in the text segment. Instructions aren't kept as machine code, so every one
+# reads as a nop (sll $0, $0, 0), which is enough for GDB to step over it and walk the stack.
+TEXT_WORD = bytes(4)
+
+INTERRUPT = '\x03'  # Sent by GDB on its own, outside of a packet, when the user presses ctrl-c
+# Instructions run between checks for an interrupt while continuing
+CHUNK = 10_000
+
+
+def ok(packet: str) -> str:
+    return 'OK'
+
+
+# The type, address and kind of a Z or z packet, without the conditions and commands GDB may add after them
+def breakpoint_args(packet: str) -> Tuple[int, int, int]:
+    kind, addr, size = (int(x, 16) for x in packet[1:].split(';')[0].split(','))
+    return kind, addr, size
+
+
+def checksum(data: bytes) -> str:
+    return f'{sum(data) & 0xFF:02x}'
+
+
+class GdbStub:
+    # Serves the GDB remote serial protocol on localhost for one interpreter, so GDB or a front end built on it can
+    # debug the program. Between stops the program runs in Interpreter.run_until, not one debugger call per step.
+    def __init__(self, interp, port: int):
+        self.interp = interp
+        self.debug = interp.debug  # Its breaks are the breakpoints GDB sets, and its watches the watchpoints
+        self.server = socket.create_server(('localhost', port))
+        self.port = self.server.getsockname()[1]  # port 0 picks any free one
+        self.conn = None
+        self.buffer = b''  # Received, but not read as a packet yet
+        self.last = b''  # Last packet sent, in case GDB asks for it again
+        self.done = False
+        self.detached = False
+        self.exit_code = None  # Set if the program called exit
+        self.handle = {'?': self.halt_reason,
+                       'g': self.read_registers,
+                       'G': self.write_registers,
+                       'p': self.read_register,
+                       'P': self.write_register,
+                       'm': self.read_memory,
+                       'M': self.write_memory,
+                       'Z': self.add_breakpoint,
+                       'z': self.remove_breakpoint,
+                       's': self.step,
+                       'S': self.step,
+                       'c': self.cont,
+                       'C': self.cont,
+                       'q': self.query,
+                       'H': ok,
+                       'D': self.detach,
+                       'k': self.kill}
+
+    def serve(self) -> None:
+        print(f'Waiting for GDB on localhost:{self.port}', file=sys.stderr)
+        self.conn, _ = self.server.accept()
+        self.server.close()
+
+        try:
+            while not self.done:
+                packet = self.read_packet()
+
+                if packet is None:  # GDB went away
+                    break
+
+                # Nothing is running to interrupt
+                if packet == INTERRUPT:
+                    continue
+
+                handler = self.handle.get(packet[:1])
+                reply = handler(packet) if handler is not None else ''
+
+                if reply is not None:
+                    self.send(reply)
+
+        finally:
+            self.conn.close()
+
+        if self.exit_code is not None:
+            exit(self.exit_code)
+
+        # The rest of the program runs without a debugger
+        if self.detached:
+            self.interp.interpret_headless()
+
+    # Next packet from GDB, without its framing, or INTERRUPT, or None once GDB has disconnected
+    def read_packet(self) -> Union[str, None]:
+        while True:
+            buffer = self.buffer
+            start = 0
+
+            # Acknowledgements come between packets
+            while start < len(buffer) and buffer[start] != ord('$'):
+                if buffer[start] == ord(INTERRUPT):
+                    self.buffer = buffer[start + 1:]
+                    return INTERRUPT
+
+                if buffer[start] == ord('-'):
+                    self.conn.sendall(self.last)
+
+                start += 1
+
+            buffer = self.buffer = buffer[start:]
+            end = buffer.find(b'#')
+
+            if end >= 0 and len(buffer) >= end + 3:
+                data = buffer[1:end]
+                self.buffer = buffer[end + 3:]
+
+                if buffer[end + 1:end + 3].decode('latin-1').lower() == checksum(data):
+                    self.conn.sendall(b'+')
+                    return data.decode('latin-1')
+
+                self.conn.sendall(b'-')
+                continue
+
+            received = self.conn.recv(4096)
+
+            if not received:
+                return None
+
+            self.buffer += received
+
+    def send(self, reply: str) -> None:
+        data = reply.encode('latin-1')
+        self.last = b'$' + data + b'#' + checksum(data).encode('latin-1')
+        self.conn.sendall(self.last)
+
+    # Whether GDB has sent an interrupt while the program was running
+    def interrupted(self) -> bool:
+        if not select.select([self.conn], [], [], 0)[0]:
+            return False
+
+        received = self.conn.recv(4096)
+
+        # GDB went away, so there is no one to run for
+        if not received:
+            self.done = True
+            return True
+
+        self.buffer += received.replace(INTERRUPT.encode('latin-1'), b'')
+        return INTERRUPT.encode('latin-1') in received
+
+    def halt_reason(self, packet: str) -> str:
+        return f'S{SIGTRAP:02x}'
+
+    # Contents of GDB's register n, in target byte order
+    def register(self, n: int) -> bytes:
+        interp = self.interp
+
+        if n in REGS:
+            return (interp.regs[REGS[n]] & 0xFFFFFFFF).to_bytes(4, 'little')
+
+        if FP <= n < FP + 32:
+            return FLOAT.pack(interp.f_reg[f'$f{n - FP}'])
+
+        # Condition flag 0 is bit 23 of the FCSR, and flags 1-7 are bits 25-31
+        if n == FCSR:
+            bits = 0
+
+            for flag, value in enumerate(interp.condition_flags):
+                if value:
+                    bits |= 1 << (23 if flag == 0 else 24 + flag)
+
+            return bits.to_bytes(4, 'little')
+
+        return bytes(4)
+
+    def set_register(self, n: int, data: bytes) -> None:
+        interp = self.interp
+
+        if n in REGS:
+            # $zero stays 0
+            if n:
+                interp.regs[REGS[n]] = int.from_bytes(data, 'little', signed=True)
+                interp.reg_initialized.add(REGS[n])
+
+        elif FP <= n < FP + 32:
+            interp.f_reg[f'$f{n - FP}'] = float32(FLOAT.unpack(data)[0])
+
+        elif n == FCSR:
+            bits = int.from_bytes(data, 'little')
+
+            for flag in range(len(interp.condition_flags)):
+                interp.condition_flags[flag] = bool(bits >> (23 if flag == 0 else 24 + flag) & 1)
+
+    def read_registers(self, packet: str) -> str:  # packet = 'g'
+        return b''.join(self.register(n) for n in range(NUM_REGS)).hex()
+
+    def write_registers(self, packet: str) -> str:  # packet = 'G' + hex of every register
+        data = bytes.fromhex(packet[1:])
+
+        for n in range(min(len(data) // 4, NUM_REGS)):
+            self.set_register(n, data[4 * n:4 * n + 4])
+
+        return 'OK'
+
+    def read_register(self, packet: str) -> str:  # packet = 'p' + register number
+        return self.register(int(packet[1:], 16)).hex()
+
+    def write_register(self, packet: str) -> str:  # packet = 'P' + register number + '=' + hex value
+        n, value = packet[1:].split('=')
+        self.set_register(int(n, 16), bytes.fromhex(value))
+        return 'OK'
+
+    def read_memory(self, packet: str) -> str:  # packet = 'm' + address + ',' + length
+        addr, length = (int(x, 16) for x in packet[1:].split(','))
+        mem = self.interp.mem
+        text = b''
+
+        # The part in the text segment reads as placeholder words and can't be written
+        if mem.textBase <= addr < mem.textPtr:
+            end = min(addr + length, mem.textPtr)
+            text = (TEXT_WORD * ((end - mem.textBase + 3) // 4))[addr - mem.textBase:end - mem.textBase]
+            addr, length = end, addr + length - end
+
+        data = mem.peek(addr, length) if length else b''
+        mem.watch_hit = False
+
+        # GDB takes a short reply as reading up to where the fault was
+        if data is None:
+            return text.hex() if text else EFAULT
+
+        return (text + data).hex()
+
+    def write_memory(self, packet: str) -> str:  # packet = 'M' + address + ',' + length + ':' + hex data
+        where, data = packet[1:].split(':')
+        addr = int(where.split(',')[0], 16)
+
+        try:
+            self.interp.mem.poke(addr, bytes.fromhex(data))
+
+        except ex.MemoryOutOfBounds:
+            return EFAULT
+
+        # GDB changing a watched value isn't the program writing to it
+        self.debug.refresh_watches(self.interp)
+        return 'OK'
+
+    # Breakpoints are on instructions, so the text segment index of one is all that's kept.
+    # Write watchpoints go to the debugger's watches, which the interpreter notices writes to.
+    def add_breakpoint(self, packet: str) -> str:  # packet = 'Z' + type + ',' + address + ',' + kind
+        kind, addr, size = breakpoint_args(packet)
+        mem = self.interp.mem
+
+        # Software and hardware breakpoints
+        if kind in {0, 1}:
+            idx = mem.textIndex(addr)
+
+            if idx is None:
+                return EINVAL
+
+            self.debug.breaks.add(idx)
+            return 'OK'
+
+        # Write watchpoints. Read and access ones aren't supported.
+        if kind == 2:
+            try:
+                mem.watch(addr, size)
+
+            except ex.MemoryOutOfBounds:
+                return EFAULT
+
+            self.debug.watches.append(Watchpoint(f'0x{addr:08x}', addr, size, mem.peek(addr, size)))
+            mem.watch_hit = False
+            return 'OK'
+
+        return ''
+
+    def remove_breakpoint(self, packet: str) -> str:  # packet = 'z' + type + ',' + address + ',' + kind
+        kind, addr, size = breakpoint_args(packet)
+        interp = self.interp
+
+        if kind in {0, 1}:
+            self.debug.breaks.discard(interp.mem.textIndex(addr))
+            return 'OK'
+
+        if kind == 2:
+            watches = self.debug.watches = [w for w in self.debug.watches if (w.addr, w.size) != (addr, size)]
+            interp.mem.unwatch()
+
+            for watch in watches:
+                interp.mem.watch(watch.addr, watch.size)
+
+            interp.mem.watch_hit = False
+            return 'OK'
+
+        return ''
+
+    # Go to the address given after the packet's type (and signal, for S and C), if there is one.
+    # The signal is dropped, since the program has no handlers for it.
+    def jump(self, packet: str) -> None:
+        if packet[0] in {'S', 'C'}:
+            addr = packet.split(';')[1] if ';' in packet else ''
+        else:
+            addr = packet[1:]
+
+        if addr:
+            self.interp.regs[REGS[PC]] = int(addr, 16)
+
+    def step(self, packet: str) -> str:  # packet = 's' [address] or 'S' signal [';' address]
+        self.jump(packet)
+        return self.resume(1)
+
+    def cont(self, packet: str) -> str:  # packet = 'c' [address] or 'C' signal [';' address]
+        self.jump(packet)
+        return self.resume(None)
+
+    # Run the program until a breakpoint, a watched value changes, GDB interrupts it or it ends. steps limits how
+    # many instructions run, or None for no limit. Returns the stop reply for GDB.
+    def resume(self, steps: Union[int, None]) -> str:
+        interp = self.interp
+        mem = interp.mem
+        debug = self.debug
+
+        try:
+            while True:
+                if interp.run_until(debug.breaks, CHUNK if steps is None else steps):
+                    self.done = True
+                    return 'W00'
+
+                if mem.watch_hit:
+                    changed = debug.changed_watches(interp)
+
+                    if changed:
+                        return f'T{SIGTRAP:02x}watch:{changed[0][0].addr:x};'
+
+                if steps is not None or mem.textIndex(interp.regs[REGS[PC]]) in debug.breaks:
+                    return f'S{SIGTRAP:02x}'
+
+                if self.interrupted():
+                    return f'S{SIGINT:02x}'
+
+        except SystemExit as e:
+            self.done = True
+            self.exit_code = e.code or 0
+            return f'W{self.exit_code & 0xFF:02x}'
+
+        # The program can't go on past this, but it's stopped where it happened so GDB can look around
+        except Exception as e:
+            print(f'{type(e).__name__}: {getattr(e, "message", str(e))}', file=sys.stderr)
+            return f'S{SIGNALS.get(type(e), SIGABRT):02x}'
+
+    def query(self, packet: str) -> str:
+        if packet.startswith('qSupported'):
+            return 'PacketSize=4000'
+
+        # The program was started for GDB, so there's nothing left running once GDB is done with it
+        if packet == 'qAttached':
+            return '0'
+
+        return ''
+
+    def detach(self, packet: str) -> str:
+        self.done = True
+        self.detached = True
+        return 'OK'
+
+    # GDB doesn't wait for a reply to this
+    def kill(self, packet: str) -> None:
+        self.done = True
@@ -581,6 +581,8 @@ table = {'abs': _abs,
          'bgtz': bgtz,
          'bgez': bgez,
          'bne': bne,
+         'bgezal': bgez,
+         'bltzal': bltz,
          'jal': jal,
          'jalr': jalr,
          'b': j,
@@ -1,19 +1,18 @@
-import os
 import random
 import re
 import struct
 import sys
-from collections import OrderedDict
 from threading import Event, Lock
+from typing import Dict, List, Set, Union
 
-from PySide2.QtCore import Signal
-from PySide2.QtWidgets import QWidget
 from numpy import float32
 
 import constants as const
-from interpreter import exceptions as ex, instructions as instrs
+from interpreter import blocks, exceptions as ex, instructions as instrs
 from interpreter.classes import *
+from interpreter.compiler import compile_instr, compile_text
 from interpreter.debugger import Debug
+from interpreter.events import EventSink
 from interpreter.memory import Memory
 from interpreter.syscalls import syscalls
 from settings import settings
@@ -35,18 +34,53 @@ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLI
 '''
 
 
-class Interpreter(QWidget):
-    step = Signal(int)
-    console_out = Signal(str)
-    end = Signal(bool)
-    start = Signal()
-    mem_access = Signal()
+PC = const.REG_INDEX['pc']
 
+# Registers that give a warning when read before being written to
+WARN_UNINITIALIZED = {i for i, r in enumerate(const.REGS) if r[1] in {'s', 't', 'a', 'v'} and r not in {'$at', '$sp'}}
+
+
+# Values too small or too large for a float are stored as 0 or infinity
+def to_float32(data: float) -> float32:
+    if abs(data) < const.FLOAT_MIN:
+        return float32(0)
+    elif data > const.FLOAT_MAX:
+        return float32('inf')
+    elif data < -const.FLOAT_MAX:
+        return float32('-inf')
+
+    return float32(data)
+
+
+# Remove the quotation marks and handle the escape sequences of a string declaration
+def pack_string(data: str) -> bytes:
+    return utility.encode_string(utility.handle_escapes(data[1: -1]))
+
+
+# Build the bytes a declaration takes up in memory (little endian), keyed by declaration type
+packers = {
+    'asciiz': lambda data: pack_string(data) + b'\0',
+    'ascii': pack_string,
+    'byte': lambda data: bytes(d & 0xFF for d in data),
+    'half': lambda data: struct.pack(f'<{len(data)}H', *[d & 0xFFFF for d in data]),
+    'word': lambda data: struct.pack(f'<{len(data)}I', *[d & 0xFFFFFFFF for d in data]),
+    'float': lambda data: struct.pack(f'<{len(data)}f', *[to_float32(d) for d in data]),
+    'double': lambda data: struct.pack(f'<{len(data)}d', *data),
+}
+
+# Declarations that have to be aligned, and their alignment in bytes
+alignments = {
+    'half': 2,
+    'word': 4,
+    'float': 4,
+    'double': 8,
+}
+
+
+class Interpreter:
     def out(self, s: str, end='') -> None:
-        if settings['gui']:
-            self.console_out.emit(f'{s}{end}')
-        else:
-            print(s, end=end)
+        # str() rather than an f-string so numpy floats print the same way print() shows them
+        self.events.on_console_out(str(s) + end)
 
     def input(self):
         if settings['gui']:
@@ -56,12 +90,13 @@ class Interpreter(QWidget):
         else:
             return input()
 
-    def __init__(self, code: List, args: List[str]):
-        if settings['gui']:
-            super().__init__()
-
+    def __init__(self, code: List, args: List[str], events: EventSink = None):
+        # Where step, console output, start, end and memory access events are reported
+        self.events = events if events is not None else EventSink()
         self.reg_initialized = set()
-        self.reg = OrderedDict()
+        # Integer register file, indexed the same as const.REGS
+        self.regs = [0] * len(const.REGS)
+        self._reg = RegisterView(self.regs)
         self.f_reg = dict()
         self.condition_flags = [False] * 8
 
@@ -70,8 +105,9 @@ class Interpreter(QWidget):
         self.lock_input = Lock()
         self.input_str = None
 
+        self.random = random.Random(settings['seed'])  # Source of garbage data
         self.init_registers(settings['garbage_registers'])
-        self.mem = Memory(settings['garbage_memory'])
+        self.mem = Memory(settings['garbage_memory'], self.random)
 
         self.instruction_count = 0
         self.line_info = ''
@@ -81,6 +117,9 @@ class Interpreter(QWidget):
         self.has_main = False
         self.initialize_memory(code, args)
 
+        # Every instruction is decoded once, up front. self.code[i] executes self.mem.text[i]
+        self.code = compile_text(self.mem.text)
+
     def initialize_memory(self, code: List, args: List[str]):
         if len(args) > 0:
             self.handleArgs(args)
@@ -94,81 +133,21 @@ class Interpreter(QWidget):
                 if line.label:
                     self.mem.addLabel(line.label.name, self.mem.dataPtr)
 
-                if data_type == 'asciiz':
-                    # A null-terminated string
-                    # There could be multiple strings separated by commas
-                    # Add the string to memory and increment address in memory
-                    s = line.data[1: -1]  # Remove quotation marks
-                    s = utility.handle_escapes(s)
-
-                    self.mem.addAsciiz(s, self.mem.dataPtr)
-                    self.mem.dataPtr += len(s) + 1
-
-                elif data_type == 'ascii':
-                    # A regular string
-                    s = line.data[1: -1]
-                    s = utility.handle_escapes(s)
-
-                    self.mem.addAscii(s, self.mem.dataPtr)
-                    self.mem.dataPtr += len(s)
-
-                elif data_type == 'byte':
-                    for data in line.data:
-                        self.mem.addByte(data, self.mem.dataPtr)
-                        self.mem.dataPtr += 1
-
-                elif data_type == 'word':
-                    mod = self.mem.dataPtr % 4
-                    if mod != 0:
-                        self.mem.dataPtr += (4 - mod)
-                    for data in line.data:
-                        self.mem.addWord(data, self.mem.dataPtr)
-                        self.mem.dataPtr += 4
-
-                elif data_type == 'half':
-                    mod = self.mem.dataPtr % 2
+                if data_type in packers:
+                    # Align the data, then copy all of it into memory at once
+                    align = alignments.get(data_type, 1)
+                    mod = self.mem.dataPtr % align
                     if mod != 0:
-                        self.mem.dataPtr += (2 - mod)
-                    for data in line.data:
-                        self.mem.addHWord(data, self.mem.dataPtr)
-                        self.mem.dataPtr += 2
+                        self.mem.dataPtr += (align - mod)
 
-                elif data_type == 'float':
-                    mod = self.mem.dataPtr % 4
-                    if mod != 0:
-                        self.mem.dataPtr += (4 - mod)
-                    for data in line.data:
-                        data_f32 = 0.0
-
-                        if abs(data) < const.FLOAT_MIN:
-                            data_f32 = float32(0)
-                        elif data > const.FLOAT_MAX:
-                            data_f32 = float32('inf')
-                        elif data < -const.FLOAT_MAX:
-                            data_f32 = float32('-inf')
-                        else:
-                            data_f32 = float32(data)
-
-                        self.mem.addFloat(data_f32, self.mem.dataPtr)
-                        self.mem.dataPtr += 4
-
-                elif data_type == 'double':
-                    mod = self.mem.dataPtr % 8
-                    if mod != 0:
-                        self.mem.dataPtr += (8 - mod)
-                    for data in line.data:
-                        self.mem.addDouble(data, self.mem.dataPtr)
-                        self.mem.dataPtr += 8
+                    data = packers[data_type](line.data)
+                    self.mem.addBytes(data, self.mem.dataPtr)
+                    self.mem.dataPtr += len(data)
 
                 elif data_type == 'space':
                     for data in line.data:
-                        for j in range(data):
-                            if settings['garbage_memory']:
-                                self.mem.addByte(random.randint(0, 0xFF), self.mem.dataPtr)
-                            else:
-                                self.mem.addByte(0, self.mem.dataPtr)
-
-                            self.mem.dataPtr += 1
+                        self.mem.addSpace(data, self.mem.dataPtr)
+                        self.mem.dataPtr += data
 
                 elif data_type == 'align':
                     if not 0 <= line.data <= 3:
@@ -198,20 +177,48 @@ class Interpreter(QWidget):
         if not self.has_main:
             raise ex.NoMainLabel('Could not find main label')
 
+        self.link_labels(code)
+
+        # Special instruction to terminate execution after every instruction has been executed
+        self.mem.addText('TERMINATE_EXECUTION')
+
+    def link_labels(self, code: List) -> None:
+        # Resolve every label used as an operand to its address, so nothing is looked up while running.
+        # All of the undefined labels are reported together.
+        errors = []
+
+        def resolve(label: Label, instr) -> Union[int, None]:
+            addr = self.mem.getLabel(label.name)
+
+            if not addr:
+                errors.append(f'{label.name} is not a valid label.{utility.get_line_info(instr)}')
+                return None
+
+            label.addr = addr
+            return addr
+
         comp = re.compile(r'(lb[u]?|lh[u]?|lw[lr]|lw|la|s[bhw]|sw[lr])')
 
-        for line in code:  # Replace the labels in load/store instructions by the actual address
+        for line in code:
             if type(line) is PseudoInstr and comp.match(line.operation):
-                addr = self.mem.getLabel(line.label.name)
+                # Replace the labels in load/store instructions by the actual address
+                addr = resolve(line.label, line.instrs[0])
 
                 if addr:
                     line.instrs[0].imm = (addr >> 16) & 0xFFFF
                     line.instrs[1].imm = addr & 0xFFFF
-                else:
-                    raise ex.InvalidLabel(f'{line.label.name} is not a valid label. {self.line_info}')
 
-        # Special instruction to terminate execution after every instruction has been executed
-        self.mem.addText('TERMINATE_EXECUTION')
+                continue
+
+            for instr in line.instrs if type(line) is PseudoInstr else [line]:  # Branch and jump targets
+                if type(instr) in {Branch, BranchFloat}:
+                    resolve(instr.label, instr)
+
+                elif type(instr) is JType and type(instr.target) is Label:
+                    resolve(instr.target, instr)
+
+        if errors:
+            raise ex.InvalidLabel('\n'.join(errors))
 
     def handleArgs(self, args: List[str]) -> None:
         saveAddr = settings['data_max'] - 3
@@ -230,49 +237,54 @@ class Interpreter(QWidget):
         self.reg['$a0'] = len(args)
         self.reg['$a1'] = temp + 4
 
+    # Name-keyed view of the register file
+    @property
+    def reg(self) -> RegisterView:
+        return self._reg
+
+    # Assigning a mapping of register names to values sets those registers
+    @reg.setter
+    def reg(self, values: Dict[str, int]) -> None:
+        self._reg.update(values)
+
     def init_registers(self, randomize: bool) -> None:
         for r in const.REGS:
             if f'initial_{r}' in settings.keys():
                 self.reg[r] = settings[f'initial_{r}']
 
             elif randomize and r not in const.CONST_REGS:
-                self.reg[r] = random.randint(0, 2 ** 32 - 1)
+                self.reg[r] = self.random.getrandbits(32)
 
             else:
                 self.reg[r] = 0
 
         for r in const.F_REGS:
             if randomize:
-                random_bytes = os.urandom(4)
+                random_bytes = self.random.getrandbits(32).to_bytes(4, 'big')
                 self.f_reg[r] = float32(struct.unpack('>f', random_bytes)[0])
 
             else:
                 self.f_reg[r] = float32(0.0)
 
-    def get_register(self, reg: str) -> int:
-        key = reg
-
-        if reg[1:].isnumeric():
-            x = int(reg[1:])
-            key = list(self.reg.keys())[x]
+    # Registers can be given by their index into const.REGS or by name
+    def get_register(self, reg: Union[int, str]) -> int:
+        if type(reg) is str:
+            reg = const.REG_INDEX[reg]
 
-        if settings['warnings'] and key[1] in {'s', 't', 'a', 'v'} and key not in {'$at', '$sp'} and key not in self.reg_initialized:
-            print(f'Reading from uninitialized register {key}!', file=sys.stderr)
+        if settings['warnings'] and reg in WARN_UNINITIALIZED and reg not in self.reg_initialized:
+            print(f'Reading from uninitialized register {const.REGS[reg]}!', file=sys.stderr)
 
-        return instrs.overflow_detect(self.reg[key])
+        return self.regs[reg]
 
-    def set_register(self, reg: str, data: int) -> None:
-        if reg == '$0' or reg == '$zero':
-            raise ex.WritingToZeroRegister(f' {self.line_info}')
+    def set_register(self, reg: Union[int, str], data: int) -> None:
+        if type(reg) is str:
+            reg = const.REG_INDEX[reg]
 
-        key = reg
+        if reg == 0:
+            raise ex.WritingToZeroRegister(f' {utility.get_line_info(self.instr)}')
 
-        if reg[1:].isnumeric():
-            x = int(reg[1:])
-            key = list(self.reg.keys())[x]
-
-        self.reg_initialized.add(key)
-        self.reg[key] = instrs.overflow_detect(data)
+        self.reg_initialized.add(reg)
+        self.regs[reg] = instrs.overflow_detect(data)
 
     def get_reg_float(self, reg: str) -> float32:
         return self.f_reg[reg]
@@ -320,391 +332,208 @@ class Interpreter(QWidget):
         self.f_reg[reg] = struct.unpack('>f', bytes)[0]
 
     def execute_instr(self, instr) -> None:
-        def is_float_single(op: str) -> bool:
-            return op[-2:] == '.s'
-
-        def is_float_double(op: str) -> bool:
-            return op[-2:] == '.d'
-
-        def is_conversion_to_int(op: str) -> bool:
-            return op[-4:-2] == '.w'
-
-        def interpret_as_float(x: int) -> float32:
-            x_bytes = struct.pack('>i', x)
-            return struct.unpack('>f', x_bytes)[0]
-
-        def interpret_as_int(x: float32) -> int:
-            x_bytes = struct.pack('>f', x)
-            return struct.unpack('>i', x_bytes)[0]
-
-        # Instruction with 3 registers
-        if type(instr) is RType and len(instr.regs) == 3:
-            op = instr.operation
-            rd = instr.regs[0]
-
-            if is_float_single(op):
-                rs = self.get_reg_float(instr.regs[1])
-                rt = self.get_reg_float(instr.regs[2])
-                result = instrs.table[op[:-2] + '_f'](rs, rt)
-                self.set_reg_float(rd, result)
-
-            elif is_float_double(op):
-                rs = self.get_reg_double(instr.regs[1])
-                rt = self.get_reg_double(instr.regs[2])
-                result = instrs.table[op[:-2] + '_f'](rs, rt)
-                self.set_reg_double(rd, result)
+        compile_instr(instr)(self)
 
-            else:
-                rs = self.get_register(instr.regs[1])
-                rt = self.get_register(instr.regs[2])
-                result = instrs.table[op](rs, rt)
-
-                if op == 'movz':
-                    if rt == 0:
-                        self.set_register(rd, result)
-
-                elif op == 'movn':
-                    if rt != 0:
-                        self.set_register(rd, result)
+    def interpret(self) -> None:
+        # The blocks engine can't stop in the middle of a block, so it's only used when nothing needs to
+        if settings['engine'] == 'blocks' and not (settings['gui'] or settings['debug'] or settings['warnings']):
+            try:
+                blocks.run(self)
 
-                else:
-                    self.set_register(rd, result)
+            except Exception as e:
+                if hasattr(e, 'message'):
+                    e.message += ' ' + self.line_info
+                raise e
 
-        # Instruction with 2 registers
-        elif type(instr) is RType and len(instr.regs) == 2:
-            op = instr.operation
-            r1 = instr.regs[0]
-            r2 = instr.regs[1]
+            return
 
-            if is_conversion_to_int(op):
-                if is_float_single(op):
-                    result = instrs.table[op[:-4]](self.get_reg_float(r2))
-                else:
-                    result = instrs.table[op[:-4]](self.get_reg_double(r2))
+        if not settings['gui'] and not settings['debug']:
+            self.interpret_headless()
+            return
 
-                self.set_reg_float(r1, interpret_as_float(result))
+        first = True
+        if settings['gui']:
+            self.events.on_start()
+        # The text segment is fixed once the program is loaded, so its bounds can be checked once per fetch
+        text = self.mem.text
+        code = self.code
+        text_base = self.mem.textBase
+        text_size = len(text)
+        terminate = text_size - 1  # Index of TERMINATE_EXECUTION
+        regs = self.regs
+        mem = self.mem
+        debug = self.debug
+        # These don't change while the program runs
+        gui = settings['gui']
+        max_instructions = settings['max_instructions']
 
-            elif is_float_single(op):
-                result = instrs.table[op[:-2]](self.get_reg_float(r2))
-                self.set_reg_float(r1, result)
+        try:
+            while True:
+                # Get the next instruction and increment pc
+                pc = regs[PC]
+                idx = (pc - text_base) >> 2
 
-            elif is_float_double(op):
-                result = instrs.table[op[:-2]](self.get_reg_double(r2))
-                self.set_reg_double(r1, result)
+                if pc & 3 or not 0 <= idx < text_size:
+                    raise ex.MemoryOutOfBounds(f'{pc} is not a valid address')
 
-            elif op in {'mult', 'multu', 'madd', 'maddu', 'msub', 'msubu'}:
-                signed = op[-1] != 'u'
-                r1_data = self.get_register(r1)
-                r2_data = self.get_register(r2)
+                if self.instruction_count > max_instructions:
+                    raise ex.InstrCountExceed(f'Exceeded maximum instruction count: {max_instructions}')
 
-                low, high = instrs.mul(r1_data, r2_data, thirty_two_bits=False, signed=signed)  # A 64 bit integer
+                self.instr = text[idx]
+                regs[PC] = pc + 4
+                self.instruction_count += 1
 
-                if 'mult' not in op:
-                    lo_reg = self.get_register('lo')
-                    hi_reg = self.get_register('hi')
+                if gui:
+                    self.events.on_step(pc)
 
-                    if 'add' in op:
-                        low = instrs.addu(lo_reg, low)
-                        high = instrs.addu(hi_reg, high)
-                    else:
-                        low = instrs.subu(lo_reg, low)
-                        high = instrs.subu(hi_reg, high)
+                if idx == terminate:
+                    self.line_info = utility.get_line_info(self.instr)
 
-                # Set lo to lower 32 bits, and hi to upper 32 bits
-                self.set_register('lo', low)
-                self.set_register('hi', high)
+                    if settings['debug']:
+                        print()
+                        debug.listen(self)
 
-            elif op == 'div' or op == 'divu':
-                signed = op[-1] != 'u'
-                result, remainder = instrs.div(self.get_register(r1), self.get_register(r2), signed=signed)
+                    if gui:
+                        self.events.on_end(False)
 
-                # Set lo to quotient, and hi to remainder
-                self.set_register('lo', result)
-                self.set_register('hi', remainder)
+                    break
 
-            else:
-                result = instrs.table[op](self.get_register(r2))
-                self.set_register(r1, result)
-
-        # j type instructions (Label)
-        elif type(instr) is JType and type(instr.target) is Label:
-            instrs.table[instr.operation](self.reg, self.mem, instr.target.name)
-
-        # j type instructions (Return)
-        elif type(instr) is JType:
-            instrs.table[instr.operation](self.reg, instr.target)
-
-        # i-type isntructions
-        elif type(instr) is IType:
-            op = instr.operation
-            rd = instr.regs[0]
-            rs = self.get_register(instr.regs[1])
-            imm = instr.imm
-
-            result = instrs.table[op](rs, imm)
-            self.set_register(rd, result)
-
-        # Load immediate
-        elif type(instr) is LoadImm:
-            if instr.operation == 'lui':
-                upper = instrs.lui(instr.imm)
-                self.set_register(instr.reg, upper)
-
-        # Load or store from memory
-        elif type(instr) is LoadMem:
-            op = instr.operation
-            reg = instr.reg
-            addr = self.get_register(instr.addr) + instr.imm
-
-            if op in {'lwr', 'lwl'}:
-                result = instrs.table[op](addr, self.mem, self.get_register(reg))
-                self.set_register(reg, result)
-
-            elif op in {'lw', 'lh', 'lb', 'lhu', 'lbu'}:
-                result = instrs.table[op](addr, self.mem)
-                self.set_register(reg, result)
-
-            elif op == 'l.s':
-                result = self.mem.getFloat(addr)
-                self.set_reg_float(reg, result)
-
-            elif op == 'l.d':
-                result = self.mem.getDouble(addr)
-                self.set_reg_double(reg, result)
-
-            elif op == 's.s':
-                self.mem.addFloat(self.get_reg_float(reg), addr)
-
-            elif op == 's.d':
-                self.mem.addDouble(self.get_reg_double(reg), addr)
-
-            else:  # Other store instructions
-                instrs.table[op](addr, self.mem, self.get_register(reg))
-            if settings['gui']:
-                self.mem_access.emit()
-
-        # Mfhi, mflo, mthi, mtlo
-        elif type(instr) is Move:
-            op = instr.operation
-
-            if 'f' in op:
-                src = op[2:]
-                dest = instr.reg
+                # Running freely, debug() only needs calling for instructions with breakpoints
+                elif (not debug.continueFlag or idx in debug.breaks) and debug.debug(idx):
+                    self.line_info = utility.get_line_info(self.instr)
 
-            else:
-                src = instr.reg
-                dest = op[2:]
-
-            self.set_register(dest, self.get_register(src))
-
-        # Floating point move instructions
-        elif type(instr) is MoveFloat:
-            op = instr.operation
-            rs = instr.rs
-            rt = instr.rt
-
-            if op == 'mfc1':
-                rt_float = self.get_reg_float(rt)
-                rt_int = interpret_as_int(rt_float)
-                self.set_register(rs, rt_int)
-
-            elif op == 'mtc1':
-                rs_int = self.get_register(rs)
-                rs_float = interpret_as_float(rs_int)
-                self.set_reg_float(rt, rs_float)
-
-            elif op[:4] in ['movn', 'movz']:
-                rd_data = self.get_register(instr.rd)
-
-                if (op[3] == 'z' and rd_data == 0) or (op[3] == 'n' and rd_data != 0):
-                    if is_float_single(op):
-                        rt_data = self.get_reg_float(rt)
-                        self.set_reg_float(rs, rt_data)
+                    if not debug.continueFlag:
+                        self.pause_lock.clear()
+                    if gui:
+                        debug.listen(self)
+                    elif not gui and settings['debug']:
+                        debug.listen(self)
                     else:
-                        rt_data = self.get_reg_double(rt)
-                        self.set_reg_double(rs, rt_data)
-
-        elif type(instr) is MoveCond:
-            op = instr.operation
-            flag = self.condition_flags[instr.flag]
-
-            rs = instr.rs
-            rt = instr.rt
-
-            if (op[3] == 't' and flag) or (op[3] == 'f' and not flag):
-                if is_float_single(op):
-                    rt_data = self.get_reg_float(rt)
-                    self.set_reg_float(rs, rt_data)
-
-                elif is_float_double(op):
-                    rt_data = self.get_reg_double(rt)
-                    self.set_reg_double(rs, rt_data)
-
-                else:
-                    rt_data = self.get_register(rt)
-                    self.set_register(rs, rt_data)
-
-        # syscall
-        elif type(instr) is Syscall:
-            code = self.get_register('$v0')
-
-            if code in syscalls and code in settings['enabled_syscalls']:
-                syscalls[code](self)
-            else:
-                raise ex.InvalidSyscall('Not a valid syscall code:')
-
-        # Compare float
-        elif type(instr) is Compare:
-            op = instr.operation
-
-            if is_float_single(op):
-                rs = self.get_reg_float(instr.rs)
-                rt = self.get_reg_float(instr.rt)
-            else:
-                rs = self.get_reg_double(instr.rs)
-                rt = self.get_reg_double(instr.rs)
-
-            compare_op = op[2:4]
-            flag = instr.flag
-
-            if not 0 <= flag <= 7:
-                raise ex.InvalidArgument('Condition flag number must be between 0 - 7')
-
-            if compare_op == 'eq':
-                self.condition_flags[flag] = rs == rt
-            elif compare_op == 'le':
-                self.condition_flags[flag] = rs <= rt
-            elif compare_op == 'lt':
-                self.condition_flags[flag] = rs < rt
-
-        # Convert float
-        elif type(instr) is Convert:
-            format_from = instr.format_from
-            format_to = instr.format_to
-
-            if format_from == 'w':
-                data = self.get_reg_word(instr.rt)
-            elif format_from == 's':
-                data = self.get_reg_float(instr.rt)
-            else:
-                data = self.get_reg_double(instr.rt)
-
-            if format_to == 'w':
-                self.set_reg_word(instr.rs, int(data))
-            elif format_to == 's':
-                self.set_reg_float(instr.rs, float32(data))
-            else:
-                self.set_reg_double(instr.rs, float(data))
-
-        # Branches
-        elif type(instr) is Branch:
-            op = instr.operation
-            rs = self.get_register(instr.rs)
-            rt = self.get_register(instr.rt)
-
-            if 'z' in op:
-                result = instrs.table[op](rs)
-            else:
-                result = instrs.table[op](rs, rt)
-
-            if result:
-                label = instr.label.name
-                addr = self.mem.getLabel(label)
+                        first = False
 
-                if addr is None:
-                    raise ex.InvalidLabel(f'{label} is not a valid label.')
+                elif gui and type(self.instr) is Syscall and (self.reg['$v0'] == 10 or self.reg['$v0'] == 17):
+                    if settings['disp_instr_count']:
+                        self.out(f'\nInstruction count: {self.instruction_count}')
+                    self.events.on_end(False)
+                    break
 
-                if 'al' in op:
-                    instrs.jal(self.reg, self.mem, label)
-                else:
-                    self.set_register('pc', addr)
+                # Only journal for reverse while the user is stepping. Running freely, the debugger just needs
+                # its checkpoints and what syscalls returned, to replay the run from them if it's asked to go back.
+                if not debug.continueFlag:
+                    debug.push(self)
+                elif self.instruction_count > debug.next_checkpoint or type(self.instr) is Syscall:
+                    debug.skip(self)
 
-        # Branches (float)
-        elif type(instr) is BranchFloat:
-            op = instr.operation
-            flag = instr.flag
+                # The debugger may have stepped backwards, so execute whatever instruction pc now points after
+                code[(regs[PC] - 4 - text_base) >> 2](self)
 
-            if (self.condition_flags[flag] and op == 'bc1t') or (not self.condition_flags[flag] and op == 'bc1f'):
-                label = instr.label.name
-                addr = self.mem.getLabel(label)
+                # Fill in the record of a syscall's results
+                if debug.pending is not None:
+                    debug.finish(self)
 
-                if addr is None:
-                    raise ex.InvalidLabel(f'{label} is not a valid label.')
+                # The instruction touched a page with a watchpoint on it
+                if mem.watch_hit:
+                    debug.check_watches(self)
 
-                self.set_register('pc', addr)
+        except Exception as e:
+            self.line_info = utility.get_line_info(self.instr)
 
-        elif type(instr) is Nop:
-            pass
+            if hasattr(e, 'message'):
+                e.message += ' ' + self.line_info
+                if gui:
+                    self.events.on_end(False)
+            raise e
 
-        elif type(instr) is Breakpoint:
-            raise ex.BreakpointException(f'code = {instr.code}')
+    def interpret_headless(self) -> None:
+        # Run loop for when there is no GUI or debugger to report to. Settings are read once, and the
+        # line information for error messages is only worked out if something is raised.
+        text = self.mem.text
+        code = self.code
+        text_base = self.mem.textBase
+        text_size = len(text)
+        terminate = text_size - 1  # Index of TERMINATE_EXECUTION
+        regs = self.regs
+        max_instructions = settings['max_instructions']
 
-    def interpret(self) -> None:
-        first = True
-        if settings['gui']:
-            self.start.emit()
         try:
             while True:
                 # Get the next instruction and increment pc
-                pc = self.reg['pc']
+                pc = regs[PC]
+                idx = (pc - text_base) >> 2
 
-                if str(pc) not in self.mem.text:
+                if pc & 3 or not 0 <= idx < text_size:
                     raise ex.MemoryOutOfBounds(f'{pc} is not a valid address')
 
-                if self.instruction_count > settings['max_instructions']:
-                    raise ex.InstrCountExceed(f'Exceeded maximum instruction count: {settings["max_instructions"]}')
+                if self.instruction_count > max_instructions:
+                    raise ex.InstrCountExceed(f'Exceeded maximum instruction count: {max_instructions}')
 
-                self.instr = self.mem.text[str(pc)]
-                self.reg['pc'] += 4
+                self.instr = text[idx]
+                regs[PC] = pc + 4
                 self.instruction_count += 1
 
-                if settings['gui']:
-                    self.step.emit(pc)
+                if idx == terminate:
+                    break
 
+                code[idx](self)
 
-                try:
-                    self.line_info = f' ({self.instr.filetag.file_name}, {self.instr.filetag.line_no})'
-                except AttributeError:
-                    self.line_info = ''
+        except Exception as e:
+            self.line_info = utility.get_line_info(self.instr)
 
-                if self.instr == 'TERMINATE_EXECUTION':
-                    if settings['debug']:
-                        print()
-                        self.debug.listen(self)
+            if hasattr(e, 'message'):
+                e.message += ' ' + self.line_info
+            raise e
 
-                    if settings['gui']:
-                        self.end.emit(False)
+    def run_until(self, breaks: Set[int], steps: int) -> bool:
+        # Run loop for a remote debugger. Runs up to steps instructions, stopping before any instruction whose
+        # index in the text segment is in breaks, or after one that touches a watched page. The first instruction
+        # always runs, so the program can go on from a breakpoint. Returns whether the program reached its end.
+        text = self.mem.text
+        code = self.code
+        text_base = self.mem.textBase
+        text_size = len(text)
+        terminate = text_size - 1  # Index of TERMINATE_EXECUTION
+        regs = self.regs
+        mem = self.mem
+        max_instructions = settings['max_instructions']
+        pc = regs[PC]
 
+        try:
+            for n in range(steps):
+                pc = regs[PC]
+                idx = (pc - text_base) >> 2
+
+                if n and idx in breaks:
                     break
 
-                elif self.debug.debug(self.instr):
-                    if not self.debug.continueFlag:
-                        self.pause_lock.clear()
-                    if settings['gui']:
-                        self.debug.listen(self)
-                    elif not settings['gui'] and settings['debug']:
-                        self.debug.listen(self)
-                    else:
-                        first = False
+                if pc & 3 or not 0 <= idx < text_size:
+                    raise ex.MemoryOutOfBounds(f'{pc} is not a valid address')
 
-                elif settings['gui'] and type(self.instr) is Syscall and (self.reg['$v0'] == 10 or self.reg['$v0'] == 17):
-                    if settings['disp_instr_count']:
-                        self.out(f'\nInstruction count: {self.instruction_count}')
-                    self.end.emit(False)
-                    break
+                if self.instruction_count > max_instructions:
+                    raise ex.InstrCountExceed(f'Exceeded maximum instruction count: {max_instructions}')
+
+                self.instr = text[idx]
+                regs[PC] = pc + 4
+                self.instruction_count += 1
 
-                if settings['gui']:
-                    self.debug.push(self)
+                if idx == terminate:
+                    return True
 
-                self.execute_instr(self.instr)
+                code[idx](self)
+
+                if mem.watch_hit:
+                    break
 
         except Exception as e:
+            # Stay on the instruction that raised, so the debugger shows where it happened
+            regs[PC] = pc
+            self.line_info = utility.get_line_info(self.instr)
+
             if hasattr(e, 'message'):
                 e.message += ' ' + self.line_info
-                if settings['gui']:
-                    self.end.emit(False)
             raise e
 
+        return False
+
     def dump(self) -> None:
         # Dump the contents in registers and memory
         print('Registers:')
@@ -0,0 +1,159 @@
+from array import array
+from typing import Dict, Iterator, Tuple, Union
+
+import constants as const
+
+'''
+https://github.com/sbustars/STARS
+
+Copyright 2020 Kevin McDonnell, Jihu Mun, and Ian Peitzsch
+
+Developed by Kevin McDonnell (ktm@cs.stonybrook.edu),
+Jihu Mun (jihu1011@gmail.com),
+and Ian Peitzsch (irpeitzsch@gmail.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+PC = const.REG_INDEX['pc']
+
+# Kinds of journal entries. Each entry holds what one instruction overwrote, as (kind, pc, target, value).
+STEP = 0  # Only pc changed (branches, jumps, nops, most syscalls)
+REG = 1  # target: integer register index, value: its old contents
+HILO = 2  # target: old hi, value: old lo
+FREG = 3  # target: float register number, value: its old bits
+FREG_DOUBLE = 4  # target: even float register number, value: the old bits of it and the next register
+FLAG = 5  # target: condition flag, value: its old value
+SBRK = 6  # target: old heap pointer, value: old $v0
+# target: address, value: the old bytes there as a little endian signed int. Indexed by how many bytes were stored.
+MEM = {1: 7, 2: 8, 4: 9, 8: 10}
+MEM_SIZE = {kind: size for size, kind in MEM.items()}
+
+
+class Journal:
+    # Ring buffer of the entries for the last depth instructions executed. Once it is full, each new entry
+    # overwrites the oldest one, so the debugger's memory use doesn't grow with how long the program runs.
+    def __init__(self, depth: int):
+        self.depth = depth
+        # Allocated by the first push, since every interpreter has a journal but most runs never step
+        self.kinds = None
+        self.pcs = None
+        self.targets = None
+        self.values = None
+
+        self.head = 0  # Where the next entry goes
+        self.size = 0  # Number of entries held
+        self.steps = 0  # Number of instructions executed, less the ones stepped back over
+
+    def __len__(self) -> int:
+        return self.size
+
+    def push(self, kind: int, pc: int, target: int = 0, value: int = 0) -> None:
+        self.steps += 1
+
+        if not self.depth:
+            return
+
+        if self.kinds is None:
+            self.kinds = array('B', bytes(self.depth))
+            self.pcs = array('I', [0]) * self.depth
+            self.targets = array('q', [0]) * self.depth
+            self.values = array('q', [0]) * self.depth
+
+        i = self.head
+        self.kinds[i] = kind
+        self.pcs[i] = pc
+        self.targets[i] = target
+        self.values[i] = value
+
+        self.head = i + 1 if i + 1 < self.depth else 0
+
+        if self.size < self.depth:
+            self.size += 1
+
+    # Remove and return the newest entry, or None if there aren't any
+    def pop(self) -> Union[Tuple[int, int, int, int], None]:
+        if not self.size:
+            return None
+
+        i = self.head = (self.head or self.depth) - 1
+        self.size -= 1
+        self.steps -= 1
+
+        return self.kinds[i], self.pcs[i], self.targets[i], self.values[i]
+
+    # The entries from newest to oldest, each as (step, kind, pc, target, value), step being the instruction's number
+    def recent(self) -> Iterator[Tuple[int, int, int, int, int]]:
+        i = self.head
+        step = self.steps
+
+        for _ in range(self.size):
+            i = (i or self.depth) - 1
+            step -= 1
+            yield step, self.kinds[i], self.pcs[i], self.targets[i], self.values[i]
+
+    # The newest entry, as recent() gives them, or None if there isn't one
+    def newest(self) -> Union[Tuple[int, int, int, int, int], None]:
+        for entry in self.recent():
+            return entry
+
+        return None
+
+    # Drop every entry and start counting from steps
+    def clear(self, steps: int) -> None:
+        self.head = 0
+        self.size = 0
+        self.steps = steps
+
+
+class Checkpoint:
+    # Full copy of the interpreter's state from just before instruction number step ran.
+    # Pages that haven't changed since the previous checkpoint share its copy, so only changed pages take up memory.
+    def __init__(self, interp, step: int, previous: 'Checkpoint' = None):
+        mem = interp.mem
+
+        self.step = step
+
+        self.regs = list(interp.regs)
+        self.f_reg = dict(interp.f_reg)
+        self.condition_flags = list(interp.condition_flags)
+        self.reg_initialized = set(interp.reg_initialized)
+        self.instruction_count = interp.instruction_count
+
+        self.pages = copy_pages(mem.all_pages(), previous.pages if previous is not None else {})
+        self.initialized = copy_pages(mem.initialized, previous.initialized if previous is not None else {})
+        self.heapPtr = mem.heapPtr
+        self.random = interp.random.getstate()  # Pages touched after this are filled from it
+
+    def restore(self, interp) -> None:
+        mem = interp.mem
+
+        # Update in place, since the interpreter keeps references to these
+        interp.regs[:] = self.regs
+        interp.f_reg.clear()
+        interp.f_reg.update(self.f_reg)
+        interp.condition_flags[:] = self.condition_flags
+        interp.reg_initialized.clear()
+        interp.reg_initialized.update(self.reg_initialized)
+        interp.instruction_count = self.instruction_count
+
+        mem.load_pages(self.pages, self.initialized)
+        mem.heapPtr = self.heapPtr
+        interp.random.setstate(self.random)
+
+        interp.instr = mem.text[mem.textIndex(interp.regs[PC] - 4)]
+
+
+# Copy each page, reusing the copy in previous if the page still matches it
+def copy_pages(pages: Dict[int, bytearray], previous: Dict[int, bytes]) -> Dict[int, bytes]:
+    copies = {}
+
+    for n, page in pages.items():
+        copy = previous.get(n)
+        copies[n] = copy if copy == page else bytes(page)
+
+    return copies
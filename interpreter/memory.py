@@ -2,14 +2,13 @@ import random
 import struct
 import sys
 from collections import OrderedDict
-from typing import List, Union
+from typing import Dict, List, Union
 from constants import WORD_SIZE
 from numpy import float32
 
 from constants import WORD_MASK
 from interpreter import exceptions as ex
 from interpreter import utility
-from interpreter.instructions import overflow_detect
 from settings import settings
 
 '''
@@ -29,64 +28,207 @@ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLI
 '''
 
 
-# Check for out of bounds
-def check_bounds(addr: int) -> None:
-    if addr < 0:
-        return
-    if addr < settings['data_min']:
-        raise ex.MemoryOutOfBounds(f"{utility.format_hex(addr)} is not within the data section or heap/stack.")
+# Memory is stored in pages of PAGE_SIZE bytes, allocated the first time they are touched
+PAGE_BITS = 12
+PAGE_SIZE = 1 << PAGE_BITS
+OFFSET_MASK = PAGE_SIZE - 1
 
+WORD = struct.Struct('<i')
+UWORD = struct.Struct('<I')
+HWORD = struct.Struct('<h')
+UHWORD = struct.Struct('<H')
+
+
+class Segment:
+    # A range of addresses [start, end) and how loads and stores to it are handled
+    def __init__(self, name: str, start: int, end: int, fault: str = None, garbage: bool = True):
+        self.name = name
+        self.start = start
+        self.end = end
+        # Message for MemoryOutOfBounds if programs can't load from / store to the segment, formatted with the address
+        self.fault = fault
+        self.garbage = garbage  # Whether new pages hold garbage when garbage memory is enabled
 
-class Memory:
-    def __init__(self, toggle_garbage: bool = False):
-        self.text = OrderedDict()  # Instructions
-        self.data = OrderedDict()  # Main memory
-        self.stack = OrderedDict()
 
-        self.textPtr = settings['initial_pc']
+class Memory:
+    def __init__(self, toggle_garbage: bool = False, rand: random.Random = None):
+        self.text = []  # Instructions, indexed by (pc - textBase) >> 2
+        self.lines = {}  # Maps (file name, line number) to the indices in text of the instructions from that line
+        # Main memory. Maps a page number (addr >> PAGE_BITS) to a bytearray holding that page
+        self.pages = {}
+        # Same layout as pages. A byte is 1 once the matching byte of memory has been written or read
+        self.initialized = {}
+        # Pages the GUI has touched in segments programs can't access. Kept apart so programs still fault on them.
+        self.restricted = {}
+        # Pages with a debugger watchpoint on them. Kept out of pages so every access to them goes through page(),
+        # which sets watch_hit for the debugger to check its watchpoints.
+        self.watched = {}
+        self.watch_hit = False
+
+        self.textBase = settings['initial_pc']
+        self.textPtr = self.textBase
         self.dataPtr = settings['data_min']
         self.labels = {}  # Dictionary to store the labels and their addresses
 
         self.toggle_garbage = toggle_garbage
+        # Source of garbage, seeded so garbage runs can be repeated
+        self.random = rand if rand is not None else random.Random(settings['seed'])
+        self.spaces = []  # (start, end) of each .space buffer, which count as initialized without being written
         self.fileTable = OrderedDict([(0, sys.stdin),
                                       (1, sys.stdout),
                                       (2, sys.stderr)])
-        self.heapPtr = 0x10040000
+        self.heapBase = 0x10040000
+        self.heapPtr = self.heapBase
+
+        # Every address falls in exactly one segment. The boundaries are page aligned, so the segment
+        # only has to be looked up the first time a page is touched, not on every access.
+        not_data = '{} is not within the data section or heap/stack.'
+        self.segments = [
+            Segment('reserved', 0, self.textBase, fault=not_data),
+            Segment('.text', self.textBase, 0x10000000, fault='{} is in the .text segment, which only holds instructions.'),
+            Segment('reserved', 0x10000000, settings['data_min'], fault=not_data),
+            Segment('.data', settings['data_min'], self.heapBase),
+            Segment('heap/stack', self.heapBase, settings['data_max']),
+            Segment('kernel', settings['data_max'], settings['mmio_base']),
+            Segment('mmio', settings['mmio_base'], 2 ** 32, garbage=False),
+        ]
 
     # Add an instruction to memory
     def addText(self, instr) -> None:
-        self.text[str(self.textPtr)] = instr
+        if hasattr(instr, 'filetag'):
+            self.lines.setdefault((instr.filetag.file_name, instr.filetag.line_no), []).append(len(self.text))
+
+        self.text.append(instr)
         self.textPtr += 4  # PC += 4
 
+    # Get the index into the text segment of the instruction at addr
+    # Returns None if addr does not hold an instruction
+    def textIndex(self, addr: int) -> Union[int, None]:
+        if addr & 3 or not self.textBase <= addr < self.textPtr:
+            return None
+
+        return (addr - self.textBase) >> 2
+
+    # Get the segment that holds addr (an unsigned address)
+    def segment(self, addr: int) -> Segment:
+        for segment in self.segments:
+            if segment.start <= addr < segment.end:
+                return segment
+
+        raise ex.MemoryOutOfBounds(f'{utility.format_hex(addr)} is not a valid address.')
+
+    # Get the page that holds addr (an unsigned address), allocating it if it hasn't been touched yet
+    # The accessors below look in self.pages first and only call this on a miss
+    def page(self, addr: int, admin: bool = False) -> bytearray:
+        n = addr >> PAGE_BITS
+        page = self.pages.get(n)
+
+        if page is not None:
+            return page
+
+        page = self.watched.get(n)
+
+        if page is not None:
+            self.watch_hit = True
+            return page
+
+        segment = self.segment(addr)
+        pages = self.pages
+
+        if segment.fault is not None:
+            if not admin:
+                raise ex.MemoryOutOfBounds(segment.fault.format(utility.format_hex(addr)))
+
+            pages = self.restricted
+            page = pages.get(n)
+
+        if page is None:
+            # Bytes that are read before being written hold garbage if it is enabled
+            if self.toggle_garbage and segment.garbage:
+                page = bytearray(self.random.getrandbits(8 * PAGE_SIZE).to_bytes(PAGE_SIZE, 'little'))
+            else:
+                page = bytearray(PAGE_SIZE)
+
+            pages[n] = page
+            self.initialized[n] = bytearray(PAGE_SIZE)
+
+            for start, end in self.spaces:
+                self.mark_initialized(n, start, end)
+
+        return page
+
+    # Mark the part of [start, end) that falls in page n as initialized
+    def mark_initialized(self, n: int, start: int, end: int) -> None:
+        page_start = n << PAGE_BITS
+        start = max(start, page_start)
+        end = min(end, page_start + PAGE_SIZE)
+
+        if start < end:
+            self.initialized[n][start - page_start:end - page_start] = bytes([1]) * (end - start)
+
+    # Mark size bytes starting at addr (an unsigned address) as initialized. Warns about the ones that weren't.
+    def check_initialized(self, addr: int, size: int) -> None:
+        mask = self.initialized[addr >> PAGE_BITS]
+        offset = addr & OFFSET_MASK
+
+        for i in reversed(range(size)):  # Little Endian: Go from MSB to LSB
+            if not mask[offset + i]:
+                print(f'Warning: Reading from uninitialized byte {utility.format_hex(addr + i)}!', file=sys.stderr)
+                mask[offset + i] = 1
+
     def setByte(self, addr: int, data: int, admin=False) -> None:
         # Addr : Address in memory (int)
         # Data = Contents of the byte (0 to 0xFF)
         if addr < 0:
             addr += 2 ** 32
-        if not admin:
-            check_bounds(addr)
-        self.data[str(addr)] = data
+
+        page = self.pages.get(addr >> PAGE_BITS) or self.page(addr, admin)
+        page[addr & OFFSET_MASK] = data
+        self.initialized[addr >> PAGE_BITS][addr & OFFSET_MASK] = 1
 
     # Add a word (4 bytes) to memory
     def addWord(self, data: int, addr: int) -> None:
         if addr % 4 != 0:
             raise ex.MemoryAlignmentError(f"{utility.format_hex(addr)} is not word aligned.")
 
-        for i in range(4):  # Set byte by byte starting from LSB
-            self.setByte(addr + i, (data >> (8 * i)) & 0xFF)
+        addr &= 0xFFFFFFFF
+        offset = addr & OFFSET_MASK
+
+        UWORD.pack_into(self.pages.get(addr >> PAGE_BITS) or self.page(addr), offset, data & 0xFFFFFFFF)
+        self.initialized[addr >> PAGE_BITS][offset:offset + 4] = b'\x01\x01\x01\x01'
 
     # Add a half word (2 bytes) to memory. Only looks at the least significant half-word of data.
     def addHWord(self, data: int, addr: int) -> None:
         if addr % 2 != 0:
             raise ex.MemoryAlignmentError(f"{utility.format_hex(addr)} is not half-word aligned.")
 
-        for i in range(2):  # Set byte by byte starting from LSB
-            self.setByte(addr + i, (data >> (8 * i)) & 0xFF)
+        addr &= 0xFFFFFFFF
+        offset = addr & OFFSET_MASK
+
+        UHWORD.pack_into(self.pages.get(addr >> PAGE_BITS) or self.page(addr), offset, data & 0xFFFF)
+        self.initialized[addr >> PAGE_BITS][offset:offset + 2] = b'\x01\x01'
 
     def addByte(self, data: int, addr: int, admin=False) -> None:
         # Add a byte to memory. Only looks at the LSB of data.
         self.setByte(addr, data & 0xFF, admin)
 
+    # Reserve size bytes starting at addr for a .space buffer. Nothing is written, so pages are only
+    # allocated when the program touches them. The bytes read as 0, or as garbage if it is enabled.
+    def addSpace(self, size: int, addr: int) -> None:
+        if size <= 0:
+            return
+
+        segment = self.segment(addr)
+
+        if segment.fault is not None:
+            raise ex.MemoryOutOfBounds(segment.fault.format(utility.format_hex(addr)))
+
+        self.spaces.append((addr, addr + size))
+
+        for n in range(addr >> PAGE_BITS, ((addr + size - 1) >> PAGE_BITS) + 1):
+            if n in self.initialized:
+                self.mark_initialized(n, addr, addr + size)
+
     # Add a single precision floating point to memory
     def addFloat(self, data: float32, addr: int) -> None:
         data_int = int.from_bytes(struct.pack('>f', data), 'big', signed=True)
@@ -102,14 +244,27 @@ class Memory:
         self.addWord(data_int & WORD_MASK, addr)  # Lower 32 bits
         self.addWord(data_int >> 32, addr + 4)  # Upper 32 bits
 
+    # Copy data into memory starting at addr, one page at a time
+    def addBytes(self, data: bytes, addr: int) -> None:
+        data = memoryview(data)
+        addr &= 0xFFFFFFFF
+
+        while len(data) > 0:
+            offset = addr & OFFSET_MASK
+            size = min(PAGE_SIZE - offset, len(data))
+
+            self.page(addr)[offset:offset + size] = data[:size]
+            self.initialized[addr >> PAGE_BITS][offset:offset + size] = b'\x01' * size
+
+            data = data[size:]
+            addr += size
+
     # Add a string to memory
     def addAscii(self, s: str, addr: int, null_terminate: bool = False) -> None:
-        for c in s:
-            self.setByte(addr, ord(c))
-            addr += 1
-
         if null_terminate:
-            self.setByte(addr, 0)  # Store null terminator
+            s += '\0'  # Store null terminator
+
+        self.addBytes(utility.encode_string(s), addr)
 
     # Add a null-terminated string to memory
     def addAsciiz(self, s: str, addr: int) -> None:
@@ -126,29 +281,16 @@ class Memory:
         # Get a byte of memory from main memory
         # Returns an decimal integer representation of the byte (-128 ~ 127) if signed
         # Returns (0 ~ 255) if unsigned
-        if not admin:
-            check_bounds(int(addr))
-
-        if str(addr) in self.data.keys():
-            acc = self.data[str(addr)]
+        addr = int(addr) & 0xFFFFFFFF
+        acc = (self.pages.get(addr >> PAGE_BITS) or self.page(addr, admin))[addr & OFFSET_MASK]
 
-            if signed:  # Sign extend
-                if acc & 0x80 > 0:
-                    acc |= 0xFFFFFF00
+        if settings['warnings']:
+            self.check_initialized(addr, 1)
 
-            return overflow_detect(acc)
+        if signed and acc & 0x80:  # Sign extend
+            acc -= 0x100
 
-        else:
-            # Randomly generate a byte
-            if settings['warnings']:
-                print(f'Warning: Reading from uninitialized byte {utility.format_hex(int(addr))}!', file=sys.stderr)
-
-            if self.toggle_garbage:
-                self.addByte(random.randint(0, 0xFF), addr, admin=admin)
-            else:
-                self.addByte(0, addr, admin=admin)
-
-            return self.getByte(addr, signed=signed, admin=admin)
+        return acc
 
     # Get a word (4 bytes) of memory from main memory
     # Returns a decimal integer representation of the word
@@ -156,17 +298,13 @@ class Memory:
         if addr % 4 != 0:
             raise ex.MemoryAlignmentError(f"{utility.format_hex(addr)} is not word aligned.")
 
-        acc = 0  # Result
+        addr &= 0xFFFFFFFF
+        page = self.pages.get(addr >> PAGE_BITS) or self.page(addr)
 
-        for i in reversed(range(4)):  # Little Endian: Go from MSB to LSB
-            check_bounds(addr + i)
+        if settings['warnings']:
+            self.check_initialized(addr, 4)
 
-            # Get the ith byte of the word
-            byte = self.getByte(addr + i, signed=False)
-            acc = acc << 8
-            acc |= byte
-
-        return overflow_detect(acc)
+        return WORD.unpack_from(page, addr & OFFSET_MASK)[0]
 
     # Get a half-word (2 bytes) of memory from main memory
     # Return a decimal integer representation of the word
@@ -174,21 +312,16 @@ class Memory:
         if addr % 2 != 0:
             raise ex.MemoryAlignmentError(f"{utility.format_hex(addr)} is not half-word aligned.")
 
-        acc = 0  # Result
-
-        for i in reversed(range(2)):  # Little Endian: Go from MSB to LSB
-            check_bounds(addr + i)
+        addr &= 0xFFFFFFFF
+        page = self.pages.get(addr >> PAGE_BITS) or self.page(addr)
 
-            # Get the ith byte of the word
-            byte = self.getByte(addr + i, signed=False)
-            acc = acc << 8
-            acc |= byte
+        if settings['warnings']:
+            self.check_initialized(addr, 2)
 
-        if signed:  # Sign extend
-            if acc & 0x8000 > 0:
-                acc |= 0xFFFF0000
+        if signed:
+            return HWORD.unpack_from(page, addr & OFFSET_MASK)[0]
 
-        return overflow_detect(acc)
+        return UHWORD.unpack_from(page, addr & OFFSET_MASK)[0]
 
     def getFloat(self, addr: int) -> float32:
         data_int = self.getWord(addr)
@@ -254,9 +387,69 @@ class Memory:
             ret.append(self.getByte(i, signed=signed))
         return ret
 
+    # Read size bytes at addr without warnings or marking them initialized, for the debugger.
+    # Returns None if a program couldn't access all of them.
+    def peek(self, addr: int, size: int) -> Union[bytes, None]:
+        addr &= 0xFFFFFFFF
+        data = b''
+
+        while len(data) < size:
+            try:
+                page = self.pages.get(addr >> PAGE_BITS) or self.page(addr)
+
+            except ex.MemoryOutOfBounds:
+                return None
+
+            offset = addr & OFFSET_MASK
+            chunk = page[offset:offset + size - len(data)]
+            data += chunk
+            addr += len(chunk)
+
+        return data
+
+    # Put back bytes read by peek
+    def poke(self, addr: int, data: bytes) -> None:
+        addr &= 0xFFFFFFFF
+
+        while data:
+            offset = addr & OFFSET_MASK
+            chunk = data[:PAGE_SIZE - offset]
+            self.page(addr)[offset:offset + len(chunk)] = chunk
+            data = data[len(chunk):]
+            addr += len(chunk)
+
+    # Watch the pages holding [addr, addr + size), allocating them if needed
+    def watch(self, addr: int, size: int) -> None:
+        addr &= 0xFFFFFFFF
+
+        for n in range(addr >> PAGE_BITS, ((addr + size - 1) >> PAGE_BITS) + 1):
+            self.page(n << PAGE_BITS)
+            self.watched[n] = self.pages.pop(n, None) or self.watched[n]
+
+    # Stop watching every page
+    def unwatch(self) -> None:
+        self.pages.update(self.watched)
+        self.watched.clear()
+        self.watch_hit = False
+
+    # Every page of memory that has been touched, watched or not
+    def all_pages(self) -> Dict[int, bytearray]:
+        return {**self.pages, **self.watched}
+
+    # Replace all of memory with copies of pages and initialized, e.g. from a debugger checkpoint.
+    # Watched pages stay watched.
+    def load_pages(self, pages: Dict[int, bytes], initialized: Dict[int, bytes]) -> None:
+        self.pages.clear()
+        self.pages.update((n, bytearray(page)) for n, page in pages.items())
+        self.initialized.clear()
+        self.initialized.update((n, bytearray(mask)) for n, mask in initialized.items())
+
+        for n in self.watched:
+            self.watched[n] = self.pages.pop(n, None) or bytearray(PAGE_SIZE)
+            self.initialized.setdefault(n, bytearray(PAGE_SIZE))
+
     # Dump the contents of memory
     def dump(self) -> None:
-        print(self.stack)
-        print(self.data)
+        print({utility.format_hex(n << PAGE_BITS): bytes(page) for n, page in self.all_pages().items()})
         print(self.text)
         print(self.labels)
@@ -170,7 +170,7 @@ def _exit(inter) -> None:
     if settings['disp_instr_count']:
         inter.out(f'\nInstruction count: {inter.instruction_count}')
     if settings['gui']:
-        inter.end.emit(False)
+        inter.events.on_end(False)
     else:
         exit()
 
@@ -344,7 +344,7 @@ def dumpFiles(inter) -> None:
 
 def _exit2(inter) -> None:
     if settings['gui']:
-        inter.end.emit(False)
+        inter.events.on_end(False)
     if settings['disp_instr_count']:
         inter.out(f'\nInstruction count: {inter.instruction_count}')
     exit(inter.get_register('$a0'))
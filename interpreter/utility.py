@@ -1,6 +1,7 @@
 import re
+from typing import Union
 
-from constants import WORD_MASK
+from constants import REGS, WORD_MASK
 
 '''
 https://github.com/sbustars/STARS
@@ -24,26 +25,48 @@ def format_hex(x: int) -> str:
     return f'0x{x & WORD_MASK:08x}'
 
 
+# Get the name of a register. Integer registers are stored as indices into REGS (8 -> $t0)
+def reg_name(reg: Union[int, str]) -> str:
+    if type(reg) is int:
+        return REGS[reg]
+
+    return reg
+
+
+# Get the file and line number of an instruction, for error messages
+def get_line_info(instr) -> str:
+    try:
+        return f' ({instr.filetag.file_name}, {instr.filetag.line_no})'
+    except AttributeError:
+        return ''
+
+
+# Get the bytes a string takes up in memory, one byte per character
+def encode_string(s: str) -> bytes:
+    try:
+        return s.encode('latin-1')
+
+    except UnicodeEncodeError:  # Only the low byte of wider characters is kept
+        return bytes(ord(c) & 0xFF for c in s)
+
+
+# Escape sequences in strings and what they stand for. Any other character after a backslash is left alone.
+ESCAPES = {
+    'n': '\n',
+    'r': '\r',
+    't': '\t',
+    '0': '\0',
+    '"': '"',
+    '\\': '\\'
+}
+
+# A backslash and the character after it. Matches never overlap, so in \\n the first backslash escapes the second.
+ESCAPE_PATTERN = re.compile(r'\\(.)', re.DOTALL)
+
+
 # Handle escape sequences and replace them with the actual characters
 def handle_escapes(s: str) -> str:
-    escape_seqs = {
-        'n': '\n',
-        'r': '\r',
-        't': '\t',
-        '0': '\0',
-        '"': '"'
-    }
-
-    for escape_char in escape_seqs:
-        def replace_func(match):
-            # Replace the backslash and the following character with the replacement
-            return match.group(0)[:-2] + escape_seqs[escape_char]
-
-        # Match an odd number of backslashes followed by the escape character
-        pattern = r'(?<!\\)(\\\\)*\\' + escape_char
-        s = re.sub(pattern, replace_func, s)
-
-    # Replace all double backslashes with a single backslash (since \\ is an escape seq for \)
-    s = re.sub(r'\\\\', r'\\', s)
-
-    return s
+    if '\\' not in s:
+        return s
+
+    return ESCAPE_PATTERN.sub(lambda match: ESCAPES.get(match.group(1), match.group()), s)
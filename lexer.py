@@ -1,8 +1,8 @@
-from typing import Dict
+from typing import Dict, Iterator, Union
 
 from constants import *
 from settings import settings
-from sly.lex import Lexer
+from sly.lex import Lexer, Token
 import re
 
 '''
@@ -54,6 +54,7 @@ class MipsLexer(Lexer):
               PS_R_TYPE3, PS_R_TYPE2, PS_I_TYPE, PS_LOADS_I, PS_LOADS_A, PS_BRANCH, PS_ZERO_BRANCH}
     ignore = ' \t'
     pseudoOps = makeRegex()
+    words = {}  # Token type of every identifier fast_tokenize has seen
 
     # Basic floating point instructions
     LOADS_F = r'\b(l|s)\.[sd]\b'
@@ -120,9 +121,10 @@ class MipsLexer(Lexer):
     EQV = r'\.eqv .*? .*?(?=\x81)'
     ALIGN = r'\.align'
 
-    def __init__(self, filename):
+    def __init__(self, filename, fast=True):
         self.filename = filename
         self.lineno = 1
+        self.fast = fast  # Use the fast tokenizer. It gives the same tokens as sly's, which is kept for comparison.
 
     # \x81\x83
     @_(r'(\x81\x82|\x81\x83) ".*?" \d+')
@@ -134,7 +136,7 @@ class MipsLexer(Lexer):
 
     @_(r'[$](a[0123t]|s[01234567]|t[0123456789]|v[01]|ra|sp|fp|gp|zero|3[01]|[12]?\d) *,?')
     def REG(self, t):
-        t.value = get_reg_value(t.value)
+        t.value = REG_INDEX[get_reg_value(t.value)]
         return t
 
     @_(r'[$]f(3[01]|[12]?\d),?')
@@ -185,5 +187,182 @@ class MipsLexer(Lexer):
         # These were already taken care of during the preprocessing stage, so we don't need them
         self.lineno += t.value.count('\n')
 
+        # Except for where an include goes. The assembler replaces the INCLUDE with the included file's tokens,
+        # so the parser never sees it.
+        match = re.match(r'[.]include "(.*?)"', t.value)
+
+        if match:
+            t.type = 'INCLUDE'
+            t.value = match.group(1)
+            return t
+
     def error(self, t):
         raise SyntaxError(f'File {self.filename} Line {self.lineno}: Bad character {t.value[0]}')
+
+    def tokenize(self, text: str, lineno: int = 1, index: int = 0) -> Iterator[Token]:
+        if self.fast:
+            return self.fast_tokenize(text, lineno, index)
+
+        return super().tokenize(text, lineno, index)
+
+    # sly tries every rule in order at each position until one matches. Most tokens are mnemonics, labels,
+    # registers, numbers, punctuation and line markers, so those are found from their first character instead.
+    # Everything else goes through sly's master regex the same way sly does it.
+    def fast_tokenize(self, text: str, lineno: int = 1, index: int = 0) -> Iterator[Token]:
+        cls = type(self)
+        master = cls._master_re
+        funcs = cls._token_funcs
+        ignored = cls._ignored_tokens
+        end = len(text)
+
+        try:
+            while index < end:
+                c = text[index]
+
+                if c in cls.ignore:
+                    index += 1
+                    continue
+
+                tok = Token()
+                tok.lineno = lineno
+                tok.index = index
+
+                if c in IDENT_START:
+                    m = IDENT.match(text, index)
+                    kind = self.classify(text, index, m.end())
+
+                    if kind:
+                        tok.type = kind
+                        tok.value = m.group()
+                        index = m.end()
+                        yield tok
+                        continue
+
+                elif c == '$':
+                    m = REG_RULE.match(text, index)
+
+                    if m:
+                        tok.type = 'REG'
+                        tok.value = REG_INDEX[m.group().rstrip(' ,')]
+                        index = m.end()
+                        yield tok
+                        continue
+
+                    m = F_REG_RULE.match(text, index)
+
+                    if m:
+                        tok.type = 'F_REG'
+                        tok.value = m.group().rstrip(',')
+                        index = m.end()
+                        yield tok
+                        continue
+
+                elif c in PUNCTUATION:
+                    tok.type = PUNCTUATION[c]
+                    tok.value = c
+                    index += 1
+                    yield tok
+                    continue
+
+                # Try the rules that can start with c in the order sly would, or else the master regex with all of them
+                candidates = FIRST_CHAR.get(c)
+
+                if candidates is None:
+                    m = master.match(text, index)
+
+                    if m:
+                        tok.type = m.lastgroup
+
+                else:
+                    m = None
+
+                    for kind, pattern in candidates:
+                        m = pattern.match(text, index)
+
+                        if m:
+                            tok.type = kind
+                            break
+
+                if m:
+                    index = m.end()
+                    tok.value = m.group()
+
+                    if tok.type in funcs:
+                        self.index = index
+                        self.lineno = lineno
+                        tok = funcs[tok.type](self, tok)
+                        index = self.index
+                        lineno = self.lineno
+
+                        if not tok:
+                            continue
+
+                    if tok.type in ignored:
+                        continue
+
+                    yield tok
+
+                else:
+                    self.index = index
+                    self.lineno = lineno
+                    tok.type = 'ERROR'
+                    tok.value = text[index:]
+                    tok = self.error(tok)
+
+                    if tok is not None:
+                        yield tok
+
+                    index = self.index
+                    lineno = self.lineno
+
+        finally:
+            self.text = text
+            self.index = index
+            self.lineno = lineno
+
+    # Token type of the identifier text[start:end], or None if sly would split it into more than one token
+    @classmethod
+    def classify(cls, text: str, start: int, end: int) -> Union[str, None]:
+        # Mnemonics are anchored with \b, so they never match right after another word character. Then it's a label.
+        if start and is_word(text[start - 1]):
+            return 'LABEL'
+
+        # Or right before one. IDENT already takes all the ASCII ones.
+        if end < len(text) and is_word(text[end]):
+            return None
+
+        word = text[start:end]
+
+        if word not in cls.words:
+            # Mnemonics and LABEL are the only rules that can match here, and only the word decides which.
+            m = cls._master_re.match(word)
+            cls.words[word] = m.lastgroup if m and m.end() == len(word) else None
+
+        return cls.words[word]
+
+
+def is_word(c: str) -> bool:
+    # Same as \w in a regex
+    return c.isalnum() or c == '_'
+
+
+def rule(name: str) -> re.Pattern:
+    rules = dict(MipsLexer._rules)
+    pattern = rules[name]
+
+    return re.compile(pattern if isinstance(pattern, str) else pattern.pattern, MipsLexer.reflags)
+
+
+# Tables for MipsLexer.fast_tokenize
+IDENT_START = set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_')
+IDENT = rule('LABEL')
+REG_RULE = rule('REG')
+F_REG_RULE = rule('F_REG')
+PUNCTUATION = {'(': 'LPAREN', ')': 'RPAREN', ',': 'COMMA', ':': 'COLON'}
+
+# Rules that can match starting at a character, in the order they are in the master regex
+FIRST_CHAR = {'\x81': [('LINE_MARKER', rule('LINE_MARKER'))],
+              '#': [('comments', rule('ignore_comments'))],
+              '\n': [('newline', rule('ignore_newline'))],
+              '-': [('FLOAT_LITERAL', rule('FLOAT_LITERAL')), ('NUMBER', rule('NUMBER'))],
+              **{d: [('FLOAT_LITERAL', rule('FLOAT_LITERAL')), ('NUMBER', rule('NUMBER'))] for d in '0123456789'}}
@@ -1,5 +1,7 @@
+from cache import cache_dir
 from constants import *
 from interpreter.interpreter import *
+from interpreter.utility import reg_name
 from lexer import MipsLexer
 from sly.yacc import Parser
 
@@ -20,6 +22,11 @@ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLI
 '''
 
 
+# Registers used by the expansions of pseudoinstructions
+ZERO = REG_INDEX['$zero']
+AT = REG_INDEX['$at']
+
+
 def get_upper_half(x: int) -> int:
     # Get the upper 16 bits of a 32 bit number.
     return (x >> 16) & 0xFFFF
@@ -27,22 +34,26 @@ def get_upper_half(x: int) -> int:
 
 class MipsParser(Parser):
     tokens = MipsLexer.tokens
-    debugfile = 'parser.out'
+    cachedir = cache_dir()  # Where the parser tables are cached between runs
+    debugfile = None  # Set to a file name to write out the grammar and LR tables when debugging the grammar
 
-    def __init__(self, original_text, filename):
+    def __init__(self, contents: Dict[str, str], filename):
         self.labels = {}
-        self.original_text = original_text.split('\n')
-        self.filename = filename
+        # Source lines of every file in the program, for showing the original text of instructions
+        self.original_text = {name: text.split('\n') for name, text in contents.items()}
+        self.filename = filename  # File the tokens being parsed come from. assemble updates it as it splices includes in.
 
     # Top level section (Data, Text)
     @_('sects')
     def program(self, p):
         return p.sects
 
-    @_('sect', 'sect sects')
+    # Lists are built with left recursion, appending to the list so far, so long programs parse in linear time
+    @_('sect', 'sects sect')
     def sects(self, p):
         if 'sects' in p._namemap:
-            return p.sect + p.sects
+            p.sects.extend(p.sect)
+            return p.sects
 
         return p.sect
 
@@ -63,7 +74,6 @@ class MipsParser(Parser):
         x = p[0].split()
         file_name = x[1]
         line_number = int(x[2])
-        self.filename = x[1]
         return FileTag(file_name, line_number)
 
     @_('LABEL COLON')
@@ -71,9 +81,9 @@ class MipsParser(Parser):
         return Label(p.LABEL)
 
     # INSTRUCTIONS
-    @_('instr filetag instrs', 'instr filetag', 'label instr filetag', 'label instr filetag instrs')
+    @_('instrs instr filetag', 'instr filetag', 'label instr filetag', 'instrs label instr filetag')
     def instrs(self, p):
-        result = []
+        result = p.instrs if 'instrs' in p._namemap else []
 
         if type(p.instr) is PseudoInstr:
             for i in range(len(p.instr.instrs)):
@@ -83,7 +93,7 @@ class MipsParser(Parser):
 
         else:
             p.instr.filetag = p.filetag
-            p.instr.original_text = self.original_text[p.filetag.line_no - 1]
+            p.instr.original_text = self.original_text[p.filetag.file_name[1:-1]][p.filetag.line_no - 1]
             p.instr.is_from_pseudoinstr = False
 
         if 'label' in p._namemap:
@@ -92,9 +102,6 @@ class MipsParser(Parser):
         if 'instr' in p._namemap:
             result.append(p.instr)
 
-        if 'instrs' in p._namemap:
-            result += p.instrs
-
         return result
 
     @_('branch', 'rType', 'syscall', 'jType', 'iType', 'move', 'label', 'nop', 'breakpoint')
@@ -148,7 +155,7 @@ class MipsParser(Parser):
             return Branch(p[0], p[1], p[2], Label(p[3]))
 
         else:
-            return Branch(p[0], p[1], '$0', Label(p[2]))
+            return Branch(p[0], p[1], ZERO, Label(p[2]))
 
     @_('SYSCALL')
     def syscall(self, p):
@@ -213,15 +220,15 @@ class MipsParser(Parser):
         val = p[3]
 
         if p[0] == 'rol':
-            instrs.append(IType('srl', ['$at', p.REG1], 32 - val))
+            instrs.append(IType('srl', [AT, p.REG1], 32 - val))
             instrs.append(IType('sll', [p.REG0, p.REG1], val))
-            instrs.append(RType('or', [p.REG0, p.REG0, '$at']))
-            return PseudoInstr(f'{p[0]} {p[1]} {p[2]} {p[3]}', instrs)
+            instrs.append(RType('or', [p.REG0, p.REG0, AT]))
+            return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])} {p[3]}', instrs)
         elif p[0] == 'ror':
-            instrs.append(IType('sll', ['$at', p.REG1], 32 - val))
+            instrs.append(IType('sll', [AT, p.REG1], 32 - val))
             instrs.append(IType('srl', [p.REG0, p.REG1], val))
-            instrs.append(RType('or', [p.REG0, p.REG0, '$at']))
-            return PseudoInstr(f'{p[0]} {p[1]} {p[2]} {p[3]}', instrs)
+            instrs.append(RType('or', [p.REG0, p.REG0, AT]))
+            return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])} {p[3]}', instrs)
 
         return None
 
@@ -231,83 +238,83 @@ class MipsParser(Parser):
 
         if p[0] == 'seq':
             instrs.append(RType('subu', [p.REG0, p.REG1, p.REG2]))
-            instrs.append(IType('ori', ['$at', '$0'], 1))
-            instrs.append(RType('sltu', [p.REG0, p.REG0, '$at']))
-            return PseudoInstr(f'{p[0]} {p[1]} {p[2]} {p[3]}', instrs)
+            instrs.append(IType('ori', [AT, ZERO], 1))
+            instrs.append(RType('sltu', [p.REG0, p.REG0, AT]))
+            return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])} {reg_name(p[3])}', instrs)
 
         elif p[0] == 'sne':
             instrs.append(RType('subu', [p.REG0, p.REG1, p.REG2]))
-            instrs.append(RType('sltu', [p.REG0, '$0', p.REG0]))
-            return PseudoInstr(f'{p[0]} {p[1]} {p[2]} {p[3]}', instrs)
+            instrs.append(RType('sltu', [p.REG0, ZERO, p.REG0]))
+            return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])} {reg_name(p[3])}', instrs)
 
         elif p[0] == 'sge':
             instrs.append(RType('slt', [p.REG0, p.REG1, p.REG2]))
-            instrs.append(IType('ori', ['$at', '$0'], 1))
-            instrs.append(RType('subu', [p.REG0, '$at', p.REG0]))
-            return PseudoInstr(f'{p[0]} {p[1]} {p[2]} {p[3]}', instrs)
+            instrs.append(IType('ori', [AT, ZERO], 1))
+            instrs.append(RType('subu', [p.REG0, AT, p.REG0]))
+            return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])} {reg_name(p[3])}', instrs)
 
         elif p[0] == 'sgeu':
             instrs.append(RType('sltu', [p.REG0, p.REG1, p.REG2]))
-            instrs.append(IType('ori', ['$at', '$0'], 1))
-            instrs.append(RType('subu', [p.REG0, '$at', p.REG0]))
-            return PseudoInstr(f'{p[0]} {p[1]} {p[2]} {p[3]}', instrs)
+            instrs.append(IType('ori', [AT, ZERO], 1))
+            instrs.append(RType('subu', [p.REG0, AT, p.REG0]))
+            return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])} {reg_name(p[3])}', instrs)
 
         elif p[0] == 'sgt':
             instrs.append(RType('slt', [p.REG0, p.REG2, p.REG1]))
-            return PseudoInstr(f'{p[0]} {p[1]} {p[2]} {p[3]}', instrs)
+            return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])} {reg_name(p[3])}', instrs)
 
         elif p[0] == 'sgtu':
             instrs.append(RType('sltu', [p.REG0, p.REG2, p.REG1]))
-            return PseudoInstr(f'{p[0]} {p[1]} {p[2]} {p[3]}', instrs)
+            return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])} {reg_name(p[3])}', instrs)
 
         elif p[0] == 'sle':
             instrs.append(RType('slt', [p.REG0, p.REG2, p.REG1]))
-            instrs.append(IType('ori', ['$at', '$0'], 1))
-            instrs.append(RType('subu', [p.REG0, '$at', p.REG0]))
-            return PseudoInstr(f'{p[0]} {p[1]} {p[2]} {p[3]}', instrs)
+            instrs.append(IType('ori', [AT, ZERO], 1))
+            instrs.append(RType('subu', [p.REG0, AT, p.REG0]))
+            return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])} {reg_name(p[3])}', instrs)
 
         elif p[0] == 'sleu':
             instrs.append(RType('sltu', [p.REG0, p.REG2, p.REG1]))
-            instrs.append(IType('ori', ['$at', '$0'], 1))
-            instrs.append(RType('subu', [p.REG0, '$at', p.REG0]))
-            return PseudoInstr(f'{p[0]} {p[1]} {p[2]} {p[3]}', instrs)
+            instrs.append(IType('ori', [AT, ZERO], 1))
+            instrs.append(RType('subu', [p.REG0, AT, p.REG0]))
+            return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])} {reg_name(p[3])}', instrs)
 
         elif p[0] == 'rolv':
-            instrs.append(RType('subu', ['$at', '$0', p.REG2]))
-            instrs.append(RType('srlv', ['$at', p.REG1, '$at']))
+            instrs.append(RType('subu', [AT, ZERO, p.REG2]))
+            instrs.append(RType('srlv', [AT, p.REG1, AT]))
             instrs.append(RType('sllv', [p.REG0, p.REG1, p.REG2]))
-            instrs.append(RType('or', [p.REG0, p.REG0, '$at']))
-            return PseudoInstr(f'{p[0]} {p[1]} {p[2]} {p[3]}', instrs)
+            instrs.append(RType('or', [p.REG0, p.REG0, AT]))
+            return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])} {reg_name(p[3])}', instrs)
 
         elif p[0] == 'rorv':
-            instrs.append(RType('subu', ['$at', '$0', p.REG2]))
-            instrs.append(RType('sllv', ['$at', p.REG1, '$at']))
+            instrs.append(RType('subu', [AT, ZERO, p.REG2]))
+            instrs.append(RType('sllv', [AT, p.REG1, AT]))
             instrs.append(RType('srlv', [p.REG0, p.REG1, p.REG2]))
-            instrs.append(RType('or', [p.REG0, p.REG0, '$at']))
-            return PseudoInstr(f'{p[0]} {p[1]} {p[2]} {p[3]}', instrs)
+            instrs.append(RType('or', [p.REG0, p.REG0, AT]))
+            return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])} {reg_name(p[3])}', instrs)
 
         return None
 
     @_('PS_R_TYPE2 REG REG')
     def rType(self, p):
         if p[0] == 'move':
-            instr = RType('addu', [p.REG0, '$0', p.REG1])
-            return PseudoInstr(f'{p[0]} {p[1]} {p[2]}', [instr])
+            instr = RType('addu', [p.REG0, ZERO, p.REG1])
+            return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])}', [instr])
 
         elif p[0] == 'neg':
-            instr = RType('sub', [p.REG0, '$0', p.REG1])
-            return PseudoInstr(f'{p[0]} {p[1]} {p[2]}', [instr])
+            instr = RType('sub', [p.REG0, ZERO, p.REG1])
+            return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])}', [instr])
 
         elif p[0] == 'not':
-            instr = RType('nor', [p.REG0, p.REG1, '$0'])
-            return PseudoInstr(f'{p[0]} {p[1]} {p[2]}', [instr])
+            instr = RType('nor', [p.REG0, p.REG1, ZERO])
+            return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])}', [instr])
 
         elif p[0] == 'abs':
             instr = []
-            instr.append(IType('sra', ['$at', p.REG1], 31))
-            instr.append(RType('xor', [p.REG0, '$at', p.REG1]))
-            instr.append(RType('subu', [p.REG0, p.REG0, '$at']))
-            return PseudoInstr(f'{p[0]} {p[1]} {p[2]}', instr)
+            instr.append(IType('sra', [AT, p.REG1], 31))
+            instr.append(RType('xor', [p.REG0, AT, p.REG1]))
+            instr.append(RType('subu', [p.REG0, p.REG0, AT]))
+            return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])}', instr)
 
         return None
 
@@ -318,31 +325,31 @@ class MipsParser(Parser):
             val = p[2]
 
             if 0 <= val < HALF_SIZE:
-                instrs.append(IType('ori', [p.REG, '$0'], val))
+                instrs.append(IType('ori', [p.REG, ZERO], val))
             else:
-                instrs.append(LoadImm('lui', '$at', get_upper_half(val)))
-                instrs.append(IType('ori', [p.REG, '$at'], val & 0xFFFF))
+                instrs.append(LoadImm('lui', AT, get_upper_half(val)))
+                instrs.append(IType('ori', [p.REG, AT], val & 0xFFFF))
 
-            return PseudoInstr(f'{p[0]} {p[1]} {p[2]}', instrs)
+            return PseudoInstr(f'{p[0]} {reg_name(p[1])} {p[2]}', instrs)
 
         return None
 
     @_('PS_LOADS_A REG LABEL')
     def iType(self, p):
         instrs = []
-        instrs.append(LoadImm('lui', '$at', 0))
-        instrs.append(IType('ori', [p.REG, '$at'], 0))
+        instrs.append(LoadImm('lui', AT, 0))
+        instrs.append(IType('ori', [p.REG, AT], 0))
 
-        pseudoInstr = PseudoInstr(f'{p[0]} {p[1]} {p[2]}', instrs)
+        pseudoInstr = PseudoInstr(f'{p[0]} {reg_name(p[1])} {p[2]}', instrs)
         pseudoInstr.label = Label(p.LABEL)
         return pseudoInstr
 
     @_('LOADS_R REG LABEL')
     def iType(self, p):
         # If it has a label, it's a pseudoinstruction
-        instrs = [LoadImm('lui', '$at', 0), LoadMem(p[0], p.REG, '$at', 0)]
+        instrs = [LoadImm('lui', AT, 0), LoadMem(p[0], p.REG, AT, 0)]
 
-        pseudoInstr = PseudoInstr(f'{p[0]} {p[1]} {p[2]}', instrs)
+        pseudoInstr = PseudoInstr(f'{p[0]} {reg_name(p[1])} {p[2]}', instrs)
         pseudoInstr.label = Label(p.LABEL)
         return pseudoInstr
 
@@ -351,62 +358,61 @@ class MipsParser(Parser):
         if len(p) == 4:
             instr = []
             if p[0] == 'bge':
-                instr.append(RType('slt', ['$at', p[1], p[2]]))
-                instr.append(Branch('beq', '$at', '$0', Label(p[3])))
-                return PseudoInstr(f'{p[0]} {p[1]} {p[2]} {p[3]}', instr)
+                instr.append(RType('slt', [AT, p[1], p[2]]))
+                instr.append(Branch('beq', AT, ZERO, Label(p[3])))
+                return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])} {p[3]}', instr)
             elif p[0] == 'bgeu':
-                instr.append(RType('sltu', ['$at', p[1], p[2]]))
-                instr.append(Branch('beq', '$at', '$0', Label(p[3])))
-                return PseudoInstr(f'{p[0]} {p[1]} {p[2]} {p[3]}', instr)
+                instr.append(RType('sltu', [AT, p[1], p[2]]))
+                instr.append(Branch('beq', AT, ZERO, Label(p[3])))
+                return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])} {p[3]}', instr)
             elif p[0] == 'bgt':
-                instr.append(RType('slt', ['$at', p[2], p[1]]))
-                instr.append(Branch('bne', '$at', '$0', Label(p[3])))
-                return PseudoInstr(f'{p[0]} {p[1]} {p[2]} {p[3]}', instr)
+                instr.append(RType('slt', [AT, p[2], p[1]]))
+                instr.append(Branch('bne', AT, ZERO, Label(p[3])))
+                return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])} {p[3]}', instr)
             elif p[0] == 'bgtu':
-                instr.append(RType('sltu', ['$at', p[2], p[1]]))
-                instr.append(Branch('bne', '$at', '$0', Label(p[3])))
-                return PseudoInstr(f'{p[0]} {p[1]} {p[2]} {p[3]}', instr)
+                instr.append(RType('sltu', [AT, p[2], p[1]]))
+                instr.append(Branch('bne', AT, ZERO, Label(p[3])))
+                return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])} {p[3]}', instr)
             elif p[0] == 'ble':
-                instr.append(RType('slt', ['$at', p[2], p[1]]))
-                instr.append(Branch('beq', '$at', '$0', Label(p[3])))
-                return PseudoInstr(f'{p[0]} {p[1]} {p[2]} {p[3]}', instr)
+                instr.append(RType('slt', [AT, p[2], p[1]]))
+                instr.append(Branch('beq', AT, ZERO, Label(p[3])))
+                return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])} {p[3]}', instr)
             elif p[0] == 'bleu':
-                instr.append(RType('sltu', ['$at', p[2], p[1]]))
-                instr.append(Branch('beq', '$at', '$0', Label(p[3])))
-                return PseudoInstr(f'{p[0]} {p[1]} {p[2]} {p[3]}', instr)
+                instr.append(RType('sltu', [AT, p[2], p[1]]))
+                instr.append(Branch('beq', AT, ZERO, Label(p[3])))
+                return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])} {p[3]}', instr)
             elif p[0] == 'blt':
-                instr.append(RType('slt', ['$at', p[1], p[2]]))
-                instr.append(Branch('bne', '$at', '$0', Label(p[3])))
-                return PseudoInstr(f'{p[0]} {p[1]} {p[2]} {p[3]}', instr)
+                instr.append(RType('slt', [AT, p[1], p[2]]))
+                instr.append(Branch('bne', AT, ZERO, Label(p[3])))
+                return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])} {p[3]}', instr)
             elif p[0] == 'bltu':
-                instr.append(RType('sltu', ['$at', p[1], p[2]]))
-                instr.append(Branch('bne', '$at', '$0', Label(p[3])))
-                return PseudoInstr(f'{p[0]} {p[1]} {p[2]} {p[3]}', instr)
+                instr.append(RType('sltu', [AT, p[1], p[2]]))
+                instr.append(Branch('bne', AT, ZERO, Label(p[3])))
+                return PseudoInstr(f'{p[0]} {reg_name(p[1])} {reg_name(p[2])} {p[3]}', instr)
             else:
                 return None
         else:
             instr = []
             if p[0] == 'beqz':
-                instr.append(Branch('beq', p.REG, '$0', Label(p[2])))
-                return PseudoInstr(f'{p[0]} {p[1]} {p[2]}', instr)
+                instr.append(Branch('beq', p.REG, ZERO, Label(p[2])))
+                return PseudoInstr(f'{p[0]} {reg_name(p[1])} {p[2]}', instr)
             elif p[0] == 'bnez':
-                instr.append(Branch('bne', p.REG, '$0', Label(p[2])))
-                return PseudoInstr(f'{p[0]} {p[1]} {p[2]}', instr)
+                instr.append(Branch('bne', p.REG, ZERO, Label(p[2])))
+                return PseudoInstr(f'{p[0]} {reg_name(p[1])} {p[2]}', instr)
             else:
                 return None
 
     # DECLARATIONS
-    @_('declaration filetag declarations', 'declaration filetag')
+    @_('declarations declaration filetag', 'declaration filetag')
     def declarations(self, p):
         if p.declaration:
             p.declaration[0].filetag = p.filetag
 
-        result = p.declaration
-
         if len(p) == 3:
-            result += p.declarations
+            p.declarations.extend(p.declaration)
+            return p.declarations
 
-        return result
+        return p.declaration
 
     @_('label ASCIIZ STRING', 'label WORD nums', 'label BYTE chars', 'label ASCII STRING', 'label SPACE nums',
        'label HALF nums',
@@ -423,32 +429,29 @@ class MipsParser(Parser):
         # Eqv
         return []
 
-    @_('NUMBER', 'NUMBER COMMA nums', 'NUMBER nums')
+    @_('NUMBER', 'nums COMMA NUMBER', 'nums NUMBER')
     def nums(self, p):
-        result = [p.NUMBER]
-
         if len(p) > 1:
-            result += p.nums
+            p.nums.append(p.NUMBER)
+            return p.nums
 
-        return result
+        return [p.NUMBER]
 
-    @_('FLOAT_LITERAL', 'FLOAT_LITERAL COMMA floats', 'FLOAT_LITERAL floats')
+    @_('FLOAT_LITERAL', 'floats COMMA FLOAT_LITERAL', 'floats FLOAT_LITERAL')
     def floats(self, p):
-        result = [p.FLOAT_LITERAL]
-
         if len(p) > 1:
-            result += p.floats
+            p.floats.append(p.FLOAT_LITERAL)
+            return p.floats
 
-        return result
+        return [p.FLOAT_LITERAL]
 
-    @_('CHAR', 'CHAR COMMA chars', 'CHAR chars', 'NUMBER', 'NUMBER COMMA chars', 'NUMBER chars')
+    @_('CHAR', 'chars COMMA CHAR', 'chars CHAR', 'NUMBER', 'chars COMMA NUMBER', 'chars NUMBER')
     def chars(self, p):
-        result = [p[0]]
-
         if len(p) > 1:
-            result += p[-1]
+            p.chars.append(p[-1])
+            return p.chars
 
-        return result
+        return [p[0]]
 
     def error(self, p):
         message = ''
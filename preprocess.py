@@ -1,4 +1,4 @@
-from typing import Tuple, Dict
+from typing import Callable, Dict, Tuple, Union
 
 from constants import FILE_MARKER, LINE_MARKER
 from interpreter.exceptions import *
@@ -82,44 +82,67 @@ def walk(filename: Path, files: List[Path], eqv: Dict[str, str], abs_to_rel: Dic
     f.close()
 
 
-# Perform macro substitutions of a single line of code.
-def substitute(line: str, eqv: Dict[str, str]) -> str:
-    for original, substitution in eqv.items():
-        def replace_func(match):
-            # Get the index of the capture group that was matched
-            group = match.lastindex
+# Build a function doing every .eqv substitution on a line in a single regex pass.
+def eqv_substitution(eqv: Dict[str, str]) -> Callable[[str], str]:
+    if not eqv:
+        return lambda line: line
 
-            # If it's the desired word and it's not in comments or strings, do the substitution
-            if group == 4:
-                return substitution
+    # walk() stores each name as \bname\b
+    names = [original[2:-2] for original in eqv.keys()]
+    substitutions = list(eqv.values())
+    index = {name: i for i, name in enumerate(names)}
 
-            # Otherwise, just ignore it
-            else:
-                return match.group(group)
+    # 1st group: Capture anything inside of double quotes
+    # 2nd group: Capture anything after #
+    # 3rd group: Capture anything after line marker
+    # 4th group: Capture any of the words to replace
+    # We don't actually care about the first 3 groups. We just have it so that we can exclude them from eqv substitution.
+    pattern = re.compile(rf'("[^"]+")|(#.*)|(\x81.*)|\b({"|".join(names)})\b')
+
+    def which(word: str) -> Union[int, None]:
+        if word in index:
+            return index[word]
+
+        # Names aren't escaped, so one can match more than its own text
+        for i, name in enumerate(names):
+            if re.fullmatch(name, word):
+                return i
+
+        return None
+
+    def replace_func(match, after=-1):
+        # If it's one of the desired words and it's not in comments or strings, do the substitution
+        if match.lastindex == 4:
+            i = which(match.group(4))
 
-        # 1st group: Capture anything inside of double quotes
-        # 2nd group: Capture anything after #
-        # 3rd group: Capture anything after line marker
-        # 4th group: Capture the word to replace
-        # We don't actually care about the first 3 groups. We just have it so that we can exclude them from eqv substitution.
-        eqv_pattern = rf'("[^"]+")|(#.*)|(\x81.*)|(\b{original}\b)'
+            if i is not None and i > after:
+                return substitutions[i]
 
-        # Do the substitution. We provide a custom substitution function.
-        line = re.sub(eqv_pattern, replace_func, line)
+        # Otherwise, just ignore it
+        return match.group()
 
-    return line
+    # Names used to be substituted one at a time in the order they were defined, so a replacement can contain
+    # a name defined after it that gets replaced too. Expand those now, from the last definition back.
+    for i in reversed(range(len(substitutions))):
+        substitutions[i] = pattern.sub(lambda match: replace_func(match, i), substitutions[i])
+
+    def substitute(line: str) -> str:
+        return pattern.sub(replace_func, line)
+
+    return substitute
 
 
 def preprocess(contents: str, file: str, eqv: Dict[str, str]) -> str:
-    newText = ''
+    newText = []
     count = 1
     first_line = True
+    substitute = eqv_substitution(eqv)
 
     # print(contents)
     # print(contents.split('\n'))
     for line in contents.split('\n'):
         line = line.strip()
-        line = substitute(line, eqv)
+        line = substitute(line)
 
         if line == '' or line[0] == '#':
             line = line + '\n'
@@ -130,18 +153,6 @@ def preprocess(contents: str, file: str, eqv: Dict[str, str]) -> str:
             line = line + f' {LINE_MARKER} \"{file}\" {count}\n'
 
         count += 1
-        newText += line
-
-    return newText
-
+        newText.append(line)
 
-def link(files: List[Path], contents: Dict[str, str], processed: Dict[str, str], abs_to_rel: Dict[str, str]):
-    og_text = contents[files[0].as_posix()]
-    text = processed[files[0].as_posix()]
-    for name, content in contents.items():
-        if name in abs_to_rel:
-            pattern = rf'\.include "{abs_to_rel[name]}".*?\n'
-            og_text = re.sub(pattern, content, og_text)
-            processed[name] = re.sub(r'\\', '\\\\\\\\', processed[name])
-            text = re.sub(pattern, processed[name], text)
-    return (og_text, text)
+    return ''.join(newText)
@@ -4,6 +4,10 @@ from tests.preprocess.test_preprocess import TestPreprocess
 from tests.instructions.test import TestSBUMips
 from tests.fileOps.test_fileOps import TestFileOps
 from tests.floatInstrs.test import FloatTest
+from tests.blocks.test_blocks import TestBlocks
+from tests.lexer.test_lexer import TestLexer
+from tests.debugger.test_debugger import TestDebugger
+from tests.debugger.test_gdb import TestGdbStub
 import unittest
 from os import chdir
 
@@ -30,4 +34,15 @@ if __name__ == '__main__':
 
     chdir('../floatInstrs')
     suite = unittest.defaultTestLoader.loadTestsFromTestCase(testCaseClass=FloatTest)
-    unittest.TextTestRunner().run(suite)
\ No newline at end of file
+    unittest.TextTestRunner().run(suite)
+    chdir('../blocks')
+    suite = unittest.defaultTestLoader.loadTestsFromTestCase(testCaseClass=TestBlocks)
+    unittest.TextTestRunner().run(suite)
+    chdir('../lexer')
+    suite = unittest.defaultTestLoader.loadTestsFromTestCase(testCaseClass=TestLexer)
+    unittest.TextTestRunner().run(suite)
+    chdir('../debugger')
+    suite = unittest.defaultTestLoader.loadTestsFromTestCase(testCaseClass=TestDebugger)
+    unittest.TextTestRunner().run(suite)
+    suite = unittest.defaultTestLoader.loadTestsFromTestCase(testCaseClass=TestGdbStub)
+    unittest.TextTestRunner().run(suite)
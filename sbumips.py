@@ -1,11 +1,17 @@
 import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
+from typing import Iterator, Tuple
 
+import cache
 from interpreter.interpreter import *
 from lexer import MipsLexer
 from mipsParser import MipsParser
-from preprocess import walk, link, preprocess
+from preprocess import walk, preprocess
 from settings import settings
+from sly.lex import Token
 
 '''
 https://github.com/sbustars/STARS
@@ -23,6 +29,9 @@ The above copyright notice and this permission notice shall be included in all c
 THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 '''
 
+# Least total source size worth lexing in parallel. Below this, starting the worker processes costs more than it saves.
+PARALLEL_MIN_SIZE = 64 * 1024
+
 
 def init_args() -> argparse.Namespace:
     p = argparse.ArgumentParser()
@@ -31,9 +40,16 @@ def init_args() -> argparse.Namespace:
     p.add_argument('-a', '--assemble', help='Assemble code without running', action='store_true')
     p.add_argument('-d', '--debug', help='Enables debugging mode', action='store_true')
     p.add_argument('-g', '--garbage', help='Enables garbage data', action='store_true')
+    p.add_argument('--seed', help='Seed for garbage data, so garbage runs can be repeated', type=int)
     p.add_argument('-n', '--max_instructions', help='Sets max number of instructions', type=int)
     p.add_argument('-i', '--disp_instr_count', help='Displays the total instruction count', action='store_true')
     p.add_argument('-w', '--warnings', help='Enables warnings', action='store_true')
+    p.add_argument('--engine', help='Execution engine to use (default: closures)', choices=['closures', 'blocks'],
+                   default='closures')
+    p.add_argument('--gdb-port', help='Wait for GDB to connect on this port of localhost and let it run the program',
+                   type=int)
+    p.add_argument('--cache', help='Keep assembled programs in the user cache directory to skip assembling them again',
+                   action='store_true')
     p.add_argument('-pa', type=str, nargs='+', help='Program arguments for the MIPS program')
 
     return p.parse_args()
@@ -44,13 +60,52 @@ def init_settings(args: argparse.Namespace) -> None:
     settings['debug'] = args.debug
     settings['garbage_memory'] = args.garbage
     settings['garbage_registers'] = args.garbage
+    settings['seed'] = args.seed
     settings['disp_instr_count'] = args.disp_instr_count
     settings['warnings'] = args.warnings
+    settings['engine'] = args.engine
+    settings['program_cache'] = args.cache
+    settings['gdb_port'] = args.gdb_port
 
     if args.max_instructions:
         settings['max_instructions'] = args.max_instructions
 
 
+# Read, preprocess and lex one file. Returns its original contents and its tokens.
+def lex_file(file: str, eqv: Dict[str, str]) -> Tuple[str, List[Token]]:
+    with open(file) as f:
+        contents = f.read()
+
+    lexer = MipsLexer(file)
+    return contents, list(lexer.tokenize(preprocess(contents, file, eqv)))
+
+
+# lex_file for worker processes. Tokens are sent back as plain tuples, which pickle several times faster.
+def lex_file_packed(file: str, eqv: Dict[str, str]) -> Tuple[str, List[Tuple]]:
+    contents, tokens = lex_file(file, eqv)
+    return contents, [(tok.type, tok.value, tok.lineno, tok.index) for tok in tokens]
+
+
+def unpack_tokens(packed: List[Tuple]) -> List[Token]:
+    tokens = []
+
+    for tok_type, value, lineno, index in packed:
+        tok = Token()
+        tok.type, tok.value, tok.lineno, tok.index = tok_type, value, lineno, index
+        tokens.append(tok)
+
+    return tokens
+
+
+# Lex every file, spread over worker processes if workers > 1. Results and errors come back in the order of files.
+def lex_files(files: List[str], eqv: Dict[str, str], workers: int) -> List[Tuple[str, List[Token]]]:
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return [(contents, unpack_tokens(packed)) for contents, packed in pool.map(lex_file_packed, files, repeat(eqv))]
+
+    return [lex_file(file, eqv) for file in files]
+
+
 def assemble(filename: str) -> List:
     path = Path(filename)
     path.resolve()
@@ -60,37 +115,62 @@ def assemble(filename: str) -> List:
     abs_to_rel = {}
 
     walk(path, files, eqv_dict, abs_to_rel, path.parent)
+
+    # The same program is often run many times, so skip the rest of the assembler if it has been seen before
+    key = None
+
+    if cache.enabled():
+        key = cache.program_key(files, eqv_dict, abs_to_rel)
+        result = cache.load(key)
+
+        if result is not None:
+            if settings['assemble']:
+                print('Program assembled successfully.')
+                exit()
+
+            return result
+
+    names = [file.as_posix() for file in files]
+    workers = 0
+
+    # Big projects with many includes are lexed in parallel. The GUI never forks, since Qt doesn't survive it.
+    if len(files) > 1 and not settings['gui'] and sum(file.stat().st_size for file in files) >= PARALLEL_MIN_SIZE:
+        workers = min(len(files), os.cpu_count() or 1)
+
     contents = {}
-    results = {}
-    processed = {}
-    for file in files:
-        with file.open() as f:
-            s = f.readlines()
-            file = file.as_posix()
+    tokens = {}
+    for file, (text, toks) in zip(names, lex_files(names, eqv_dict, workers)):
+        contents[file] = text
+        tokens[file] = toks
 
-            contents[file] = ''.join(s)
-            processed[file] = preprocess(contents[file], file, eqv_dict)
+    # Each file is lexed once. Includes are spliced in at the token level, then the whole program is parsed once.
+    # The parser is told which file the tokens come from, so syntax errors name the file of the token they're on.
+    def splice(file: str) -> Iterator:
+        parser.filename = file
 
-            lexer = MipsLexer(file)
-            parser = MipsParser(contents[file], file)
+        for tok in tokens[file]:
+            if tok.type != 'INCLUDE':
+                yield tok
 
-            tokenized = lexer.tokenize(processed[file])
-            results[file] = parser.parse(tokenized)
+            else:
+                included = path.parent.joinpath(tok.value).as_posix()
+
+                if included in tokens:
+                    yield from splice(included)
+                    parser.filename = file
+
+    main = files[0].as_posix()
+    parser = MipsParser(contents, main)
+    result = parser.parse(splice(main))
+
+    if key is not None:
+        cache.store(key, result)
 
     if settings['assemble']:
         print('Program assembled successfully.')
         exit()
 
-    og_text, text = link(files, contents, processed, abs_to_rel)
-    # print(f'*****\n{og_text}')
-    # print(f'*****\n{text}')
-    parser = MipsParser(og_text, files[0])
-    lexer = MipsLexer(files[0].as_posix())
-
-    t = lexer.tokenize(text)
-    # for toks in t:
-    #     print(toks)
-    return parser.parse(t)
+    return result
 
 
 
@@ -103,7 +183,12 @@ if __name__ == '__main__':
     try:
         result = assemble(args.filename)
         inter = Interpreter(result, pArgs)
-        inter.interpret()
+
+        if settings['gdb_port'] is not None:
+            from interpreter.gdbstub import GdbStub  # Only loaded when it's used, to keep other runs starting fast
+            GdbStub(inter, settings['gdb_port']).serve()
+        else:
+            inter.interpret()
 
         if settings['disp_instr_count']:
             inter.out(f'\nInstruction count: {inter.instruction_count}')
@@ -32,6 +32,7 @@ settings = {
     'max_instructions': 1_000_000,  # Maximum instruction count
     'garbage_registers': False,  # Garbage values in registers / memory
     'garbage_memory': False,
+    'seed': None,  # Seed for garbage registers / memory. None picks a different seed every run
 
     'pseudo_ops': {'R_TYPE3': [
         'seq',
@@ -83,6 +84,13 @@ settings = {
     'disp_instr_count': False,
     'warnings': False,
     'gui': False,
+    'engine': 'closures',  # 'closures' runs one compiled instruction at a time, 'blocks' runs whole basic blocks
+    'program_cache': False,  # Also keep assembled programs on disk, not just in memory
+    'reverse_depth': 100_000,  # Number of instructions the debugger can step back over from its journal
+    # Instructions between the debugger's copies of the whole program state, for going back past the journal.
+    # 0 turns them off
+    'checkpoint_interval': 10_000,
+    'gdb_port': None,  # Port to serve the GDB remote protocol on instead of running the program. None runs it as usual
 
     'enabled_syscalls': {1, 2, 3, 4, 5, 6, 8, 9, 10, 11, 13, 14, 15, 16, 17, 30, 31, 32, 34, 35, 36, 40, 41}
 }
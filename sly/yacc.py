@@ -33,10 +33,17 @@
 
 import sys
 import inspect
+import hashlib
+import marshal
+import os
+import tempfile
 from collections import OrderedDict, defaultdict
 
 __all__        = [ 'Parser' ]
 
+# Version of the cached table format. Bump it whenever the table generator changes.
+_tablecache_version = 1
+
 class YaccError(Exception):
     '''
     Exception raised for yacc-related build errors.
@@ -953,6 +960,31 @@ class LRTable(object):
             if len(rules) == 1 and rules[0] < 0:
                 self.defaulted_states[state] = rules[0]
 
+    # Rebuild a table from the parts saved by cache_tables() without running the generator.
+    # Only the parts used for parsing and conflict reporting are restored.
+    @classmethod
+    def from_cache(cls, grammar, cached):
+        lr_action, lr_goto, sr_conflicts, rr_conflicts = cached
+        self = cls.__new__(cls)
+        self.grammar = grammar
+        self.lr_action = lr_action
+        self.lr_goto = lr_goto
+        self.lr_productions = grammar.Productions
+        self.sr_conflicts = [tuple(c) for c in sr_conflicts]
+        self.rr_conflicts = [(st, grammar.Productions[chosen], grammar.Productions[rejected])
+                             for st, chosen, rejected in rr_conflicts]
+        self.defaulted_states = {}
+        for state, actions in self.lr_action.items():
+            rules = list(actions.values())
+            if len(rules) == 1 and rules[0] < 0:
+                self.defaulted_states[state] = rules[0]
+        return self
+
+    # The parts of the table that from_cache() needs, as plain data that marshal can write
+    def cache_tables(self):
+        return (self.lr_action, self.lr_goto, self.sr_conflicts,
+                [(st, chosen.number, rejected.number) for st, chosen, rejected in self.rr_conflicts])
+
     # Compute the LR(0) closure operation on I, where I is a set of LR(0) items.
     def lr0_closure(self, I):
         self._add_count += 1
@@ -1602,6 +1634,10 @@ class Parser(metaclass=ParserMeta):
     # Debugging filename where parsetab.out data can be written
     debugfile = None
 
+    # Directory where the LR tables are cached between runs, keyed by a hash of the grammar.
+    # None turns the cache off.
+    cachedir = None
+
     @classmethod
     def __validate_tokens(cls):
         if not hasattr(cls, 'tokens'):
@@ -1734,12 +1770,61 @@ class Parser(metaclass=ParserMeta):
         if errors:
             raise YaccError('Unable to build grammar.\n'+errors)
 
+    @classmethod
+    def __tablecache_file(cls):
+        '''
+        Name of the file the LR tables for this grammar are cached in
+        '''
+        grammar = cls._grammar
+        signature = [ str(_tablecache_version), str(grammar.Start) ]
+        signature += [ f'{p} {p.prec}' for p in grammar.Productions ]
+        signature += [ f'{term} {prec}' for term, prec in sorted(grammar.Precedence.items()) ]
+        digest = hashlib.sha256('\n'.join(signature).encode()).hexdigest()[:32]
+        return os.path.join(cls.cachedir, f'{cls.__name__}-{digest}.tables')
+
+    @classmethod
+    def __read_lrtables(cls):
+        '''
+        Load cached LR tables. Returns None if there aren't any usable ones.
+        '''
+        try:
+            with open(cls.__tablecache_file(), 'rb') as f:
+                return LRTable.from_cache(cls._grammar, marshal.load(f))
+        except (OSError, EOFError, ValueError, TypeError, IndexError):
+            return None
+
+    @classmethod
+    def __write_lrtables(cls, lrtable):
+        '''
+        Cache the LR tables. Failing to write them only means they get rebuilt next time.
+        '''
+        try:
+            os.makedirs(cls.cachedir, exist_ok=True)
+            # Write to a temporary file first so other processes never see a partial file
+            fd, tmpname = tempfile.mkstemp(dir=cls.cachedir)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    marshal.dump(lrtable.cache_tables(), f)
+                os.replace(tmpname, cls.__tablecache_file())
+            except BaseException:
+                os.remove(tmpname)
+                raise
+        except OSError:
+            pass
+
     @classmethod
     def __build_lrtables(cls):
         '''
         Build the LR Parsing tables from the grammar
         '''
-        lrtable = LRTable(cls._grammar)
+        # The debug file describes every state, which only a freshly generated table has
+        use_cache = cls.cachedir and not cls.debugfile
+        lrtable = cls.__read_lrtables() if use_cache else None
+        if lrtable is None:
+            lrtable = LRTable(cls._grammar)
+            if use_cache:
+                cls.__write_lrtables(lrtable)
+
         num_sr = len(lrtable.sr_conflicts)
 
         # Report shift/reduce and reduce/reduce conflicts
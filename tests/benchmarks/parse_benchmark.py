@@ -0,0 +1,65 @@
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import cache
+from sbumips import assemble
+
+'''
+https://github.com/sbustars/STARS
+
+Copyright 2020 Kevin McDonnell, Jihu Mun, and Ian Peitzsch
+
+Developed by Kevin McDonnell (ktm@cs.stonybrook.edu),
+Jihu Mun (jihu1011@gmail.com),
+and Ian Peitzsch (irpeitzsch@gmail.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+# Assembles generated programs of increasing size and reports the time per instruction.
+# Parsing should stay linear, so the last column should stay about the same as the programs grow.
+# Run from the repository root: python tests/benchmarks/parse_benchmark.py
+
+# Instructions the generated programs cycle through, including a label and a pseudo instruction
+BODY = ['addi $t0, $t0, 1', 'add $t1, $t1, $t0', 'loop{}: sub $t2, $t2, $t1', 'li $t3, 5']
+
+
+def generate(n: int) -> str:
+    lines = ['.data', 'table: .word ' + ', '.join(str(i) for i in range(n // 10)), '.text', 'main:']
+    lines += [BODY[i % len(BODY)].format(i) for i in range(n)]
+    lines += ['li $v0, 10', 'syscall']
+
+    return '\n'.join(lines) + '\n'
+
+
+def benchmark(n: int, directory: str) -> float:
+    path = Path(directory, f'bench{n}.asm')
+    path.write_text(generate(n))
+    cache.programs.clear()  # Time the assembler, not the program cache
+
+    start = time.perf_counter()
+    assemble(str(path))
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser()
+    p.add_argument('sizes', type=int, nargs='*', default=[5_000, 10_000, 20_000, 50_000],
+                   help='Number of instructions in each generated program')
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        print(f'{"instructions":>12} {"seconds":>8} {"us/instr":>8}')
+
+        for n in args.sizes:
+            t = benchmark(n, d)
+            print(f'{n:>12} {t:>8.2f} {t / n * 1e6:>8.1f}')
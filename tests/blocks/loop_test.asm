@@ -0,0 +1,80 @@
+.data
+arr: .word 9, -3, 14, 0, 7, -20, 5, 11
+n: .word 8
+
+.text
+main:
+  la $a0, arr
+  lw $a1, n
+  jal sort
+
+  # Print the sorted array
+  la $t0, arr
+  li $t1, 0
+print:
+  lw $a0, 0($t0)
+  li $v0, 1
+  syscall
+  li $a0, ' '
+  li $v0, 11
+  syscall
+  addiu $t0, $t0, 4
+  addi $t1, $t1, 1
+  blt $t1, $a1, print
+
+  # Unsigned, shift and multiply results
+  li $t2, -7
+  li $t3, 3
+  sltu $a0, $t3, $t2
+  li $v0, 1
+  syscall
+  srl $a0, $t2, 28
+  syscall
+  sra $a0, $t2, 1
+  syscall
+  mult $t2, $t3
+  mflo $a0
+  syscall
+  mfhi $a0
+  syscall
+  divu $t2, $t3
+  mflo $a0
+  syscall
+  li $t4, 0x7fffffff
+  addu $a0, $t4, $t4
+  syscall
+
+  li $v0, 10
+  syscall
+
+# Selection sort of the words at $a0, $a1 elements long
+sort:
+  li $t0, 0
+outer:
+  move $t2, $t0
+  addi $t1, $t0, 1
+inner:
+  bge $t1, $a1, swap
+  sll $t3, $t1, 2
+  addu $t3, $t3, $a0
+  lw $t4, 0($t3)
+  sll $t5, $t2, 2
+  addu $t5, $t5, $a0
+  lw $t5, 0($t5)
+  slt $t6, $t4, $t5
+  movn $t2, $t1, $t6
+  addi $t1, $t1, 1
+  j inner
+swap:
+  sll $t3, $t0, 2
+  addu $t3, $t3, $a0
+  sll $t5, $t2, 2
+  addu $t5, $t5, $a0
+  lw $t4, 0($t3)
+  lw $t6, 0($t5)
+  sw $t6, 0($t3)
+  sw $t4, 0($t5)
+  addi $t0, $t0, 1
+  addi $t7, $a1, -1
+  blt $t0, $t7, outer
+  jr $ra
@@ -0,0 +1,7 @@
+.text
+main:
+  li $t0, 0x7ffffff0
+  li $t1, 3
+loop:
+  add $t0, $t0, $t1
+  j loop
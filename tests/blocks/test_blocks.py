@@ -0,0 +1,83 @@
+import os
+import subprocess
+import unittest
+
+from interpreter import exceptions as ex
+from interpreter.interpreter import Interpreter
+from sbumips import assemble
+from settings import settings
+
+'''
+https://github.com/sbustars/STARS
+
+Copyright 2020 Kevin McDonnell, Jihu Mun, and Ian Peitzsch
+
+Developed by Kevin McDonnell (ktm@cs.stonybrook.edu),
+Jihu Mun (jihu1011@gmail.com),
+and Ian Peitzsch (irpeitzsch@gmail.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+
+class TestBlocks(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(TestBlocks, self).__init__(*args, **kwargs)
+
+        # Get directory of files
+        self.cwd = os.getcwd() + '/../..'
+
+    def execute_file(self, file, *args):
+        # Run a file with both engines, and return both results
+        results = []
+
+        for engine in ['closures', 'blocks']:
+            results.append(subprocess.run(['python', 'sbumips.py', '-i', f'--engine={engine}', *args, file],
+                                          cwd=self.cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE))
+
+        return results
+
+    def execute_test(self, file, *args):
+        closures, blocks = self.execute_file(file, *args)
+        self.assertEqual(closures.stdout, blocks.stdout)
+        self.assertEqual(closures.stderr, blocks.stderr)
+
+    def run_overflow(self, engine):
+        settings['engine'] = engine
+        inter = Interpreter(assemble('overflow_test.asm'), [])
+
+        try:
+            self.assertRaises(ex.ArithmeticOverflow, inter.interpret)
+        finally:
+            settings['engine'] = 'closures'
+
+        return inter
+
+    def test_loop(self):
+        self.execute_test('tests/blocks/loop_test.asm')
+
+    def test_pseudo_ops(self):
+        for file in sorted(os.listdir(f'{self.cwd}/tests/pseudoOps')):
+            if file.endswith('.asm'):
+                self.execute_test(f'tests/pseudoOps/{file}')
+
+    # The instruction limit can be hit in the middle of a block
+    def test_max_instructions(self):
+        for n in [1, 9, 100, 333, 561, 562]:
+            self.execute_test('tests/blocks/loop_test.asm', '-n', str(n))
+
+    def test_overflow(self):
+        self.execute_test('tests/blocks/overflow_test.asm')
+
+    # An exception inside a block leaves the interpreter where the default engine would
+    def test_overflow_state(self):
+        closures = self.run_overflow('closures')
+        blocks = self.run_overflow('blocks')
+
+        self.assertEqual(closures.instruction_count, blocks.instruction_count)
+        self.assertEqual(closures.line_info, blocks.line_info)
+        self.assertEqual(dict(closures.reg), dict(blocks.reg))
@@ -0,0 +1,47 @@
+.data
+d: .double 1.5
+w: .word 24
+.text
+main:
+	li $t0, 5
+	la $t2, d
+
+loop:
+	li $a0, 8
+	li $v0, 9
+	syscall
+	sw $t0, 0($v0)
+	sh $t0, 4($v0)
+	sb $t0, 6($v0)
+	mult $t0, $t0
+	mflo $t1
+	l.d $f2, 0($t2)
+	add.d $f4, $f2, $f2
+	s.d $f4, 0($t2)
+	l.s $f6, 8($t2)
+	mtc1 $t0, $f8
+	cvt.s.w $f8, $f8
+	c.lt.s $f6, $f8
+	sw $t1, w
+	jal next
+	addi $t0, $t0, -1
+	bnez $t0, loop
+
+	move $a0, $t1
+	li $v0, 1
+	syscall
+	li $v0, 10
+	syscall
+
+next:
+	move $t3, $ra
+	la $t4, leaf
+	jalr $t4
+	bgezal $zero, leaf
+	li $t5, -1
+	bltzal $t5, leaf
+	move $ra, $t3
+	jr $ra
+
+leaf:
+	jr $ra
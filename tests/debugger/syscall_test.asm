@@ -0,0 +1,23 @@
+.data
+buffer: .space 16
+
+.text
+main:
+	li $v0, 5
+	syscall
+	move $t0, $v0
+
+	la $a0, buffer
+	li $a1, 8
+	li $v0, 8
+	syscall
+
+	li $a0, 100
+	li $v0, 41
+	syscall
+	move $t1, $v0
+
+	lw $t2, buffer
+	addi $t3, $t2, 1
+	li $v0, 10
+	syscall
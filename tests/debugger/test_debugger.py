@@ -0,0 +1,316 @@
+import unittest
+import unittest.mock as mock
+from io import StringIO
+
+from numpy import float32
+
+import constants as const
+from interpreter.classes import Syscall
+from interpreter.debugger import compile_condition
+from interpreter.events import SilentEvents
+from interpreter.interpreter import Interpreter
+from sbumips import assemble
+from settings import settings
+
+'''
+https://github.com/sbustars/STARS
+
+Copyright 2020 Kevin McDonnell, Jihu Mun, and Ian Peitzsch
+
+Developed by Kevin McDonnell (ktm@cs.stonybrook.edu),
+Jihu Mun (jihu1011@gmail.com),
+and Ian Peitzsch (irpeitzsch@gmail.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+PC = const.REG_INDEX['pc']
+V0 = const.REG_INDEX['$v0']
+RA = const.REG_INDEX['$ra']
+
+
+def snapshot(inter):
+    mem = inter.mem
+    pages = {n: bytes(page) for n, page in mem.pages.items() if any(page)}
+    f_reg = {r: float32(v).tobytes() for r, v in inter.f_reg.items()}
+
+    return (list(inter.regs), f_reg, list(inter.condition_flags), mem.heapPtr, pages, inter.instruction_count,
+            inter.instr)
+
+
+class TestDebugger(unittest.TestCase):
+    def setUp(self):
+        self.settings = dict(settings)
+
+    def tearDown(self):
+        settings.clear()
+        settings.update(self.settings)
+
+    # Step through a program up to its exit syscall the way the debugger's run loop does,
+    # and return the state before each step
+    def run_file(self, file):
+        inter = Interpreter(assemble(file), [], SilentEvents())
+        text_base = inter.mem.textBase
+        states = []
+
+        while True:
+            pc = inter.regs[PC]
+            inter.instr = inter.mem.text[inter.mem.textIndex(pc)]
+            inter.regs[PC] = pc + 4
+            inter.instruction_count += 1
+
+            if type(inter.instr) is Syscall and inter.regs[V0] == 10:
+                break
+
+            states.append(snapshot(inter))
+            inter.debug.push(inter)
+            inter.code[(pc - text_base) >> 2](inter)
+
+            if inter.debug.pending is not None:
+                inter.debug.finish(inter)
+
+        states.append(snapshot(inter))
+        return inter, states
+
+    def reverse_all(self, file):
+        inter, states = self.run_file(file)
+
+        for state in reversed(states[:-1]):
+            inter.debug.reverse(None, inter)
+            self.assertEqual(snapshot(inter), state)
+
+        # There's nothing before the first instruction
+        inter.debug.reverse(None, inter)
+        self.assertEqual(snapshot(inter), states[0])
+
+    # Runs that never step back don't pay for the journal
+    def test_journal_allocated_on_first_push(self):
+        inter, _ = self.run_file('reverse_test.asm')
+        self.assertIsNotNone(inter.debug.journal.kinds)
+
+        inter = Interpreter(assemble('reverse_test.asm'), [], SilentEvents())
+
+        with self.assertRaises(SystemExit):
+            inter.interpret()
+
+        self.assertIsNone(inter.debug.journal.kinds)
+
+    def test_reverse(self):
+        self.reverse_all('reverse_test.asm')
+
+    # Stepping back over a jump or branch that links puts $ra back
+    def test_reverse_links(self):
+        inter, states = self.run_file('reverse_test.asm')
+        links = {i for i, state in enumerate(states) if getattr(state[-1], 'operation', None) in {'jalr', 'bgezal', 'bltzal'}}
+        self.assertEqual(len(links), 15)
+
+        for i in reversed(range(len(states) - 1)):
+            inter.debug.reverse(None, inter)
+
+            if i in links:
+                self.assertEqual(inter.regs[RA], states[i][0][RA])
+
+    # Stepping back past the journal restores a checkpoint and runs forward from it
+    def test_reverse_checkpoints(self):
+        settings['reverse_depth'] = 3
+        settings['checkpoint_interval'] = 16
+        self.reverse_all('reverse_test.asm')
+
+    def test_reverse_without_checkpoints(self):
+        settings['reverse_depth'] = 3
+        settings['checkpoint_interval'] = 0
+        inter, states = self.run_file('reverse_test.asm')
+
+        for _ in range(5):
+            inter.debug.reverse(None, inter)
+
+        self.assertEqual(snapshot(inter), states[-4])
+
+    # Replaying uses what input and random syscalls gave the first time, instead of running them again
+    @mock.patch('builtins.input', side_effect=['42', 'hello'])
+    def test_reverse_syscalls(self, mock_input):
+        settings['reverse_depth'] = 3
+        settings['checkpoint_interval'] = 4
+        self.reverse_all('syscall_test.asm')
+
+    # Only the syscalls that can still be stepped back over keep their records
+    @mock.patch('builtins.input', side_effect=['42', 'hello'])
+    def test_syscall_records_bounded(self, mock_input):
+        settings['reverse_depth'] = 3
+        settings['checkpoint_interval'] = 0
+        inter, _ = self.run_file('syscall_test.asm')
+        self.assertEqual(list(inter.debug.records), [10])
+
+    # Nothing is journaled while the program runs freely, so stepping back from a breakpoint replays from a checkpoint
+    @mock.patch('sys.stdout', new_callable=StringIO)
+    def test_reverse_after_continue(self, mock_stdout):
+        settings['checkpoint_interval'] = 16
+        _, states = self.run_file('reverse_test.asm')
+
+        settings['debug'] = True
+        inter = Interpreter(assemble('reverse_test.asm'), [], SilentEvents())
+        debug = inter.debug
+        debug.addBreakpoint(['b', 'reverse_test.asm', '27'], inter)
+        stops = []
+
+        def listen(interp):
+            step = interp.instruction_count - 1
+
+            # Running on after stepping back comes to the same breakpoint again
+            if step > 0 and step not in [stop[0] for stop in stops]:
+                debug.sync(interp)
+                self.assertEqual(len(debug.journal), 0)
+
+                for _ in range(5):
+                    debug.reverse(None, interp)
+
+                stops.append((step, snapshot(interp), states[step - 5]))
+
+            debug.cont(None, interp)
+
+        debug.listen = listen
+
+        with self.assertRaises(SystemExit):
+            inter.interpret()
+
+        self.assertEqual(len(stops), 5)
+
+        # The instructions come from assembling the program again, so they're different objects
+        for _, state, expected in stops:
+            self.assertEqual(state[:-1], expected[:-1])
+
+    @mock.patch('sys.stdout', new_callable=StringIO)
+    def test_reverse_continue(self, mock_stdout):
+        settings['reverse_depth'] = 3
+        settings['checkpoint_interval'] = 16
+        inter, states = self.run_file('reverse_test.asm')
+        debug = inter.debug
+
+        debug.addBreakpoint(['b', 'reverse_test.asm', '27'], inter)
+
+        for t0 in [1, 2, 3]:
+            debug.reverse_continue(None, inter)
+            self.assertEqual(inter.instr.filetag.line_no, 27)
+            self.assertEqual(inter.reg['$t0'], t0)
+
+        debug.clearBreakpoints(['d'], inter)
+        debug.addWatchpoint(['watch', 'w', 'w'], inter)
+
+        # Stops just before the sw of the same time round the loop
+        debug.reverse_continue(None, inter)
+        self.assertEqual(inter.instr.filetag.line_no, 25)
+        self.assertEqual(inter.mem.getWord(inter.mem.getLabel('w')), 16)
+        self.assertIn('Watchpoint w is changed from 16 to 9 by sw', mock_stdout.getvalue())
+
+        debug.clearBreakpoints(['d'], inter)
+        debug.reverse_continue(None, inter)
+        self.assertEqual(snapshot(inter), states[0])
+        self.assertIn('No more history', mock_stdout.getvalue())
+
+    def last_write(self):
+        inter, states = self.run_file('reverse_test.asm')
+        sw = [i for i, state in enumerate(states) if state[-1].filetag.line_no == 25][-1]
+
+        with mock.patch('sys.stdout', new_callable=StringIO) as out:
+            inter.debug.last_write(['last-write', 'w', 'w'], inter)
+            inter.debug.last_write(['last-write', '0x10010020'], inter)
+
+        self.assertEqual(out.getvalue().splitlines(),
+                         [f'sw $t1, 0x00000008($at) ("reverse_test.asm", 25) wrote to w {len(states) - 1 - sw} instructions ago',
+                          'Nothing has written to 0x10010020 in the history kept'])
+        self.assertEqual(snapshot(inter), states[-1])
+
+    def test_last_write(self):
+        self.last_write()
+
+    def test_last_write_checkpoints(self):
+        settings['reverse_depth'] = 3
+        settings['checkpoint_interval'] = 16
+        self.last_write()
+
+    def test_breakpoints(self):
+        settings['debug'] = True
+        inter = Interpreter(assemble('reverse_test.asm'), [], SilentEvents())
+        debug = inter.debug
+        debug.continueFlag = True
+
+        # la is two instructions, both on line 7
+        debug.addBreakpoint(['b', 'reverse_test.asm', '7'], inter)
+        debug.addBreakpoint(['b', 'reverse_test.asm', '11'], inter)
+        debug.addBreakpoint(['b', 'reverse_test.asm', '12'], inter)
+        self.assertEqual(debug.breaks, {1, 2, 4, 5})
+        self.assertTrue(debug.debug(2))
+
+        debug.continueFlag = True
+        self.assertFalse(debug.debug(3))
+
+        debug.removeBreakpoint(['"reverse_test.asm"', '7'], inter)
+        self.assertEqual(debug.breaks, {4, 5})
+
+        # Lines without instructions can't have breakpoints
+        debug.addBreakpoint(['b', 'reverse_test.asm', '8'], inter)
+        self.assertEqual(debug.breakpoints, [('"reverse_test.asm"', '11'), ('"reverse_test.asm"', '12')])
+
+    def test_conditional_breakpoints(self):
+        settings['debug'] = True
+        inter = Interpreter(assemble('reverse_test.asm'), [], SilentEvents())
+        debug = inter.debug
+
+        self.assertIsNone(compile_condition('$t0 == ', inter.regs))
+        self.assertIsNone(compile_condition('$t0 = 5', inter.regs))
+        self.assertIsNone(compile_condition('$t0 == x', inter.regs))
+
+        condition = compile_condition('$t0 == 5 && $t1 != $t2 || $t3 == 0xFFFFFFFF', inter.regs)
+        inter.reg['$t0'] = 5
+        inter.reg['$t1'] = 1
+        self.assertTrue(condition())
+        inter.reg['$t1'] = inter.reg['$t2']
+        self.assertFalse(condition())
+        inter.reg['$t3'] = -1
+        self.assertTrue(condition())
+
+        debug.addBreakpoint(['b', 'reverse_test.asm', '11', 'if', '$t0', '==', '3'], inter)
+        debug.continueFlag = True
+        self.assertFalse(debug.debug(4))
+        inter.reg['$t0'] = 3
+        self.assertTrue(debug.debug(4))
+
+        # An unconditional breakpoint on the same line always breaks
+        debug.addBreakpoint(['b', 'reverse_test.asm', '11'], inter)
+        inter.reg['$t0'] = 0
+        self.assertTrue(debug.debug(4))
+
+    # Run the program, continuing whenever the debugger stops, and return where it stopped
+    def run_debugger(self, file, commands):
+        settings['debug'] = True
+        inter = Interpreter(assemble(file), [], SilentEvents())
+        stops = []
+
+        def listen(interp):
+            stops.append((interp.instr.filetag.line_no, interp.reg['$t0']))
+
+            for cmd in commands:
+                interp.debug.handle[cmd[0]](cmd, interp)
+
+            commands.clear()
+            interp.debug.cont(None, interp)
+
+        inter.debug.listen = listen
+
+        # The program ends with the exit syscall
+        with mock.patch('sys.stdout', new_callable=StringIO) as out, self.assertRaises(SystemExit):
+            inter.interpret()
+
+        return stops, out.getvalue()
+
+    def test_watchpoints(self):
+        stops, out = self.run_debugger('reverse_test.asm', [['watch', 'w', 'w'], ['watch', '0x10010000', '8']])
+
+        # s.d and sw change d and w every time round the loop. The debugger stops before the instruction after them.
+        self.assertEqual(stops, [(6, 0), (21, 5), (26, 5), (21, 4), (26, 4), (21, 3), (26, 3), (21, 2), (26, 2),
+                                 (21, 1), (26, 1)])
+        self.assertIn('Watchpoint w changed from 24 to 25 ("reverse_test.asm", 25)', out)
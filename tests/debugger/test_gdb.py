@@ -0,0 +1,137 @@
+import socket
+import unittest
+import unittest.mock as mock
+from io import StringIO
+from threading import Thread
+
+from interpreter.events import SilentEvents
+from interpreter.gdbstub import GdbStub, checksum
+from interpreter.interpreter import Interpreter
+from sbumips import assemble
+
+'''
+https://github.com/sbustars/STARS
+
+Copyright 2020 Kevin McDonnell, Jihu Mun, and Ian Peitzsch
+
+Developed by Kevin McDonnell (ktm@cs.stonybrook.edu),
+Jihu Mun (jihu1011@gmail.com),
+and Ian Peitzsch (irpeitzsch@gmail.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+T0 = 8
+PC = 37  # GDB's number for pc
+
+
+class TestGdbStub(unittest.TestCase):
+    # Serve reverse_test.asm on a free port and connect to it the way GDB would
+    def setUp(self):
+        self.stderr = mock.patch('sys.stderr', new_callable=StringIO)
+        self.stderr.start()
+
+        self.inter = Interpreter(assemble('reverse_test.asm'), [], SilentEvents())
+        self.stub = GdbStub(self.inter, 0)
+        self.thread = Thread(target=self.stub.serve, daemon=True)
+        self.thread.start()
+        self.conn = socket.create_connection(('localhost', self.stub.port))
+        self.conn.settimeout(10)
+
+    def tearDown(self):
+        self.conn.close()
+        self.thread.join(10)
+        self.stderr.stop()
+
+    def send(self, data):
+        self.conn.sendall(f'${data}#{checksum(data.encode())}'.encode())
+
+    # Send a packet and return the reply
+    def request(self, data):
+        self.send(data)
+        received = b''
+
+        while not received.endswith(b'#', 0, len(received) - 2) or received.count(b'$') == 0:
+            received += self.conn.recv(4096)
+
+        self.conn.sendall(b'+')
+        reply = received[received.index(b'$') + 1:-3]
+        self.assertEqual(received[-2:].decode(), checksum(reply))
+        return reply.decode()
+
+    def address(self, line):
+        return self.inter.mem.textBase + 4 * self.inter.mem.lines[('"reverse_test.asm"', line)][0]
+
+    def test_registers(self):
+        self.assertEqual(self.request('?'), 'S05')
+
+        registers = self.request('g')
+        self.assertEqual(len(registers), 72 * 8)
+        self.assertEqual(registers[PC * 8:PC * 8 + 8], '00004000')
+
+        self.assertEqual(self.request(f'P{T0:x}=2a000000'), 'OK')
+        self.assertEqual(self.request(f'p{T0:x}'), '2a000000')
+        self.assertEqual(self.inter.reg['$t0'], 42)
+
+        # $zero can't be written
+        self.assertEqual(self.request('P0=01000000'), 'OK')
+        self.assertEqual(self.request('p0'), '00000000')
+        self.send('k')
+
+    def test_memory(self):
+        w = self.inter.mem.getLabel('w')
+
+        self.assertEqual(self.request(f'm{w:x},4'), '18000000')
+        self.assertEqual(self.request(f'M{w:x},4:05000000'), 'OK')
+        self.assertEqual(self.inter.mem.getWord(w), 5)
+        self.assertEqual(self.request('m0,4'), 'E0e')
+
+        # Instructions read as nops, but can't be written
+        end = self.inter.mem.textPtr
+        self.assertEqual(self.request(f'm{end - 6:x},6'), '00' * 6)
+        self.assertEqual(self.request(f'm{end - 4:x},8'), '00' * 4)
+        self.assertEqual(self.request(f'M{end - 4:x},4:01000000'), 'E0e')
+        self.send('k')
+
+    # GDB reads the instruction at pc before each step
+    def test_step(self):
+        for pc in [0x00400000, 0x00400004]:
+            self.assertEqual(self.request(f'p{PC:x}'), pc.to_bytes(4, 'little').hex())
+            self.assertEqual(self.request(f'm{pc:x},4'), '00000000')
+            self.assertEqual(self.request('s'), 'S05')
+
+        self.assertEqual(self.inter.reg['pc'], 0x00400008)
+        self.send('k')
+
+    def test_breakpoints(self):
+        addr = self.address(27)
+
+        self.assertEqual(self.request('s'), 'S05')
+        self.assertEqual(self.inter.reg['pc'], 0x00400004)
+
+        self.assertEqual(self.request(f'Z0,{addr:x},4'), 'OK')
+
+        # Stops before the instruction, every time round the loop
+        for t0 in [5, 4]:
+            self.assertEqual(self.request('c'), 'S05')
+            self.assertEqual(self.inter.reg['pc'], addr)
+            self.assertEqual(self.inter.reg['$t0'], t0)
+
+        # GDB can send conditions with the packet, to be left out when it's parsed
+        self.assertEqual(self.request(f'z0,{addr:x},4;X3,220101'), 'OK')
+        self.assertEqual(self.request('c'), 'W00')
+
+    def test_watchpoints(self):
+        w = self.inter.mem.getLabel('w')
+
+        self.assertEqual(self.request(f'Z2,{w:x},4'), 'OK')
+        self.assertEqual(self.request('c'), f'T05watch:{w:x};')
+        self.assertEqual(self.inter.mem.getWord(w), 25)
+        self.assertEqual(self.inter.reg['pc'], self.address(26))
+
+        self.assertEqual(self.request(f'z2,{w:x},4'), 'OK')
+        self.assertEqual(self.request('c'), 'W00')
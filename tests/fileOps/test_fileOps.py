@@ -32,7 +32,7 @@ class TestFileOps(unittest.TestCase):
         i.reg = reg
         i.mem = mem
         syscalls.openFile(i)
-        self.assertEqual(reg['$v0'], 3, "Couldn't open valid file")
+        self.assertEqual(i.reg['$v0'], 3, "Couldn't open valid file")
         self.assertEqual(len(mem.fileTable), 4)
         mem.fileTable[3].close()
 
@@ -45,7 +45,7 @@ class TestFileOps(unittest.TestCase):
         i.reg = reg
         i.mem = mem
         syscalls.openFile(i)
-        self.assertEqual(reg['$v0'], -1, "Opened invalid file")
+        self.assertEqual(i.reg['$v0'], -1, "Opened invalid file")
         self.assertEqual(len(mem.fileTable), 3, "Opened invalid file")
 
     def test_file_open_invalid_char(self):
@@ -57,7 +57,7 @@ class TestFileOps(unittest.TestCase):
         i.reg = reg
         i.mem = mem
         syscalls.openFile(i)
-        self.assertEqual(reg['$v0'], -1, "Opened an invalid character")
+        self.assertEqual(i.reg['$v0'], -1, "Opened an invalid character")
         self.assertEqual(len(mem.fileTable), 3, "Opened an invalid character")
 
     def test_file_read_success(self):
@@ -72,7 +72,7 @@ class TestFileOps(unittest.TestCase):
         i.mem = mem
         syscalls.readFile(i)
         f.close()
-        self.assertEqual(reg['$v0'], 5)
+        self.assertEqual(i.reg['$v0'], 5)
         self.assertEqual(syscalls.getString(reg['$a1'], mem, 5), 'hello')
 
     def test_file_read_overread(self):
@@ -87,7 +87,7 @@ class TestFileOps(unittest.TestCase):
         i.mem = mem
         syscalls.readFile(i)
         f.close()
-        self.assertEqual(reg['$v0'], 12)
+        self.assertEqual(i.reg['$v0'], 12)
         self.assertEqual(syscalls.getString(reg['$a1'], mem, 12), 'hello world!')
 
     def test_file_write_success(self):
@@ -103,7 +103,7 @@ class TestFileOps(unittest.TestCase):
         syscalls.writeFile(i)
         f.close()
         open('fileToWrite.txt', 'w').close()
-        self.assertEqual(reg['$v0'], 4)
+        self.assertEqual(i.reg['$v0'], 4)
         self.assertEqual(syscalls.getString(reg['$a1'], mem, 4), 'Good')
 
     def test_file_write_overwrite(self):
@@ -119,7 +119,7 @@ class TestFileOps(unittest.TestCase):
         syscalls.writeFile(i)
         f.close()
         open('fileToWrite.txt', 'w').close()
-        self.assertEqual(reg['$v0'], 13)
+        self.assertEqual(i.reg['$v0'], 13)
         self.assertEqual(syscalls.getString(reg['$a1'], mem, 13), 'Good morning!')
 
     def test_file_close_success(self):
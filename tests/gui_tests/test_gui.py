@@ -155,7 +155,7 @@ class GuiTest(unittest.TestCase):
         self.assemble('test1.asm')
 
         self.form.controller.interp.condition_flags[0] = True
-        self.form.controller.interp.step.emit()
+        self.form.controller.interp.events.step.emit()
 
         self.assertEqual(self.form.flags[0].checkState(), Qt.Checked)
 
@@ -163,7 +163,7 @@ class GuiTest(unittest.TestCase):
         self.assemble('test1.asm')
 
         self.form.controller.interp.reg['$a0'] = 1
-        self.form.controller.interp.step.emit()
+        self.form.controller.interp.events.step.emit()
 
         self.assertEqual(self.form.regs['$a0'].text(), '0x00000001')
 
@@ -173,7 +173,7 @@ class GuiTest(unittest.TestCase):
         self.form.hdc_dropdown.setCurrentIndex(1)
 
         self.form.controller.interp.reg['$a0'] = 1
-        self.form.controller.interp.step.emit()
+        self.form.controller.interp.events.step.emit()
 
         self.assertEqual(self.form.regs['$a0'].text(), '1')
 
@@ -182,7 +182,7 @@ class GuiTest(unittest.TestCase):
 
         self.form.controller.interp.mem.setByte(0, 1, admin=True)
 
-        self.form.controller.interp.step.emit()
+        self.form.controller.interp.events.step.emit()
 
         self.assertEqual(self.form.mem_vals[0].text(), '0x00 0x00 0x00 0x01')
 
@@ -192,7 +192,7 @@ class GuiTest(unittest.TestCase):
         self.form.hdc_dropdown.setCurrentIndex(1)
         self.form.controller.interp.mem.setByte(0, 1, admin=True)
 
-        self.form.controller.interp.step.emit()
+        self.form.controller.interp.events.step.emit()
 
         self.assertEqual(self.form.mem_vals[0].text(), '  0   0   0   1')
 
@@ -202,6 +202,6 @@ class GuiTest(unittest.TestCase):
         self.form.hdc_dropdown.setCurrentIndex(2)
         self.form.controller.interp.mem.setByte(0, ord('a'), admin=True)
 
-        self.form.controller.interp.step.emit()
+        self.form.controller.interp.events.step.emit()
 
         self.assertEqual(self.form.mem_vals[0].text(), r'\0 \0 \0 a ')
\ No newline at end of file
@@ -1,6 +1,7 @@
+import random
 import unittest
 
-from interpreter import instructions
+from interpreter import instructions, utility
 from interpreter.exceptions import *
 from interpreter.instructions import overflow_detect
 from interpreter.interpreter import *
@@ -288,6 +289,45 @@ class TestSBUMips(unittest.TestCase):
         self.assertEqual(0x400000, reg['$ra'])
         self.assertEqual(0x1234, reg['pc'])
 
+    # Labels are resolved when the program is loaded
+    def test_link_labels(self):
+        jump = JType('j', Label('main'))
+        branch = Branch('beq', 8, 9, Label('end'))
+        inter = Interpreter([Label('main'), branch, jump, Label('end'), Nop()], [])
+        self.assertEqual(inter.mem.textBase, jump.target.addr)
+        self.assertEqual(inter.mem.textBase + 8, branch.label.addr)
+
+    # Declarations are packed into the data segment, aligned and little endian
+    def test_declarations(self):
+        code = [Declaration(Label('s'), '.asciiz', '"ab\\n"'), Declaration(Label('w'), '.word', [-1, 0x12345678]),
+                Declaration(Label('h'), '.half', [0xabcd]), Declaration(Label('d'), '.double', [1.5]), Label('main')]
+        inter = Interpreter(code, [])
+        mem = inter.mem
+        self.assertEqual('ab\\n', mem.getString('s'))
+        self.assertEqual(0x10010004, mem.getLabel('w'))
+        self.assertEqual(-1, mem.getWord(0x10010004))
+        self.assertEqual(0x12345678, mem.getWord(0x10010008))
+        self.assertEqual(0x78, mem.getByte(0x10010008, signed=False))
+        self.assertEqual(0xabcd, mem.getHWord(0x1001000c, signed=False))
+        self.assertEqual(1.5, mem.getDouble(0x10010010))
+        self.assertEqual(0x10010018, mem.dataPtr)
+
+    def test_handle_escapes(self):
+        cases = {r'a\nb': 'a\nb', r'\t\r\0\"': '\t\r\0"', r'\\': '\\', r'\\n': '\\n', r'\\\n': '\\\n',
+                 r'\x': r'\x', r'\\\x': r'\\x', 'end\\': 'end\\', 'plain': 'plain'}
+
+        for s, expected in cases.items():
+            self.assertEqual(expected, utility.handle_escapes(s), msg=f'Failed test_handle_escapes on {s}.')
+
+    # Every undefined label is reported at once
+    def test_link_labels_invalid(self):
+        code = [Label('main'), Branch('beq', 8, 9, Label('wack')), JType('jal', Label('main')), JType('j', Label('wack2'))]
+
+        with self.assertRaises(InvalidLabel) as e:
+            Interpreter(code, [])
+
+        self.assertEqual('wack is not a valid label.\nwack2 is not a valid label.', e.exception.message)
+
     # Lui
     # Positive
     def test_lui_1(self):
@@ -430,26 +470,55 @@ class TestSBUMips(unittest.TestCase):
     def test_sb_1(self):
         mem = Memory(False)
         instructions.sb(0x10010005, mem, 0xF4)
-        self.assertEqual(0xF4, mem.data[str(0x10010005)])
+        self.assertEqual(0xF4, mem.getByte(0x10010005, signed=False))
 
     # Address out of range
     def test_sb_2(self):
         mem = Memory(False)
         self.assertRaises(MemoryOutOfBounds, instructions.sb, 0x1001005, mem, 0xF4)
 
+    # .space only allocates pages once they're touched
+    def test_space_lazy(self):
+        mem = Memory(False)
+        mem.addSpace(1 << 20, 0x10010000)
+        self.assertEqual(0, len(mem.pages))
+        self.assertEqual(0, instructions.lw(0x10010000 + (1 << 19), mem))
+        self.assertEqual(1, len(mem.pages))
+
+    # Garbage is the same for the same seed
+    def test_space_garbage_seed(self):
+        first = Memory(True, random.Random(7))
+        second = Memory(True, random.Random(7))
+        first.addSpace(64, 0x10010000)
+        second.addSpace(64, 0x10010000)
+        addrs = range(0x10010000, 0x10010040)
+        self.assertEqual([first.getByte(a) for a in addrs], [second.getByte(a) for a in addrs])
+
+    # Address in the text segment
+    def test_sb_text(self):
+        mem = Memory(False)
+        self.assertRaises(MemoryOutOfBounds, instructions.sb, 0x00400000, mem, 0xF4)
+
+    # The GUI can write to memory programs can't access, but that doesn't open it up to programs
+    def test_sb_admin(self):
+        mem = Memory(False)
+        mem.setByte(0x00400000, 0xF4, admin=True)
+        self.assertEqual(0xF4, mem.getByte(0x00400000, signed=False, admin=True))
+        self.assertRaises(MemoryOutOfBounds, instructions.lb, 0x00400000, mem)
+
     # More than one byte
     def test_sb_3(self):
         mem = Memory(False)
         instructions.sb(0x10010005, mem, 0x12345678)
-        self.assertEqual(0x78, mem.data[str(0x10010005)])
+        self.assertEqual(0x78, mem.getByte(0x10010005, signed=False))
 
     # sh
     # General case
     def test_sh_1(self):
         mem = Memory(False)
         instructions.sh(0x10010006, mem, 0xabcd)
-        self.assertEqual(0xcd, mem.data[str(0x10010006)])
-        self.assertEqual(0xab, mem.data[str(0x10010007)])
+        self.assertEqual(0xcd, mem.getByte(0x10010006, signed=False))
+        self.assertEqual(0xab, mem.getByte(0x10010007, signed=False))
 
     # Address unaligned
     def test_sh_2(self):
@@ -461,10 +530,10 @@ class TestSBUMips(unittest.TestCase):
     def test_sw_1(self):
         mem = Memory(False)
         instructions.sw(0x10010004, mem, 0x1234abcd)
-        self.assertEqual(0xcd, mem.data[str(0x10010004)])
-        self.assertEqual(0xab, mem.data[str(0x10010005)])
-        self.assertEqual(0x34, mem.data[str(0x10010006)])
-        self.assertEqual(0x12, mem.data[str(0x10010007)])
+        self.assertEqual(0xcd, mem.getByte(0x10010004, signed=False))
+        self.assertEqual(0xab, mem.getByte(0x10010005, signed=False))
+        self.assertEqual(0x34, mem.getByte(0x10010006, signed=False))
+        self.assertEqual(0x12, mem.getByte(0x10010007, signed=False))
 
     # Address unaligned
     def test_sw_2(self):
@@ -537,40 +606,40 @@ class TestSBUMips(unittest.TestCase):
         mem.addWord(0x12345678, 0x10010000)
         reg = 0x2468abcd
         instructions.swl(0x10010000, mem, reg)
-        self.assertEqual(0x24, mem.data[str(0x10010000)])
-        self.assertEqual(0x56, mem.data[str(0x10010001)])
-        self.assertEqual(0x34, mem.data[str(0x10010002)])
-        self.assertEqual(0x12, mem.data[str(0x10010003)])
+        self.assertEqual(0x24, mem.getByte(0x10010000, signed=False))
+        self.assertEqual(0x56, mem.getByte(0x10010001, signed=False))
+        self.assertEqual(0x34, mem.getByte(0x10010002, signed=False))
+        self.assertEqual(0x12, mem.getByte(0x10010003, signed=False))
 
     def test_swl_1(self):
         mem = Memory(False)
         mem.addWord(0x12345678, 0x10010000)
         reg = 0x2468abcd
         instructions.swl(0x10010001, mem, reg)
-        self.assertEqual(0x68, mem.data[str(0x10010000)])
-        self.assertEqual(0x24, mem.data[str(0x10010001)])
-        self.assertEqual(0x34, mem.data[str(0x10010002)])
-        self.assertEqual(0x12, mem.data[str(0x10010003)])
+        self.assertEqual(0x68, mem.getByte(0x10010000, signed=False))
+        self.assertEqual(0x24, mem.getByte(0x10010001, signed=False))
+        self.assertEqual(0x34, mem.getByte(0x10010002, signed=False))
+        self.assertEqual(0x12, mem.getByte(0x10010003, signed=False))
 
     def test_swl_2(self):
         mem = Memory(False)
         mem.addWord(0x12345678, 0x10010000)
         reg = 0x2468abcd
         instructions.swl(0x10010002, mem, reg)
-        self.assertEqual(0xab, mem.data[str(0x10010000)])
-        self.assertEqual(0x68, mem.data[str(0x10010001)])
-        self.assertEqual(0x24, mem.data[str(0x10010002)])
-        self.assertEqual(0x12, mem.data[str(0x10010003)])
+        self.assertEqual(0xab, mem.getByte(0x10010000, signed=False))
+        self.assertEqual(0x68, mem.getByte(0x10010001, signed=False))
+        self.assertEqual(0x24, mem.getByte(0x10010002, signed=False))
+        self.assertEqual(0x12, mem.getByte(0x10010003, signed=False))
 
     def test_swl_3(self):
         mem = Memory(False)
         mem.addWord(0x12345678, 0x10010000)
         reg = 0x2468abcd
         instructions.swl(0x10010003, mem, reg)
-        self.assertEqual(0xcd, mem.data[str(0x10010000)])
-        self.assertEqual(0xab, mem.data[str(0x10010001)])
-        self.assertEqual(0x68, mem.data[str(0x10010002)])
-        self.assertEqual(0x24, mem.data[str(0x10010003)])
+        self.assertEqual(0xcd, mem.getByte(0x10010000, signed=False))
+        self.assertEqual(0xab, mem.getByte(0x10010001, signed=False))
+        self.assertEqual(0x68, mem.getByte(0x10010002, signed=False))
+        self.assertEqual(0x24, mem.getByte(0x10010003, signed=False))
 
     # swr
     def test_swr_0(self):
@@ -578,40 +647,40 @@ class TestSBUMips(unittest.TestCase):
         mem.addWord(0x12345678, 0x10010000)
         reg = 0x2468abcd
         instructions.swr(0x10010000, mem, reg)
-        self.assertEqual(0xcd, mem.data[str(0x10010000)])
-        self.assertEqual(0xab, mem.data[str(0x10010001)])
-        self.assertEqual(0x68, mem.data[str(0x10010002)])
-        self.assertEqual(0x24, mem.data[str(0x10010003)])
+        self.assertEqual(0xcd, mem.getByte(0x10010000, signed=False))
+        self.assertEqual(0xab, mem.getByte(0x10010001, signed=False))
+        self.assertEqual(0x68, mem.getByte(0x10010002, signed=False))
+        self.assertEqual(0x24, mem.getByte(0x10010003, signed=False))
 
     def test_swr_1(self):
         mem = Memory(False)
         mem.addWord(0x12345678, 0x10010000)
         reg = 0x2468abcd
         instructions.swr(0x10010001, mem, reg)
-        self.assertEqual(0x78, mem.data[str(0x10010000)])
-        self.assertEqual(0xcd, mem.data[str(0x10010001)])
-        self.assertEqual(0xab, mem.data[str(0x10010002)])
-        self.assertEqual(0x68, mem.data[str(0x10010003)])
+        self.assertEqual(0x78, mem.getByte(0x10010000, signed=False))
+        self.assertEqual(0xcd, mem.getByte(0x10010001, signed=False))
+        self.assertEqual(0xab, mem.getByte(0x10010002, signed=False))
+        self.assertEqual(0x68, mem.getByte(0x10010003, signed=False))
 
     def test_swr_2(self):
         mem = Memory(False)
         mem.addWord(0x12345678, 0x10010000)
         reg = 0x2468abcd
         instructions.swr(0x10010002, mem, reg)
-        self.assertEqual(0x78, mem.data[str(0x10010000)])
-        self.assertEqual(0x56, mem.data[str(0x10010001)])
-        self.assertEqual(0xcd, mem.data[str(0x10010002)])
-        self.assertEqual(0xab, mem.data[str(0x10010003)])
+        self.assertEqual(0x78, mem.getByte(0x10010000, signed=False))
+        self.assertEqual(0x56, mem.getByte(0x10010001, signed=False))
+        self.assertEqual(0xcd, mem.getByte(0x10010002, signed=False))
+        self.assertEqual(0xab, mem.getByte(0x10010003, signed=False))
 
     def test_swr_3(self):
         mem = Memory(False)
         mem.addWord(0x12345678, 0x10010000)
         reg = 0x2468abcd
         instructions.swr(0x10010003, mem, reg)
-        self.assertEqual(0x78, mem.data[str(0x10010000)])
-        self.assertEqual(0x56, mem.data[str(0x10010001)])
-        self.assertEqual(0x34, mem.data[str(0x10010002)])
-        self.assertEqual(0xcd, mem.data[str(0x10010003)])
+        self.assertEqual(0x78, mem.getByte(0x10010000, signed=False))
+        self.assertEqual(0x56, mem.getByte(0x10010001, signed=False))
+        self.assertEqual(0x34, mem.getByte(0x10010002, signed=False))
+        self.assertEqual(0xcd, mem.getByte(0x10010003, signed=False))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,63 @@
+import random
+import unittest
+from pathlib import Path
+
+from lexer import MipsLexer
+from preprocess import preprocess, walk
+
+'''
+https://github.com/sbustars/STARS
+
+Copyright 2020 Kevin McDonnell, Jihu Mun, and Ian Peitzsch
+
+Developed by Kevin McDonnell (ktm@cs.stonybrook.edu),
+Jihu Mun (jihu1011@gmail.com),
+and Ian Peitzsch (irpeitzsch@gmail.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+# Pieces of MIPS that are easy to lex wrong, for building random programs
+PIECES = ['add', '.foo', 'add.s', 'mul.d', 'c.eq.s', 'cvt.s.w', 'movn.s', 'movf', 'b', 'bge', 'jal', 'jalr', 'lw', 'lwl',
+          'li', 'la', 'lui', 'syscall', 'x', '_x', 'é', '$s10', '$3', '$31', '$32', '$fp', '$f31', '$f32', '$t0 ,', '$',
+          '1', '5', '.5', '-', '+', '0x1F', 'e-3', '2e', '.', '.text', '.word', "'a'", "'\\n'", '"st r"', '#c', ',',
+          ':', '(', ')', ' ', '\t', '\n', '\r', '\x81\x83 "f" 3']
+
+
+def tokens(text: str, fast: bool):
+    lexer = MipsLexer('test.asm', fast)
+
+    try:
+        return [(t.type, t.value, t.lineno, t.index) for t in lexer.tokenize(text)], lexer.lineno
+
+    except Exception as e:
+        return repr(e)
+
+
+class TestLexer(unittest.TestCase):
+
+    def test_fast_tokenize_programs(self):
+        files = sorted(Path('..').glob('**/*.asm')) + sorted(Path('../../examples').glob('**/*.asm'))
+
+        for file in files:
+            try:
+                names, eqv, abs_to_rel = [], {}, {}
+                walk(file, names, eqv, abs_to_rel, file.parent)
+
+            except Exception:  # Files made to fail preprocessing still get lexed
+                eqv = {}
+
+            contents = file.read_text(errors='ignore')
+            text = preprocess(contents, file.as_posix(), eqv)
+            self.assertEqual(tokens(text, True), tokens(text, False), msg=f'Failed test_fast_tokenize_programs on {file}.')
+
+    def test_fast_tokenize_random(self):
+        r = random.Random(0)
+
+        for _ in range(5000):
+            text = ''.join(r.choice(PIECES) for _ in range(r.randint(1, 8)))
+            self.assertEqual(tokens(text, True), tokens(text, False), msg=f'Failed test_fast_tokenize_random on {text!r}.')
@@ -1,6 +1,10 @@
+import tempfile
 import unittest
 
+import cache
 from preprocess import *
+from sbumips import assemble, lex_files
+from settings import settings
 
 '''
 https://github.com/sbustars/STARS
@@ -101,6 +105,12 @@ li $a1, 0x10010010  "eqvTest.asm" 13
 syscall  "eqvTest.asm" 14
 ''', msg='Failed test_preprocess_eqv_success.')
 
+    def test_preprocess_eqv_chained(self):
+        # B is defined after A, so it is also replaced inside A's substitution. Strings and comments are left alone.
+        eqv_dict = {r'\bA\b': 'B', r'\bB\b': '7', r'\bAB\b': '$t0'}
+        data = preprocess('li AB, A # A\n.asciiz "A B"', 'x.asm', eqv_dict)
+        self.assertEqual(data, f'li $t0, 7 # A {FILE_MARKER} "x.asm" 1\n.asciiz "A B" {LINE_MARKER} "x.asm" 2\n')
+
     def test_preprocess_include_success(self):
         path = Path('includeSuccess.asm')
         path.resolve()
@@ -135,34 +145,71 @@ jello: .word 4  "toInclude.asm" 6
                 processed[file.as_posix()] = preprocess(contents[file.as_posix()], file, eqv_dict)
             self.assertEqual(processed[file.as_posix()], expected[file.as_posix()], msg=f"Failed test_preprocess_include_success on file {file.name}.")
 
-        (og_text, text) = link(files, contents, processed, abs_to_rel)
-        self.assertEqual(text, '''.text  "toInclude.asm" 1
-li $v0, 10  "toInclude.asm" 2
-syscall  "toInclude.asm" 3
-
-.data  "toInclude.asm" 5
-jello: .word 4  "toInclude.asm" 6
-.text  "includeSuccess.asm" 2
-li $a0, 24  "includeSuccess.asm" 3
-li $v0, 4  "includeSuccess.asm" 4
-syscall  "includeSuccess.asm" 5
-li $v0, 10  "includeSuccess.asm" 6
-syscall  "includeSuccess.asm" 7
-
-.data  "includeSuccess.asm" 9
-UvU: .asciiz "owo what's this?"  "includeSuccess.asm" 10
-''', msg="Failed test_preprocess_include_success on linking preprocessed text.")
-        self.assertEqual(og_text, '''.text
-li $v0, 10
-syscall
-
-.data
-jello: .word 4.text
-li $a0, 24
-li $v0, 4
-syscall
-li $v0, 10
-syscall
-
-.data
-UvU: .asciiz "owo what's this?"''', msg="Failed test_preprocess_include_success on linking original text.")
+        # The included file is spliced in where it was included, with its own file tags and source lines
+        result = [(i.filetag.file_name, i.filetag.line_no, getattr(i, 'original_text', None)) for i in assemble('includeSuccess.asm') if hasattr(i, 'filetag')]
+        self.assertEqual(result, [('"toInclude.asm"', 3, 'syscall'), ('"toInclude.asm"', 6, None),
+                                  ('"includeSuccess.asm"', 5, 'syscall'), ('"includeSuccess.asm"', 7, 'syscall'),
+                                  ('"includeSuccess.asm"', 10, None)], msg="Failed test_preprocess_include_success on linking.")
+
+    # A syntax error is reported in the file it's in, including right after an include or at the start of one
+    def test_include_syntax_error(self):
+        with tempfile.TemporaryDirectory() as d:
+            main = Path(d, 'main.asm')
+            lib = Path(d, 'lib.asm')
+            lib.write_text('.text\nli $v0, 10\n')
+
+            main.write_text('.include "lib.asm"\n.text .text\nmain: syscall\n')
+            with self.assertRaisesRegex(SyntaxError, f"on {main.as_posix()}:2$"):
+                assemble(str(main))
+
+            main.write_text('.text\nmain: li $v0, 10\n.include "lib.asm"\nsyscall\n')
+            lib.write_text('.text .text\n')
+            with self.assertRaisesRegex(SyntaxError, f"on {lib.as_posix()}:1$"):
+                assemble(str(main))
+
+    def test_program_cache_tracks_includes(self):
+        with tempfile.TemporaryDirectory() as d:
+            main = Path(d, 'main.asm')
+            inc = Path(d, 'inc.asm')
+            main.write_text('.include "inc.asm"\n.text\nmain: li $v0, 10\nsyscall\n')
+            inc.write_text('.data\nx: .word 1\n')
+
+            def key():
+                files, eqv_dict, abs_to_rel = [], {}, {}
+                walk(main, files, eqv_dict, abs_to_rel, main.parent)
+                return cache.program_key(files, eqv_dict, abs_to_rel)
+
+            first = key()
+
+            # A one-shot command line run doesn't keep what it assembled
+            assemble(str(main))
+            self.assertNotIn(first, cache.programs)
+
+            # The GUI assembles many times in one process, so it does
+            settings['gui'] = True
+            self.addCleanup(settings.__setitem__, 'gui', False)
+            result = assemble(str(main))
+            self.assertIn(first, cache.programs)
+
+            # A hit is a fresh copy, since running a program changes its labels and instructions
+            again = assemble(str(main))
+            self.assertIsNot(again, result)
+            self.assertEqual(len(again), len(result))
+
+            inc.write_text('.data\nx: .word 1\ny: .word 2\n')
+            self.assertNotEqual(key(), first)
+            self.assertEqual(len(assemble(str(main))), len(result) + 1)
+
+    def test_lex_files_parallel(self):
+        names = ['includeSuccess.asm', 'toInclude.asm']
+        tokens = lambda lexed: [(text, [(t.type, t.value, t.lineno, t.index) for t in toks]) for text, toks in lexed]
+        self.assertEqual(tokens(lex_files(names, {}, 2)), tokens(lex_files(names, {}, 1)))
+
+        # Errors are reported for the first bad file, as if the files were lexed one at a time
+        with tempfile.TemporaryDirectory() as d:
+            bad = [Path(d, 'a.asm'), Path(d, 'b.asm')]
+            bad[0].write_text('.text\nli $t0, 1\nadd $t0, $t0, `\n')
+            bad[1].write_text('.text\n`\n')
+
+            with self.assertRaisesRegex(SyntaxError, f'File "{bad[0].as_posix()}" Line 3'):
+                lex_files([b.as_posix() for b in bad], {}, 2)
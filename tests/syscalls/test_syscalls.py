@@ -5,10 +5,12 @@ from io import StringIO
 
 from numpy import float32
 
+import constants as const
 import settings
 from interpreter import exceptions as ex
 from interpreter import memory, syscalls
 from interpreter.classes import Label
+from interpreter.events import EventSink
 from interpreter.interpreter import Interpreter
 
 '''
@@ -131,6 +133,24 @@ class TestSyscalls(unittest.TestCase):
         syscalls.printString(inter)
         self.assertEqual(mock_stdout.getvalue(), 'words')
 
+    @mock.patch('sys.stdout', new_callable=StringIO)
+    def test_printStringEventSink(self, mock_stdout):
+        class Recorder(EventSink):
+            def __init__(self):
+                self.output = []
+
+            def on_console_out(self, s: str) -> None:
+                self.output.append(s)
+
+        events = Recorder()
+        inter = Interpreter([Label('main')], [], events)
+        inter.mem = memory.Memory()
+        inter.reg = {'$a0': inter.mem.dataPtr}
+        inter.mem.addAsciiz('words', inter.mem.dataPtr)
+        syscalls.printString(inter)
+        self.assertEqual(''.join(events.output), 'words')
+        self.assertEqual(mock_stdout.getvalue(), '')
+
     @mock.patch('sys.stdout', new_callable=StringIO)
     def test_printInvalidString(self, mock_stdout):
         inter = Interpreter([Label('main')], [])
@@ -436,9 +456,10 @@ class TestSyscalls(unittest.TestCase):
         inter.mem = memory.Memory()
         inter.reg = {'$a0': 0}
         syscalls.regDump(inter)
-        self.assertEqual('''reg  hex        dec
-$a0  0x00000000 0
-''', mock_stdout.getvalue())
+        lines = mock_stdout.getvalue().split('\n')
+        self.assertEqual('reg  hex        dec', lines[0])
+        self.assertEqual(len(const.REGS) + 2, len(lines))
+        self.assertIn('$a0  0x00000000 0', lines)
 
     @mock.patch('sys.stdout', new_callable=StringIO)
     def test_dumpRegNeg(self, mock_stdout):
@@ -446,9 +467,9 @@ $a0  0x00000000 0
         inter.mem = memory.Memory()
         inter.reg = {'$a0': 0x80000000}
         syscalls.regDump(inter)
-        self.assertEqual('''reg  hex        dec
-$a0  0x80000000 -2147483648
-''', mock_stdout.getvalue())
+        lines = mock_stdout.getvalue().split('\n')
+        self.assertEqual('reg  hex        dec', lines[0])
+        self.assertIn('$a0  0x80000000 -2147483648', lines)
 
     # syscall 32
     @mock.patch('sys.stdout', new_callable=StringIO)